@@ -1,9 +1,7 @@
-import os
+import logging
 import platform
 import signal
 
-from pydantic import SecretStr
-
 
 def patch_signals_for_windows():
     """Define missing POSIX signals on Windows for CrewAI's SignalType enum."""
@@ -51,55 +49,95 @@ def patch_signals_for_windows():
         if not hasattr(signal, attr):
             setattr(signal, attr, value)
 
-    print("[DJANGO DEBUG] Full Windows signal patch applied for CrewAI")
+    logging.getLogger(__name__).info("Full Windows signal patch applied for CrewAI")
 
 patch_signals_for_windows()
 
-import time
 from django.shortcuts import get_object_or_404
-from django.utils import timezone
-from crewai import Agent, Task, Crew, Process
-from langchain_groq import ChatGroq
-from core.models import AgentRun, AgentMessage
-from core.redis_client import publish_message
-
-
-def publish(run_id, agent_name, content, msg_type="thought"):
-    data = {
-        "run_id": str(run_id),
-        "agent_name": agent_name,
-        "content": content,
-        "type": msg_type,
-        "timestamp": timezone.now().isoformat()
-    }
-    publish_message(run_id, data)
+from crewai import Agent, Task
+from agents.llm import build_llm
+from agents.scheduler import TaskNode, run_task_graph
+from core.checkpoints import RunCheckpoints
+from core.graph import RunGraph, active_graph
+from core.models import AgentRun
+from core.profiler import RunProfile, active_profile
+from core.persistence import close_buffer, record_message
+from core.log import crew_verbose
+from core.telemetry import tracer
 
-    AgentMessage.objects.create(
-        run_id=run_id,
-        agent_name=agent_name,
-        content=content,
-        message_type=msg_type,
-    )
+logger = logging.getLogger(__name__)
+
+
+def publish(run_id, agent_name, content, msg_type="thought", usage=None):
+    # Published immediately; the database write is batched off this thread.
+    record_message(run_id, agent_name, content, msg_type, usage=usage)
+
+
+def step_text(output) -> str:
+    if hasattr(output, 'raw_output'):
+        return output.raw_output
+    elif hasattr(output, 'result'):
+        return output.result
+    elif hasattr(output, 'output'):
+        return output.output
+    return str(output)
+
+
+def agent_step_callback(run_id, agent_name, max_length=None):
+    """
+    Step callback bound to one agent, so messages stay attributed correctly
+    when several agents run at the same time. Agent names match the roles
+    used for token `delta` events, so the dashboard can swap a streamed
+    step for its final text.
+    """
+    def callback(output):
+        text = step_text(output)
+        if max_length and len(text) > max_length:
+            text = text[:max_length] + "... [TRUNCATED]"
+        msg_type = "final" if "Final Answer" in text else "thought"
+        publish(run_id, agent_name, text.strip(), msg_type)
+        graph = active_graph(run_id)
+        if graph is not None:
+            graph.step(agent_name)
+        profile = active_profile(run_id)
+        if profile is not None:
+            profile.step(agent_name)
+
+    return callback
 
 
-def run_research_mission(mission_name: str = "2025 AI Agent Trends Report", run_id: str = '') -> str:
+def run_checkpointed(run_id, graph, llm):
+    """
+    Runs the mission graph with per-task checkpoints. On a resumed run the
+    tasks that finished before are restored and only the rest call the LLM.
+    Task progress is published to the run's live graph (core.graph) and
+    profiled (core.profiler).
+    """
+    checkpoints = RunCheckpoints(run_id)
+    restored = checkpoints.load()
+    done = [node.task.agent.role for node in graph if node.name in restored]
+    if done:
+        publish(run_id, "Manager", f"Resuming mission: {len(done)} of {len(graph)} tasks restored from checkpoints ({', '.join(done)})", "info")
+    with RunGraph(run_id) as live_graph, RunProfile(run_id) as profile:
+        return run_task_graph(
+            graph, llm=llm, checkpoints=checkpoints, restored=restored, graph=live_graph, profile=profile,
+        )
+
+
+def run_research_mission(mission_name: str = "2025 AI Agent Trends Report", run_id: str = '', cache=None, stream=None) -> str:
     run = get_object_or_404(AgentRun, run_id=run_id)
     run.name = mission_name
 
     publish(run_id, "Manager", f"Starting mission: {mission_name}", "thought")
 
-    llm = ChatGroq(
-        model="groq/llama-3.1-8b-instant",
-        temperature=0,
-        api_key=SecretStr(os.getenv("GROQ_API_KEY",""))
-    )
+    llm = build_llm(run_id, temperature=0, cache=cache, stream=stream)
 
     researcher = Agent(
         role="Senior Research Analyst",
         goal=f"Find the hottest features/ trends for {mission_name}",
         backstory="World-class researcher at top VC firm",
         llm=llm,
-        verbose=False,
+        verbose=crew_verbose(),
         allow_delegation=False,
     )
 
@@ -108,103 +146,85 @@ def run_research_mission(mission_name: str = "2025 AI Agent Trends Report", run_
         goal="Write viral LinkedIn posts",
         backstory="Ex-tech journalist with 2M followers",
         llm=llm,
-        verbose=False,
+        verbose=crew_verbose(),
         allow_delegation=False,
     )
 
     task1 = Task(description="List top 5 features/ trends  with sources", expected_output="Bullet list with links", agent=researcher)
     task2 = Task(description="Turn the research into a viral LinkedIn post <280 words", expected_output="Ready-to-post text", agent=writer)
 
-    def process_callback(output):
-        if hasattr(output, 'raw_output'):
-            text = output.raw_output
-        elif hasattr(output, 'result'):
-            text = output.result
-        elif hasattr(output, 'output'):
-            text = output.output
-        else:
-            text = str(output)
-
-        if "Final Answer" in text:
-            agent_name = "Tech Writer" if "writer" in text.lower() else "Senior Research Analyst"
-            publish(run_id, agent_name, text.strip(), "final")
-        else:
-            agent_name = "Senior Research Analyst" if "researcher" in text.lower() else "Tech Writer"
-            publish(run_id, agent_name, text.strip(), "thought")
-
-    crew = Crew(
-        agents=[researcher, writer],
-        tasks=[task1, task2],
-        verbose=False,
-        step_callback=process_callback,
-    )
+    for agent in (researcher, writer):
+        agent.step_callback = agent_step_callback(run_id, agent.role)
 
-    result = crew.kickoff()
-    print("[DJANGO DEBUG] kickoff complete - publishing final")
+    # The same order Process.sequential would use, with a checkpoint after
+    # the research so a failed post does not pay for it twice
+    graph = [
+        TaskNode("research", task1),
+        TaskNode("post", task2, depends_on=["research"]),
+    ]
 
-    publish(run_id, "Manager", f"Mission completed!\n\n{result}", "final")
+    with tracer.start_as_current_span("crew.kickoff", attributes={"run.id": str(run_id)}):
+        result = run_checkpointed(run_id, graph, llm)
+    logger.info("Kickoff complete, publishing final", extra={"run_id": str(run_id)})
 
-    run.status = "completed"
-    run.finished_at = timezone.now()
-    run.save()
+    publish(run_id, "Manager", f"Mission completed!\n\n{result}", "final", usage=result.token_usage)
+
+    close_buffer(run_id)
+    run.mark_finished("completed")
 
     return run_id
 
 
-def run_feasibility_mission(idea: str = "Uber for Dog Walking in Rural Areas", run_id: str = '') -> str:
+def run_feasibility_mission(idea: str = "Uber for Dog Walking in Rural Areas", run_id: str = '', cache=None, stream=None) -> str:
     mission_name = f"Feasibility Sprint: {idea}"
     run = get_object_or_404(AgentRun, run_id=run_id)
     run.name = mission_name
     publish(run_id, "Manager", f"Starting 6-Agent Sprint for: {idea}", "thought")
 
     # Limit to 5900 tokens to meet api requirements
-    llm = ChatGroq(
-        model="groq/llama-3.1-8b-instant",
-        temperature=0.3,
-        max_tokens=5900,
-    )
+    llm = build_llm(run_id, temperature=0.3, max_tokens=5900, cache=cache, stream=stream)
 
     # 6 Agents
     product_mgr = Agent(
         role="Product Manager",
         goal="Define the core value proposition concisely.",
         backstory="You focus on viability. You hate fluff. You want to know WHO needs this.",
-        llm=llm, verbose=True, allow_delegation=False
+        llm=llm, verbose=crew_verbose(), allow_delegation=False
     )
 
     ux_designer = Agent(
         role="Lead UX Designer",
         goal="Identify top 3 user friction points.",
         backstory="You advocate for the user. You foresee usability nightmares in rural settings.",
-        llm=llm, verbose=True, allow_delegation=False
+        llm=llm, verbose=crew_verbose(), allow_delegation=False
     )
 
     tech_lead = Agent(
         role="Engineering Lead",
         goal="Assess technical feasibility and connectivity issues.",
         backstory="You are a pragmatist. You worry about GPS signals in the woods.",
-        llm=llm, verbose=True, allow_delegation=False
+        llm=llm, verbose=crew_verbose(), allow_delegation=False
     )
 
     marketer = Agent(
         role="Marketing Specialist",
         goal="Define the target audience and one viral hook.",
         backstory="You know how to sell ice to eskimos, but you need a real market here.",
-        llm=llm, verbose=True, allow_delegation=False
+        llm=llm, verbose=crew_verbose(), allow_delegation=False
     )
 
     legal_advisor = Agent(
         role="Legal Counsel",
         goal="Spot the biggest liability risk.",
         backstory="You protect the company. You worry about dog bites and trespassing laws.",
-        llm=llm, verbose=True, allow_delegation=False
+        llm=llm, verbose=crew_verbose(), allow_delegation=False
     )
 
     qa_specialist = Agent(
         role="QA Strategist",
         goal="Define the 'Happy Path' vs 'Edge Cases'.",
         backstory="You break things. You wonder what happens when the dog runs away.",
-        llm=llm, verbose=True, allow_delegation=False
+        llm=llm, verbose=crew_verbose(), allow_delegation=False
     )
 
     # Tasks
@@ -245,51 +265,24 @@ def run_feasibility_mission(idea: str = "Uber for Dog Walking in Rural Areas", r
         agent=qa_specialist
     )
 
-    def process_callback(output):
-        text = "No output"
-        if hasattr(output, 'raw_output'):
-            text = output.raw_output
-        elif hasattr(output, 'result'):
-            text = output.result
-        elif hasattr(output, 'output'):
-            text = output.output
-        else:
-            text = str(output)
-
-        # Enforce content length check on the output side (Double check)
-        if len(text) > 23000:
-            text = text[:23000] + "... [TRUNCATED]"
-
-        agent_identity = "Agent"
-        if "value prop" in text.lower():
-            agent_identity = "Product Manager"
-        elif "friction" in text.lower():
-            agent_identity = "UX Designer"
-        elif "connectivity" in text.lower():
-            agent_identity = "Engineering Lead"
-        elif "persona" in text.lower():
-            agent_identity = "Marketing Specialist"
-        elif "liability" in text.lower():
-            agent_identity = "Legal Counsel"
-        elif "edge case" in text.lower():
-            agent_identity = "QA Strategist"
+    # Enforce content length check on the output side
+    for agent in (product_mgr, ux_designer, tech_lead, marketer, legal_advisor, qa_specialist):
+        agent.step_callback = agent_step_callback(run_id, agent.role, max_length=23000)
 
-        msg_type = "final" if "Final Answer" in text else "thought"
-        publish(run_id, agent_identity, text, msg_type)
-
-        # print("[DJANGO DEBUG] Rate-limit pause: sleeping 60 seconds before next agent...")
-        # time.sleep(60)
-
-    crew = Crew(
-        agents=[product_mgr, ux_designer, tech_lead, marketer, legal_advisor, qa_specialist],
-        tasks=[task_pm, task_ux, task_tech, task_mkt, task_legal, task_qa],
-        verbose=True,
-        step_callback=process_callback
-    )
+    # Every specialist builds on the value prop; QA also needs the UX and
+    # tech findings. Everything else runs in parallel.
+    graph = [
+        TaskNode("pm", task_pm),
+        TaskNode("ux", task_ux, depends_on=["pm"]),
+        TaskNode("tech", task_tech, depends_on=["pm"]),
+        TaskNode("marketing", task_mkt, depends_on=["pm"]),
+        TaskNode("legal", task_legal, depends_on=["pm"]),
+        TaskNode("qa", task_qa, depends_on=["ux", "tech"]),
+    ]
 
     try:
         publish(run_id, "Manager", "Starting Feasibility Sprint...", "info")
-        result = crew.kickoff()
+        result = run_checkpointed(run_id, graph, llm)
 
         # Final Format
         final_summary = f"""
@@ -298,42 +291,36 @@ def run_feasibility_mission(idea: str = "Uber for Dog Walking in Rural Areas", r
         {result}
         """
 
-        publish(run_id, "Manager", final_summary, "final")
+        publish(run_id, "Manager", final_summary, "final", usage=result.token_usage)
 
-        run.status = "completed"
-        run.result = str(result)
-        run.finished_at = timezone.now()
-        run.save()
+        close_buffer(run_id)
+        run.mark_finished("completed")
 
     except Exception as e:
         publish(run_id, "System", f"Error: {str(e)}", "error")
-        run.status = "failed"
-        run.save()
+        close_buffer(run_id)
+        run.mark_finished("failed")
 
     return run_id
 
 
-def run_conference_planing(mission_name: str = "Corporate Conference Planning", run_id: str = '') -> str:
+def run_conference_planing(mission_name: str = "Corporate Conference Planning", run_id: str = '', cache=None, stream=None) -> str:
     """
     Multi-agent system for planning a corporate conference.
-    Each agent handles a specific aspect with rate-limited outputs.
+    Each agent handles a specific aspect; independent agents run in parallel.
     """
     run = get_object_or_404(AgentRun, run_id=run_id)
     run.name = mission_name
     publish(run_id, "Manager", f"Starting mission: {mission_name}", "thought")
 
-    llm = ChatGroq(
-        model="groq/llama-3.1-8b-instant",
-        temperature=0.3,
-        max_tokens=5900
-    )
+    llm = build_llm(run_id, temperature=0.3, max_tokens=5900, cache=cache, stream=stream)
 
     venue_scout = Agent(
         role="Venue Scout",
         goal="Find 3 suitable venues for a 200-person tech conference. Output max 400 words.",
         backstory="Event space specialist with 15 years finding perfect venues",
         llm=llm,
-        verbose=False,
+        verbose=crew_verbose(),
         allow_delegation=False,
     )
 
@@ -342,7 +329,7 @@ def run_conference_planing(mission_name: str = "Corporate Conference Planning",
         goal="Design a menu for breakfast, lunch, and breaks. Output max 350 words.",
         backstory="Executive chef turned event catering expert",
         llm=llm,
-        verbose=False,
+        verbose=crew_verbose(),
         allow_delegation=False,
     )
 
@@ -351,7 +338,7 @@ def run_conference_planing(mission_name: str = "Corporate Conference Planning",
         goal="Create speaker lineup with 5 industry experts. Output max 400 words.",
         backstory="Former TEDx organizer with network of top tech speakers",
         llm=llm,
-        verbose=False,
+        verbose=crew_verbose(),
         allow_delegation=False,
     )
 
@@ -360,7 +347,7 @@ def run_conference_planing(mission_name: str = "Corporate Conference Planning",
         goal="List all audiovisual equipment and setup needs. Output max 300 words.",
         backstory="Sound engineer with expertise in conference production",
         llm=llm,
-        verbose=False,
+        verbose=crew_verbose(),
         allow_delegation=False,
     )
 
@@ -369,7 +356,7 @@ def run_conference_planing(mission_name: str = "Corporate Conference Planning",
         goal="Create promotional campaign for the event. Output max 400 words.",
         backstory="Digital marketing expert who has promoted 50+ conferences",
         llm=llm,
-        verbose=False,
+        verbose=crew_verbose(),
         allow_delegation=False,
     )
 
@@ -378,7 +365,7 @@ def run_conference_planing(mission_name: str = "Corporate Conference Planning",
         goal="Create itemized budget breakdown. Output max 350 words.",
         backstory="Financial planner specializing in event cost management",
         llm=llm,
-        verbose=False,
+        verbose=crew_verbose(),
         allow_delegation=False,
     )
 
@@ -387,7 +374,7 @@ def run_conference_planing(mission_name: str = "Corporate Conference Planning",
         goal="Build day-of schedule with all activities. Output max 300 words.",
         backstory="Operations manager known for flawless event execution",
         llm=llm,
-        verbose=False,
+        verbose=crew_verbose(),
         allow_delegation=False,
     )
 
@@ -440,60 +427,29 @@ def run_conference_planing(mission_name: str = "Corporate Conference Planning",
         agent=timeline
     )
 
-    def process_callback(output):
-        if hasattr(output, 'raw_output'):
-            text = output.raw_output
-        elif hasattr(output, 'result'):
-            text = output.result
-        elif hasattr(output, 'output'):
-            text = output.output
-        else:
-            text = str(output)
-
-        # Determine agent name from output
-        agent_map = {
-            "venue": "Venue Scout",
-            "catering": "Catering Coordinator",
-            "speaker": "Speaker Liaison",
-            "av": "AV Technical Specialist",
-            "audiovisual": "AV Technical Specialist",
-            "marketing": "Marketing Strategist",
-            "budget": "Budget Analyst",
-            "timeline": "Timeline Coordinator",
-            "schedule": "Timeline Coordinator"
-        }
-
-        agent_name = "Manager"
-        text_lower = text.lower()
-        for keyword, name in agent_map.items():
-            if keyword in text_lower:
-                agent_name = name
-                break
-
-        if "Final Answer" in text:
-            publish(run_id, agent_name, text.strip(), "final")
-        else:
-            publish(run_id, agent_name, text.strip(), "thought")
-
-        print("[DJANGO DEBUG] Rate-limit pause: sleeping 60 seconds before next agent...")
-        time.sleep(60)
-    crew = Crew(
-        agents=[venue_scout, catering, speaker_liaison, av_tech, marketing, budget, timeline],
-        tasks=[task1, task2, task3, task4, task5, task6, task7],
-        verbose=False,
-        process=Process.sequential,
-        step_callback=process_callback
-    )
+    for agent in (venue_scout, catering, speaker_liaison, av_tech, marketing, budget, timeline):
+        agent.step_callback = agent_step_callback(run_id, agent.role)
+
+    # Only the budget and the day-of schedule need earlier results, so the
+    # crew takes about as long as the slowest planner plus those two.
+    graph = [
+        TaskNode("venue", task1),
+        TaskNode("catering", task2),
+        TaskNode("speakers", task3),
+        TaskNode("av", task4),
+        TaskNode("marketing", task5),
+        TaskNode("budget", task6, depends_on=["venue", "catering", "speakers", "av", "marketing"]),
+        TaskNode("timeline", task7, depends_on=["venue", "catering", "speakers"]),
+    ]
 
-    result = crew.kickoff()
+    result = run_checkpointed(run_id, graph, llm)
 
     result_str = str(result)
 
-    print("[DJANGO DEBUG] kickoff complete - publishing final")
-    publish(run_id, "Manager", f"Mission completed!\n\n{result_str}", "final")
+    logger.info("Kickoff complete, publishing final", extra={"run_id": str(run_id)})
+    publish(run_id, "Manager", f"Mission completed!\n\n{result_str}", "final", usage=result.token_usage)
 
-    run.status = "completed"
-    run.finished_at = timezone.now()
-    run.save()
+    close_buffer(run_id)
+    run.mark_finished("completed")
 
     return run_id
\ No newline at end of file
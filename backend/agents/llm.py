@@ -0,0 +1,233 @@
+import logging
+import os
+import threading
+import time
+import uuid
+
+import litellm
+from crewai import LLM
+from crewai.events import crewai_event_bus
+from crewai.events.types.llm_events import LLMCallType, LLMStreamChunkEvent
+from litellm.integrations.custom_logger import CustomLogger
+from django.conf import settings
+from django.db.models import F
+
+from core.llm_cache import KEY_PARAMS, cache_key, get_llm_cache, resolve_mode
+from core.models import AgentRun
+from core.profiler import active_profile
+from core.rate_limit import get_rate_limiter, parse_reset
+from core.streaming import DeltaStream
+from core.telemetry import LLM_LATENCY, LLM_TOKENS, LLM_TOKENS_PER_SECOND, tracer
+from core.tokens import count_tokens, usage_tokens
+
+logger = logging.getLogger(__name__)
+
+
+def _observe_rate_limit_headers(kwargs, completion_response, start_time, end_time):
+    hidden = getattr(completion_response, "_hidden_params", None) or {}
+    headers = hidden.get("additional_headers")
+    model = kwargs.get("model")
+    if headers and model:
+        try:
+            get_rate_limiter(model).observe_headers(headers)
+        except Exception as e:
+            logger.warning("Could not apply rate-limit headers: %s", e, extra={"model": model})
+
+
+litellm.success_callback.append(_observe_rate_limit_headers)
+
+# The DeltaStream of the LLM call running on this thread. Stream chunk
+# events are handled synchronously on the emitting thread, so concurrent
+# agents each see their own stream.
+_streams = threading.local()
+
+
+@crewai_event_bus.on(LLMStreamChunkEvent)
+def _forward_stream_chunk(source, event):
+    stream = getattr(_streams, "current", None)
+    if stream is not None and event.call_type != LLMCallType.TOOL_CALL:
+        stream.feed(event.chunk)
+
+
+class UsageCapture(CustomLogger):
+    """
+    Per-call callback that keeps the provider-reported usage of one LLM call.
+
+    CrewAI also installs it as the process-wide `litellm.callbacks`, where a
+    concurrent call on another task thread can replace it or report to it,
+    so it only accepts usage reported on the thread that made the call.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.usage = None
+        self.thread = threading.get_ident()
+
+    def log_success_event(self, kwargs, response_obj, start_time, end_time):
+        if threading.get_ident() != self.thread:
+            return
+        usage = response_obj.get("usage") if isinstance(response_obj, dict) else getattr(response_obj, "usage", None)
+        if usage is not None:
+            self.usage = usage
+
+
+class MissionLLM(LLM):
+    """
+    CrewAI's LiteLLM-backed LLM with the mission plumbing in front of `call`:
+    cached responses are returned without touching the provider, every
+    other request first takes its share of the model's shared rate-limit
+    budget, 429s pause the budget for every worker, and time spent waiting
+    is added to the run's `throttled_seconds`. With `stream=True` token
+    chunks are published as coalesced `delta` events while the call runs.
+    Calls are recorded in the run's profile (core.profiler) against the
+    task and agent CrewAI passes in.
+
+    One instance serves every task thread of a mission (agents.scheduler).
+    Per-call state (the delta stream, the usage capture) is kept on the
+    calling thread, never on the instance, and the token totals are
+    updated under a lock.
+    """
+
+    run_id = ""
+    cache_mode = "off"
+    _usage_lock = threading.Lock()
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None, *args, **kwargs):
+        # Calls that execute functions or parse into a model have side effects
+        # or non-text results, so only plain completions go through the cache.
+        cacheable = self.cache_mode != "off" and not available_functions and not kwargs.get("response_model")
+        if cacheable:
+            key = cache_key(self.model, self._cache_params(tools), messages)
+            cached = get_llm_cache().get(key)
+            self._record_cache(hit=cached is not None)
+            if cached is not None:
+                profile = active_profile(self.run_id)
+                if profile is not None:
+                    profile.cache_hit(kwargs.get("from_task"), getattr(kwargs.get("from_agent"), "role", None))
+                return cached
+
+        result = self._call_provider(messages, tools, callbacks, available_functions, *args, **kwargs)
+        if cacheable and self.cache_mode == "readwrite" and isinstance(result, str) and result:
+            get_llm_cache().set(key, result)
+        return result
+
+    def _call_provider(self, messages, tools, callbacks, *args, **kwargs):
+        limiter = get_rate_limiter(self.model)
+        estimate = self._estimate_tokens(messages)
+        attempts = settings.LLM_RATE_LIMIT_RETRIES + 1
+        throttled = 0.0
+
+        for attempt in range(attempts):
+            waited = limiter.acquire(estimate)
+            self._record_throttle(waited)
+            throttled += waited
+            capture = UsageCapture()
+            agent_name = getattr(kwargs.get("from_agent"), "role", None) or "Agent"
+            stream = self._start_stream(kwargs.get("from_agent"))
+            with tracer.start_as_current_span("llm.call", attributes={
+                "llm.model": self.model, "agent.name": agent_name, "run.id": self.run_id, "llm.attempt": attempt,
+            }) as span:
+                started = time.perf_counter()
+                try:
+                    result = super().call(messages, tools, [*(callbacks or []), capture], *args, **kwargs)
+                except litellm.exceptions.RateLimitError as e:
+                    retry_after = parse_reset(self._retry_after(e)) or 2 ** attempt
+                    logger.warning("%s rate limited, retrying in %.1fs", self.model, retry_after, extra={
+                        "run_id": self.run_id, "agent_name": agent_name, "attempt": attempt,
+                    })
+                    span.set_attribute("llm.retry_after", retry_after)
+                    limiter.block(retry_after)
+                    if attempt == attempts - 1:
+                        raise
+                    continue
+                finally:
+                    self._end_stream(stream)
+
+                elapsed = time.perf_counter() - started
+                prompt_tokens, completion_tokens = usage_tokens(capture.usage)
+                self._observe_call(span, agent_name, elapsed, prompt_tokens, completion_tokens)
+
+            profile = active_profile(self.run_id)
+            if profile is not None:
+                profile.llm_call(
+                    kwargs.get("from_task"), agent_name, elapsed, throttled=throttled,
+                    first_token=stream.first_chunk_seconds if stream is not None else None,
+                    usage=capture.usage, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                    retries=attempt,
+                )
+
+            if prompt_tokens is not None:
+                limiter.settle(estimate, prompt_tokens + completion_tokens)
+            return result
+
+    def _track_token_usage_internal(self, usage_data) -> None:
+        with self._usage_lock:
+            super()._track_token_usage_internal(usage_data)
+
+    def _observe_call(self, span, agent_name, elapsed, prompt_tokens, completion_tokens):
+        LLM_LATENCY.labels(agent=agent_name, model=self.model).observe(elapsed)
+        if prompt_tokens is None:
+            return
+        span.set_attribute("llm.prompt_tokens", prompt_tokens)
+        span.set_attribute("llm.completion_tokens", completion_tokens)
+        LLM_TOKENS.labels(agent=agent_name, kind="prompt").inc(prompt_tokens)
+        LLM_TOKENS.labels(agent=agent_name, kind="completion").inc(completion_tokens)
+        if elapsed > 0 and completion_tokens:
+            LLM_TOKENS_PER_SECOND.labels(agent=agent_name).observe(completion_tokens / elapsed)
+
+    def _start_stream(self, agent):
+        if not (self.stream and self.run_id):
+            return None
+        agent_name = getattr(agent, "role", None) or "Agent"
+        _streams.current = DeltaStream(self.run_id, agent_name, step=uuid.uuid4().hex[:12])
+        return _streams.current
+
+    @staticmethod
+    def _end_stream(stream):
+        if stream is not None:
+            _streams.current = None
+            stream.close()
+
+    def _cache_params(self, tools) -> dict:
+        params = {name: getattr(self, name, None) for name in KEY_PARAMS}
+        params["tools"] = tools
+        return params
+
+    def _estimate_tokens(self, messages) -> int:
+        if isinstance(messages, str):
+            prompt = messages
+        else:
+            prompt = "\n".join(str(message.get("content") or "") for message in messages)
+        completion = min(self.max_tokens or settings.LLM_COMPLETION_ESTIMATE, settings.LLM_COMPLETION_ESTIMATE)
+        return count_tokens(prompt, self.model) + completion
+
+    @staticmethod
+    def _retry_after(error):
+        headers = getattr(error, "litellm_response_headers", None)
+        if headers is None:
+            headers = getattr(getattr(error, "response", None), "headers", None)
+        if not headers:
+            return None
+        return headers.get("retry-after") or headers.get("x-ratelimit-reset-tokens")
+
+    def _record_throttle(self, waited: float):
+        if waited and self.run_id:
+            AgentRun.objects.filter(run_id=self.run_id).update(throttled_seconds=F("throttled_seconds") + waited)
+
+    def _record_cache(self, hit: bool):
+        if self.run_id:
+            field = "cache_hits" if hit else "cache_misses"
+            AgentRun.objects.filter(run_id=self.run_id).update(**{field: F(field) + 1})
+
+
+def build_llm(run_id, temperature: float = 0.3, max_tokens=None, cache=None, stream=None) -> MissionLLM:
+    llm = MissionLLM(
+        model=settings.MISSION_LLM_MODEL,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        stream=settings.MISSION_STREAM_TOKENS if stream is None else stream,
+        api_key=os.getenv("GROQ_API_KEY", ""),
+    )
+    llm.run_id = str(run_id)
+    llm.cache_mode = resolve_mode(cache, temperature)
+    return llm
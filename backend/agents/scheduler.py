@@ -0,0 +1,167 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.db import connections
+
+from core.telemetry import attach_context, current_context, detach_context, tracer
+
+
+class TaskNode:
+    """A crew task plus the names of the tasks whose output it needs as context."""
+
+    def __init__(self, name: str, task, depends_on=()):
+        self.name = name
+        self.task = task
+        self.depends_on = tuple(depends_on)
+
+
+class RestoredOutput:
+    """A task output loaded from a checkpoint instead of produced by the LLM."""
+
+    def __init__(self, raw: str):
+        self.raw = raw
+
+    def __str__(self):
+        return self.raw
+
+
+class GraphResult:
+    """
+    Outputs of every task, merged into one report in declaration order so
+    the result does not depend on which task happened to finish first.
+    """
+
+    def __init__(self, nodes, outputs: dict, token_usage):
+        self.tasks_output = [outputs[node.name] for node in nodes]
+        self.token_usage = token_usage
+        self.raw = "\n\n".join(
+            f"## {node.task.agent.role}\n\n{outputs[node.name].raw}" for node in nodes
+        )
+
+    def __str__(self):
+        return self.raw
+
+
+def check_graph(nodes) -> None:
+    """Raises ValueError for duplicate names, unknown dependencies or cycles."""
+    names = [node.name for node in nodes]
+    if len(set(names)) != len(names):
+        raise ValueError("Duplicate task names in mission graph")
+
+    by_name = {node.name: node for node in nodes}
+    for node in nodes:
+        unknown = set(node.depends_on) - by_name.keys()
+        if unknown:
+            raise ValueError(f"Task {node.name} depends on unknown task(s): {', '.join(sorted(unknown))}")
+
+    done = set()
+    remaining = list(nodes)
+    while remaining:
+        ready = [node for node in remaining if set(node.depends_on) <= done]
+        if not ready:
+            raise ValueError(f"Mission graph has a cycle among: {', '.join(n.name for n in remaining)}")
+        done.update(node.name for node in ready)
+        remaining = [node for node in remaining if node.name not in done]
+
+
+def _execute(node, context: str, trace_context, profile=None):
+    # Pool threads do not inherit the mission's trace context
+    token = attach_context(trace_context)
+    try:
+        with tracer.start_as_current_span("crew.task", attributes={
+            "task.name": node.name, "agent.name": node.task.agent.role,
+        }):
+            # Timed here rather than on submit, so time queued for a pool slot is not counted
+            if profile is not None:
+                profile.task_started(node.name)
+            try:
+                output = node.task.execute_sync(agent=node.task.agent, context=context or None)
+            except BaseException:
+                if profile is not None:
+                    profile.task_finished(node.name, failed=True)
+                raise
+            if profile is not None:
+                profile.task_finished(node.name)
+            return output
+    finally:
+        detach_context(token)
+        # Pool threads get their own DB connections from the LLM accounting
+        connections.close_all()
+
+
+def run_task_graph(
+    nodes, llm=None, max_concurrency=None, checkpoints=None, restored=None, graph=None, profile=None,
+) -> GraphResult:
+    """
+    Runs crew tasks as a dependency graph instead of `Process.sequential`.
+
+    A task starts as soon as everything it depends on has finished, with at
+    most `max_concurrency` (default MISSION_TASK_CONCURRENCY) tasks running
+    at once. Each task gets the outputs of its dependencies, in the order
+    they are declared, as context. Provider quotas are still enforced by
+    the shared rate limiter in front of the LLM, so the cap only bounds how
+    many requests queue on it.
+
+    With `checkpoints` (core.checkpoints.RunCheckpoints), every finished
+    task's output is saved, and tasks saved by an earlier attempt of the
+    run are not run again: their stored output is used as context instead.
+    Callers that already loaded the checkpoints pass them as `restored`.
+
+    With `graph` (core.graph.RunGraph), the task graph and every task's
+    start and finish are published to the run's live graph. With
+    `profile` (core.profiler.RunProfile), each task's timings are recorded.
+    """
+    nodes = list(nodes)
+    check_graph(nodes)
+    max_concurrency = max(1, max_concurrency or settings.MISSION_TASK_CONCURRENCY)
+
+    if restored is None:
+        restored = checkpoints.load() if checkpoints is not None else {}
+    outputs = {node.name: RestoredOutput(restored[node.name]) for node in nodes if node.name in restored}
+    pending = [node for node in nodes if node.name not in outputs]
+    running = {}
+    trace_context = current_context()
+    if graph is not None:
+        graph.define(nodes, restored=outputs.keys())
+    if profile is not None:
+        profile.define(nodes, restored=outputs.keys())
+
+    with ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="mission-task") as pool:
+        try:
+            while pending or running:
+                # Declaration order breaks ties so runs schedule the same way
+                for node in list(pending):
+                    if len(running) >= max_concurrency:
+                        break
+                    if all(dep in outputs for dep in node.depends_on):
+                        context = "\n\n".join(outputs[dep].raw for dep in node.depends_on)
+                        running[pool.submit(_execute, node, context, trace_context, profile)] = node
+                        pending.remove(node)
+                        if graph is not None:
+                            graph.task_started(node.name)
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    node = running.pop(future)
+                    try:
+                        outputs[node.name] = future.result()
+                    except BaseException:
+                        if graph is not None:
+                            graph.task_finished(node.name, failed=True)
+                        raise
+                    if graph is not None:
+                        graph.task_finished(node.name)
+                    if checkpoints is not None:
+                        checkpoints.save(node.name, node.task.agent.role, outputs[node.name].raw)
+        except BaseException:
+            for future in running:
+                future.cancel()
+            if graph is not None:
+                graph.finish(failed=True)
+            raise
+
+    if graph is not None:
+        graph.finish()
+
+    token_usage = llm.get_token_usage_summary() if llm is not None else None
+    return GraphResult(nodes, outputs, token_usage)
@@ -33,6 +33,7 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = "app.urls"
 WSGI_APPLICATION = "app.wsgi.application"
+ASGI_APPLICATION = "app.asgi.application"
 
 
 LANGUAGE_CODE = "en-us"
@@ -46,6 +47,132 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 os.environ["GROQ_API_KEY"] = os.getenv("GROQ_API_KEY", "sk-...")
 
+# Mission workers (python manage.py run_mission_workers)
+MISSION_WORKER_PROCESSES = int(os.getenv("MISSION_WORKER_PROCESSES", "2"))
+MISSION_WORKER_CONCURRENCY = int(os.getenv("MISSION_WORKER_CONCURRENCY", "1"))
+MISSION_WORKER_HEARTBEAT_TTL = int(os.getenv("MISSION_WORKER_HEARTBEAT_TTL", "30"))
+MISSION_MAX_ATTEMPTS = int(os.getenv("MISSION_MAX_ATTEMPTS", "2"))
+# Independent crew tasks run concurrently within a mission (agents.scheduler); 1 runs them in order
+MISSION_TASK_CONCURRENCY = int(os.getenv("MISSION_TASK_CONCURRENCY", "5"))
+
+# Admission control (core.mission_queue). Set MISSION_MAX_RUNNING to what the
+# provider quota sustains; MISSION_TYPE_LIMITS caps types, e.g. "feasibility=2,conference=1".
+MISSION_MAX_RUNNING = int(os.getenv("MISSION_MAX_RUNNING", "2"))
+MISSION_TYPE_LIMITS = {
+    mission_type.strip(): int(limit)
+    for mission_type, _, limit in (
+        item.partition("=") for item in os.getenv("MISSION_TYPE_LIMITS", "").split(",") if item.strip()
+    )
+}
+# Pending missions beyond this are rejected with 429; waiting longer than the timeout expires them
+MISSION_QUEUE_MAX = int(os.getenv("MISSION_QUEUE_MAX", "20"))
+MISSION_QUEUE_TIMEOUT = int(os.getenv("MISSION_QUEUE_TIMEOUT", str(15 * 60)))
+MISSION_DEFAULT_PRIORITY = int(os.getenv("MISSION_DEFAULT_PRIORITY", "5"))
+MISSION_MAX_PRIORITY = 9
+# Slot leases are renewed by the running worker; a lost worker's slot frees after this
+MISSION_SLOT_LEASE = int(os.getenv("MISSION_SLOT_LEASE", "90"))
+# Start-time estimates before there are finished runs to average
+MISSION_DEFAULT_DURATION = float(os.getenv("MISSION_DEFAULT_DURATION", "120"))
+
+# Write-behind AgentMessage persistence (core.persistence)
+MESSAGE_FLUSH_SIZE = int(os.getenv("MESSAGE_FLUSH_SIZE", "20"))
+MESSAGE_FLUSH_INTERVAL = float(os.getenv("MESSAGE_FLUSH_INTERVAL", "0.5"))
+# AgentMessage.content is zstd-compressed from this size up (core.fields), with
+# the newest dictionary from `manage.py train_compression_dictionary` if any
+MESSAGE_COMPRESS_MIN_BYTES = int(os.getenv("MESSAGE_COMPRESS_MIN_BYTES", "512"))
+MESSAGE_COMPRESS_LEVEL = int(os.getenv("MESSAGE_COMPRESS_LEVEL", "3"))
+MESSAGE_COMPRESS_DICTIONARY = os.getenv("MESSAGE_COMPRESS_DICTIONARY", "true").lower() == "true"
+MESSAGE_COMPRESS_DICTIONARY_REFRESH = int(os.getenv("MESSAGE_COMPRESS_DICTIONARY_REFRESH", "300"))
+# zstd/gzip Content-Encoding for JSON and page responses at least this large
+RESPONSE_COMPRESS_MIN_BYTES = int(os.getenv("RESPONSE_COMPRESS_MIN_BYTES", "1024"))
+
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", "50"))
+# Messages inlined in run_detail and returned per page by api/runs/<id>/messages/
+MESSAGE_PAGE_SIZE = int(os.getenv("MESSAGE_PAGE_SIZE", "100"))
+MESSAGE_PAGE_MAX = int(os.getenv("MESSAGE_PAGE_MAX", "1000"))
+
+# Message retention (core.retention). On PostgreSQL core_agent_message is
+# partitioned by month; `manage.py archive_runs` moves completed runs older than
+# MESSAGE_ARCHIVE_AFTER_DAYS to Parquet files under MESSAGE_ARCHIVE_DIR.
+MESSAGE_ARCHIVE_DIR = os.getenv("MESSAGE_ARCHIVE_DIR", str(BASE_DIR / "archive"))
+MESSAGE_ARCHIVE_AFTER_DAYS = int(os.getenv("MESSAGE_ARCHIVE_AFTER_DAYS", "90"))
+MESSAGE_ARCHIVE_BATCH_RUNS = int(os.getenv("MESSAGE_ARCHIVE_BATCH_RUNS", "500"))
+MESSAGE_ARCHIVE_ROW_GROUP = int(os.getenv("MESSAGE_ARCHIVE_ROW_GROUP", "10000"))
+MESSAGE_PARTITION_MONTHS_AHEAD = int(os.getenv("MESSAGE_PARTITION_MONTHS_AHEAD", "3"))
+
+# Streaming exports (core.export): NDJSON goes out in chunks of about
+# EXPORT_CHUNK_BYTES, Parquet one row group of EXPORT_PARQUET_ROW_GROUP messages at a time
+EXPORT_CHUNK_BYTES = int(os.getenv("EXPORT_CHUNK_BYTES", str(256 * 1024)))
+EXPORT_PARQUET_ROW_GROUP = int(os.getenv("EXPORT_PARQUET_ROW_GROUP", "20000"))
+EXPORT_FETCH_SIZE = int(os.getenv("EXPORT_FETCH_SIZE", "2000"))
+EXPORT_ZSTD_LEVEL = int(os.getenv("EXPORT_ZSTD_LEVEL", "3"))
+
+# Full-text search (core.search). Runs are ranked from the newest
+# SEARCH_MAX_CANDIDATES matching messages, which bounds very common terms.
+SEARCH_PAGE_SIZE = int(os.getenv("SEARCH_PAGE_SIZE", "20"))
+SEARCH_PAGE_MAX = int(os.getenv("SEARCH_PAGE_MAX", "100"))
+SEARCH_MAX_CANDIDATES = int(os.getenv("SEARCH_MAX_CANDIDATES", "5000"))
+SEARCH_SNIPPET_CHARS = int(os.getenv("SEARCH_SNIPPET_CHARS", "200"))
+
+# Token accounting (core.tokens). Prices are USD per 1M tokens.
+MISSION_LLM_MODEL = os.getenv("MISSION_LLM_MODEL", "groq/llama-3.1-8b-instant")
+MODEL_PRICING = {
+    "groq/llama-3.1-8b-instant": {"prompt": 0.05, "completion": 0.08},
+    "default": {"prompt": 0.05, "completion": 0.08},
+}
+
+# Shared LLM rate limits per model (core.rate_limit), matching the provider quota
+LLM_RATE_LIMITS = {
+    "groq/llama-3.1-8b-instant": {"rpm": 30, "tpm": 6000},
+    "default": {"rpm": 30, "tpm": 6000},
+}
+# Completion tokens reserved up front per call; settled against real usage after
+LLM_COMPLETION_ESTIMATE = int(os.getenv("LLM_COMPLETION_ESTIMATE", "500"))
+LLM_RATE_LIMIT_MAX_SLEEP = float(os.getenv("LLM_RATE_LIMIT_MAX_SLEEP", "5"))
+LLM_RATE_LIMIT_RETRIES = int(os.getenv("LLM_RATE_LIMIT_RETRIES", "5"))
+
+# Token-level streaming (core.streaming): chunks are coalesced into one
+# `delta` event per interval or per this many chunks, whichever comes first
+MISSION_STREAM_TOKENS = os.getenv("MISSION_STREAM_TOKENS", "false").lower() == "true"
+STREAM_DELTA_INTERVAL = float(os.getenv("STREAM_DELTA_INTERVAL", "0.05"))
+STREAM_DELTA_CHUNKS = int(os.getenv("STREAM_DELTA_CHUNKS", "16"))
+
+# ASGI server (`manage.py serve`): uvicorn worker processes; ASGI_RELOAD restarts on code changes
+ASGI_WORKERS = int(os.getenv("ASGI_WORKERS", "2"))
+ASGI_RELOAD = os.getenv("ASGI_RELOAD", "false").lower() == "true"
+# PostgreSQL connection pool per process (psycopg_pool). Under ASGI every request
+# runs its ORM calls on its own thread, so CONN_MAX_AGE connections are not reused;
+# the pool is. Connections are checked before they are handed out.
+DATABASE_POOL = os.getenv("DATABASE_POOL", "false").lower() == "true"
+DATABASE_POOL_MIN_SIZE = int(os.getenv("DATABASE_POOL_MIN_SIZE", "2"))
+DATABASE_POOL_MAX_SIZE = int(os.getenv("DATABASE_POOL_MAX_SIZE", "10"))
+# Seconds a request waits for a free connection before failing
+DATABASE_POOL_TIMEOUT = float(os.getenv("DATABASE_POOL_TIMEOUT", "10"))
+DATABASE_POOL_MAX_IDLE = float(os.getenv("DATABASE_POOL_MAX_IDLE", "300"))
+DATABASE_POOL_MAX_LIFETIME = float(os.getenv("DATABASE_POOL_MAX_LIFETIME", "1800"))
+
+# Content-addressed LLM response cache (core.llm_cache): "lru", "disk" or "redis"
+LLM_CACHE_BACKEND = os.getenv("LLM_CACHE_BACKEND", "redis")
+# Mode for deterministic (temperature 0) calls when a mission does not set one
+LLM_CACHE_DEFAULT_MODE = os.getenv("LLM_CACHE_DEFAULT_MODE", "readwrite")
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000"))
+LLM_CACHE_DIR = os.getenv("LLM_CACHE_DIR", str(BASE_DIR / ".llm_cache"))
+LLM_CACHE_DISK_SIZE_LIMIT = int(os.getenv("LLM_CACHE_DISK_SIZE_LIMIT", str(512 * 1024 * 1024)))
+
+# Structured logging (core.log): JSON lines written from a background thread.
+# LOG_LEVELS sets per-module levels, e.g. "core.redis_client=DEBUG,agents.crew_mission=DEBUG";
+# agents.crew_mission at DEBUG also turns on CrewAI's verbose console output.
+LOGGING_CONFIG = "core.log.configure_logging"
+LOGGING = {
+    "level": os.getenv("LOG_LEVEL", "INFO"),
+    "levels": os.getenv("LOG_LEVELS", ""),
+    "format": os.getenv("LOG_FORMAT", "json"),
+    # Per-message DEBUG lines: fraction kept, and max per second per call site
+    "debug_sample_rate": float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "1.0")),
+    "debug_rate_limit": float(os.getenv("LOG_DEBUG_RATE_LIMIT", "20")),
+}
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -82,9 +209,26 @@ DATABASES = {
             "HOST": os.getenv("POSTGRES_HOST", "postgres"),
             "PORT": os.getenv("POSTGRES_PORT", "5432"),
             "CONN_MAX_AGE": 600,
+            "CONN_HEALTH_CHECKS": True,
     }
 }
 
+if DATABASE_POOL:
+    from psycopg_pool import ConnectionPool
+
+    # The pool replaces persistent connections; Django refuses both at once
+    DATABASES["default"]["CONN_MAX_AGE"] = 0
+    DATABASES["default"]["OPTIONS"] = {
+        "pool": {
+            "min_size": DATABASE_POOL_MIN_SIZE,
+            "max_size": DATABASE_POOL_MAX_SIZE,
+            "timeout": DATABASE_POOL_TIMEOUT,
+            "max_idle": DATABASE_POOL_MAX_IDLE,
+            "max_lifetime": DATABASE_POOL_MAX_LIFETIME,
+            "check": ConnectionPool.check_connection,
+        },
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
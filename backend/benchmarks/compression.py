@@ -0,0 +1,193 @@
+"""
+Storage and bandwidth of agent message bodies: raw versus zstd, zstd with
+a trained dictionary, and gzip/zstd Content-Encoding on the endpoints.
+
+    python -m benchmarks.compression                       # synthetic agent output
+    python -m benchmarks.compression --from-db             # runs in the benchmark database
+    python -m benchmarks.compression --source-db db.sqlite3
+
+--from-db measures the messages of real runs already in the benchmark's
+SQLite file; --source-db reads them from another SQLite database with the
+pre-compression text column. Otherwise it generates markdown-like agent
+output with the size spread of the feasibility crew (up to 23,000
+characters). The benchmark database is then reseeded with the messages
+for the endpoint measurements. Prints one JSON line per measurement.
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import time
+import uuid
+from datetime import timedelta
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "benchmarks.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from core.compression import StreamCompressor, compress_body, decode_text, encode_text, train_dictionary  # noqa: E402
+from core.fields import forget_dictionaries  # noqa: E402
+from core.models import AgentMessage, AgentRun, CompressionDictionary  # noqa: E402
+
+AGENTS = ["Product Manager", "Lead UX Designer", "Engineering Lead", "Marketing Specialist", "Legal Counsel"]
+HEADINGS = ["Summary", "Key Risks", "Target Audience", "Technical Feasibility", "Recommendations", "Next Steps"]
+PHRASES = [
+    "rural connectivity is intermittent, so the app must work offline first",
+    "dog owners in low-density areas value reliability over price",
+    "liability insurance for walkers is the largest fixed cost",
+    "GPS accuracy under tree cover drops below 20 meters",
+    "a referral program through local vet clinics keeps acquisition cheap",
+    "walkers need background checks and a clear incident process",
+    "the happy path is a booked walk with live tracking and a photo report",
+    "edge cases include missed pickups, aggressive dogs and road closures",
+    "pricing should start at a flat fee per walk with distance surcharges",
+    "the MVP needs booking, payments, tracking and ratings",
+]
+
+
+# Free text is drawn from a vocabulary of the phrases' words, so bodies
+# share structure and terms without repeating whole sentences
+VOCABULARY = sorted({word for phrase in PHRASES for word in phrase.replace(",", "").split()})
+
+
+def sentence(rng) -> str:
+    words = [rng.choice(VOCABULARY) for _ in range(rng.randint(8, 24))]
+    return " ".join(words).capitalize() + "."
+
+
+def synthetic_message(rng) -> str:
+    parts = []
+    for heading in rng.sample(HEADINGS, rng.randint(1, len(HEADINGS))):
+        parts.append(f"## {heading}\n")
+        for _ in range(rng.randint(2, 12)):
+            parts.append(f"- **{rng.choice(AGENTS)}**: {rng.choice(PHRASES)} ({rng.randint(1, 99)}%). {sentence(rng)}")
+        parts.append(" ".join(sentence(rng) for _ in range(rng.randint(1, 6))))
+        parts.append("")
+    text = "\n".join(parts)
+    # Some outputs run long, up to the callback's truncation limit
+    while rng.random() < 0.35 and len(text) < 23000:
+        text += "\n\n" + synthetic_message(rng)
+    return text[:23000]
+
+
+def load_texts(args):
+    if args.source_db:
+        with sqlite3.connect(args.source_db) as db:
+            rows = db.execute("SELECT content FROM core_agent_message ORDER BY id").fetchall()
+        return [content for (content,) in rows if isinstance(content, str)]
+    if args.from_db:
+        return list(AgentMessage.objects.order_by("id").values_list("content", flat=True))
+    rng = random.Random(7)
+    return [synthetic_message(rng) for _ in range(args.messages)]
+
+
+def report(case, **values):
+    print(json.dumps({"case": case, **values}))
+
+
+def storage_case(texts, min_size, level):
+    half = len(texts) // 2
+    train, test = texts[:half], texts[half:]
+    compressible = [text for text in train if len(text.encode()) >= min_size] or train
+    dictionary = train_dictionary(compressible, size=min(112 * 1024, max(4096, sum(map(len, compressible)) // 20)))
+
+    raw = sum(len(text.encode()) for text in test)
+    plain = [encode_text(text, min_size=min_size, level=level) for text in test]
+    with_dict = [encode_text(text, min_size=min_size, level=level, dictionary=dictionary) for text in test]
+
+    started = time.perf_counter()
+    for text, body in zip(test, with_dict):
+        assert decode_text(body, dictionary if body[:1] == b"\x01" else None) == text
+    decode_s = time.perf_counter() - started
+
+    report(
+        "storage", messages=len(test), raw_bytes=raw,
+        zstd_bytes=sum(map(len, plain)), zstd_ratio=round(raw / sum(map(len, plain)), 2),
+        zstd_dict_bytes=sum(map(len, with_dict)), zstd_dict_ratio=round(raw / sum(map(len, with_dict)), 2),
+        dictionary_bytes=len(dictionary.as_bytes()), decode_mb_per_s=round(raw / 1e6 / max(decode_s, 1e-9), 1),
+    )
+    return dictionary
+
+
+def seed_run(texts, dictionary):
+    call_command("flush", interactive=False, verbosity=0)
+    CompressionDictionary.objects.create(dict_id=dictionary.dict_id(), data=dictionary.as_bytes())
+    forget_dictionaries()
+    started = timezone.now()
+    run = AgentRun.objects.create(run_id=uuid.uuid4(), name="benchmark: compression", status="completed",
+                                  finished_at=started, message_count=len(texts))
+    AgentMessage.objects.bulk_create([
+        AgentMessage(run=run, seq=seq, agent_name=AGENTS[seq % len(AGENTS)], content=text, message_type="thought",
+                     timestamp=started + timedelta(milliseconds=seq))
+        for seq, text in enumerate(texts, start=1)
+    ], batch_size=500)
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT SUM(LENGTH(content)) FROM core_agent_message")
+        stored = cursor.fetchone()[0]
+    report("stored_column", messages=len(texts), raw_bytes=sum(len(text.encode()) for text in texts), stored_bytes=stored)
+    return run
+
+
+def bandwidth_case(run, texts):
+    client = Client()
+    for name, url in (
+        ("run_messages", f"/api/runs/{run.run_id}/messages/?limit={settings.MESSAGE_PAGE_MAX}"),
+        ("run_detail", f"/run/{run.run_id}/"),
+        ("history_api", "/api/history/"),
+    ):
+        sizes = {}
+        for encoding in ("identity", "gzip", "zstd"):
+            response = client.get(url, HTTP_ACCEPT_ENCODING=encoding)
+            sizes[encoding] = len(response.content)
+        report("bandwidth", endpoint=name, **{f"{key}_bytes": value for key, value in sizes.items()})
+
+    # SSE: the same frames the stream service writes, one flush per event
+    frames = [
+        f"id: {index}-0\ndata: " + json.dumps({
+            "run_id": str(run.run_id), "seq": index, "agent_name": AGENTS[index % len(AGENTS)],
+            "content": text, "type": "thought", "token_count": len(text) // 4,
+        }) + "\n\n"
+        for index, text in enumerate(texts, start=1)
+    ]
+    sizes = {"identity": sum(len(frame.encode()) for frame in frames)}
+    for encoding in ("gzip", "zstd"):
+        compressor = StreamCompressor(encoding)
+        sizes[encoding] = sum(len(compressor.compress(frame.encode())) for frame in frames) + len(compressor.close())
+    report("bandwidth", endpoint="sse_stream", **{f"{key}_bytes": value for key, value in sizes.items()})
+
+    body = "".join(frames).encode()
+    report("bandwidth", endpoint="sse_stream_unflushed_bound",
+           gzip_bytes=len(compress_body(body, "gzip")), zstd_bytes=len(compress_body(body, "zstd")))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=400, help="Synthetic messages to generate.")
+    parser.add_argument("--from-db", action="store_true", help="Use messages already in the benchmark database.")
+    parser.add_argument("--source-db", default="", help="SQLite database of real runs to read messages from.")
+    parser.add_argument("--level", type=int, default=settings.MESSAGE_COMPRESS_LEVEL)
+    args = parser.parse_args()
+
+    call_command("migrate", verbosity=0)
+    texts = load_texts(args)
+    if len(texts) < 20:
+        raise SystemExit(f"Need at least 20 messages, found {len(texts)}")
+    sizes = sorted(len(text) for text in texts)
+    report("input", messages=len(texts), chars_p50=sizes[len(sizes) // 2], chars_max=sizes[-1])
+
+    dictionary = storage_case(texts, settings.MESSAGE_COMPRESS_MIN_BYTES, args.level)
+    run = seed_run(texts, dictionary)
+    bandwidth_case(run, texts)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+"""
+End-to-end mission benchmark: the real mission functions with a fake LLM,
+N concurrent missions and M SSE subscribers per run.
+
+    python -m benchmarks.e2e --missions 8 --subscribers 20 --type conference
+    python -m benchmarks.e2e --llm-latency 0.2 --tokens-per-second 400 --stream
+    python -m benchmarks.e2e --redis-url redis://localhost:6379/15 --output benchmarks/results/e2e.json
+
+The fake LLM replaces the provider call in MissionLLM. It waits
+--llm-latency seconds, then "generates" --output-words deterministic words
+at --tokens-per-second and returns them as a CrewAI final answer. Everything
+else is the production path:
+- the crews and the task scheduler
+- core.persistence (buffered writes, aggregates)
+- core.redis_client (event log and pub/sub)
+- the SSE generator from fastapi_app.main, driven in-process
+
+Runs offline. Without --redis-url an in-process fakeredis server stands in
+for Redis (the Lua scripts need `lupa`). The database is SQLite via
+benchmarks/settings.py, or Postgres with BENCH_DATABASE=postgres.
+
+Prints one JSON line with:
+- throughput: missions/s and events/s
+- publish-to-subscriber latency percentiles
+- DB write rate
+- memory per subscriber
+
+With --output it also writes the result, parameters and git commit to a
+JSON file, so runs can be compared across commits.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone as dt_timezone
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "benchmarks.settings")
+# Keep CrewAI and LiteLLM offline
+os.environ.setdefault("CREWAI_DISABLE_TELEMETRY", "true")
+os.environ.setdefault("OTEL_SDK_DISABLED", "true")
+os.environ.setdefault("LITELLM_LOCAL_MODEL_COST_MAP", "True")
+
+WORDS = (
+    "venue budget keynote catering speaker schedule risk market persona latency "
+    "launch pricing contingency sponsor agenda network registration backup"
+).split()
+
+
+def use_redis(redis_url: str):
+    """
+    Points every Redis client the app creates at `redis_url`, or at one
+    shared in-process fakeredis server. Must run before app modules import.
+    """
+    import redis
+    import redis.asyncio as aioredis
+
+    if redis_url:
+        os.environ["REDIS_URL"] = redis_url
+        return
+
+    try:
+        import fakeredis
+        import lupa  # noqa: F401  fakeredis needs it to run the Lua scripts
+    except ImportError as exc:
+        raise SystemExit(
+            f"{exc.name} is needed to run without --redis-url: pip install -r requirements-local.txt"
+        ) from exc
+
+    server = fakeredis.FakeServer()
+    redis.from_url = lambda *args, **kwargs: fakeredis.FakeRedis(server=server)
+    aioredis.from_url = lambda *args, **kwargs: fakeredis.FakeAsyncRedis(server=server)
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    if not values:
+        return None
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return round(values[index], 2)
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def make_fake_llm_class(latency, tokens_per_second, output_words):
+    from agents.llm import MissionLLM
+    from core.tokens import count_tokens
+
+    class FakeLLM(MissionLLM):
+        """Deterministic stand-in for the provider; same prompt, same answer."""
+
+        def _call_provider(self, messages, tools, callbacks, *args, **kwargs):
+            prompt = messages if isinstance(messages, str) else json.dumps(messages, sort_keys=True, default=str)
+            rng = random.Random(hashlib.sha256(prompt.encode()).hexdigest())
+            words = [rng.choice(WORDS) for _ in range(output_words)]
+
+            time.sleep(latency)
+            stream = self._start_stream(kwargs.get("from_agent"))
+            try:
+                if stream is not None:
+                    for word in words:
+                        stream.feed(word + " ")
+                        time.sleep(1 / tokens_per_second)
+                else:
+                    time.sleep(len(words) / tokens_per_second)
+            finally:
+                self._end_stream(stream)
+
+            answer = "Final Answer: " + " ".join(words)
+            self._track_token_usage_internal({
+                "prompt_tokens": count_tokens(prompt),
+                "completion_tokens": count_tokens(answer),
+            })
+            return "Thought: I now know the final answer\n" + answer
+
+    return FakeLLM
+
+
+class FakeRequest:
+    async def is_disconnected(self):
+        return False
+
+
+def is_last_event(event: dict) -> bool:
+    return event.get("agent_name") in ("Manager", "System") and event.get("type") in ("final", "error")
+
+
+async def subscribe(stream_module, run_id, stats):
+    """Reads one run's SSE frames until the mission's closing event."""
+    async for frame in stream_module.event_stream(run_id, FakeRequest(), "0"):
+        if frame.startswith(":"):
+            continue
+        received = time.time()
+        data = frame.split("data: ", 1)[1].rstrip("\n")
+        event = json.loads(data)
+        stats["events"] += 1
+        if event.get("type") == "delta":
+            stats["deltas"] += 1
+        elif event.get("timestamp"):
+            published = datetime.fromisoformat(event["timestamp"])
+            if published.tzinfo is None:
+                published = published.replace(tzinfo=dt_timezone.utc)
+            stats["latencies"].append((received - published.timestamp()) * 1000)
+        if is_last_event(event):
+            return
+
+
+def run_mission(mission_type, run_id, cache, stream):
+    from django.db import connections
+
+    from core.missions import get_mission
+    from core.models import AgentRun
+    from core.persistence import close_buffer
+
+    try:
+        AgentRun.objects.filter(run_id=run_id).update(status="running")
+        get_mission(mission_type)(f"Benchmark {mission_type}", run_id=run_id, cache=cache, stream=stream)
+    finally:
+        close_buffer(run_id)
+        connections.close_all()
+
+
+def install_fake_llm(args):
+    import agents.crew_mission as crew_mission
+
+    FakeLLM = make_fake_llm_class(args.llm_latency, args.tokens_per_second, args.output_words)
+
+    def fake_build_llm(run_id, temperature=0.3, max_tokens=None, cache=None, stream=None):
+        llm = FakeLLM(model="groq/benchmark-fake", temperature=temperature, max_tokens=max_tokens, stream=bool(stream))
+        llm.run_id = str(run_id)
+        llm.cache_mode = cache or "off"
+        return llm
+
+    crew_mission.build_llm = fake_build_llm
+
+
+async def run_benchmark(args, run_ids):
+    # The ORM is sync-only; everything in here touches it from worker threads
+    import fastapi_app.main as stream_module
+    from core.persistence import metrics as flush_metrics
+
+    await stream_module.broker.start()
+    stats = {"events": 0, "deltas": 0, "latencies": []}
+
+    # Memory held by idle subscribers, measured before any traffic
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    subscribers = [
+        asyncio.create_task(subscribe(stream_module, run_id, stats))
+        for run_id in run_ids for _ in range(args.subscribers)
+    ]
+    await asyncio.sleep(0.5)
+    per_subscriber_kb = (tracemalloc.get_traced_memory()[0] - before) / max(1, len(subscribers)) / 1024
+    tracemalloc.stop()
+
+    loop = asyncio.get_running_loop()
+    flushed_before = flush_metrics.snapshot()["messages"]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.missions) as pool:
+        missions = [
+            loop.run_in_executor(pool, run_mission, args.type, run_id, args.cache, args.stream)
+            for run_id in run_ids
+        ]
+        mission_results = await asyncio.gather(*missions, return_exceptions=True)
+        missions_done = time.perf_counter()
+        _, pending = await asyncio.wait(subscribers, timeout=args.timeout)
+    elapsed = time.perf_counter() - started
+
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+    await stream_module.broker.stop()
+
+    failures = [repr(result) for result in mission_results if isinstance(result, BaseException)]
+    mission_elapsed = missions_done - started
+
+    return {
+        "type": args.type,
+        "missions": args.missions,
+        "subscribers_per_run": args.subscribers,
+        "stream": args.stream,
+        "failed_missions": len(failures),
+        "errors": failures[:3],
+        "elapsed_s": round(elapsed, 2),
+        "missions_per_s": round(args.missions / mission_elapsed, 3),
+        "events_delivered": stats["events"],
+        "deltas_delivered": stats["deltas"],
+        "events_per_s": round(stats["events"] / elapsed, 1),
+        "latency_ms_p50": percentile(stats["latencies"], 50),
+        "latency_ms_p95": percentile(stats["latencies"], 95),
+        "latency_ms_p99": percentile(stats["latencies"], 99),
+        "latency_ms_max": percentile(stats["latencies"], 100),
+        "db_writes_per_s": round((flush_metrics.snapshot()["messages"] - flushed_before) / mission_elapsed, 1),
+        "flush": flush_metrics.snapshot(),
+        "memory_per_subscriber_kb": round(per_subscriber_kb, 1),
+        "incomplete_subscribers": len(pending),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--type", default="conference", choices=("research", "feasibility", "conference"))
+    parser.add_argument("--missions", type=int, default=4, help="Concurrent missions.")
+    parser.add_argument("--subscribers", type=int, default=10, help="SSE subscribers per run.")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="Fake LLM time to first token (s).")
+    parser.add_argument("--tokens-per-second", type=float, default=500)
+    parser.add_argument("--output-words", type=int, default=150)
+    parser.add_argument("--stream", action="store_true", help="Publish token deltas.")
+    parser.add_argument("--cache", default="off", choices=("off", "read", "readwrite"))
+    parser.add_argument("--redis-url", default="", help="Real Redis to use instead of fakeredis.")
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--output", default="", help="Also write the result to this JSON file.")
+    args = parser.parse_args()
+
+    use_redis(args.redis_url)
+
+    import django
+
+    django.setup()
+
+    from django.core.management import call_command
+
+    from core.models import AgentMessage, AgentRun
+
+    call_command("migrate", verbosity=0)
+    install_fake_llm(args)
+
+    run_ids = [str(AgentRun.objects.create(name="Benchmark").run_id) for _ in range(args.missions)]
+    result = asyncio.run(run_benchmark(args, run_ids))
+    result["messages_written"] = AgentMessage.objects.filter(run_id__in=run_ids).count()
+    print(json.dumps(result))
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump({
+                "benchmark": "e2e",
+                "commit": git_commit(),
+                "python": sys.version.split()[0],
+                "database": os.getenv("BENCH_DATABASE", "sqlite"),
+                "redis": args.redis_url or "fakeredis",
+                "params": vars(args),
+                "result": result,
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Throughput and peak memory of streaming run exports.
+
+    python -m benchmarks.export --runs 10000 --messages-per-run 100   # 1M messages
+    python -m benchmarks.export --reuse                                # skip seeding
+    BENCH_DATABASE=postgres python -m benchmarks.export ...            # server-side cursors
+
+Seeds the benchmark database (see benchmarks/settings.py), then runs each
+export case in its own process, so each peak RSS is measured from a clean
+start. A case consumes core.export.export_chunks for all runs and
+discards the bytes. Prints one JSON line per case.
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+import uuid
+from datetime import timedelta
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "benchmarks.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.core.management import call_command  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from core.export import export_chunks, select_runs  # noqa: E402
+from core.models import AgentMessage, AgentRun  # noqa: E402
+
+AGENTS = ["Product Manager", "Lead UX Designer", "Engineering Lead", "Marketing Specialist", "Legal Counsel"]
+WORDS = "agent venue budget risk latency market persona schedule catering keynote".split()
+CASES = {
+    "ndjson": ("ndjson", "none"),
+    "ndjson_zstd": ("ndjson", "zstd"),
+    "parquet": ("parquet", "none"),
+    "parquet_zstd": ("parquet", "zstd"),
+}
+
+
+def seed(runs, messages_per_run, content_size):
+    call_command("flush", interactive=False, verbosity=0)
+    rng = random.Random(42)
+    now = timezone.now()
+    for start in range(0, runs, 200):
+        run_objects, messages = [], []
+        for i in range(start, min(runs, start + 200)):
+            run = AgentRun(
+                run_id=uuid.uuid4(), name=f"Mission {i}", status="completed", mission_type="feasibility",
+                finished_at=now, message_count=messages_per_run,
+            )
+            run_objects.append(run)
+            started = now - timedelta(minutes=runs - i)
+            for seq in range(1, messages_per_run + 1):
+                messages.append(AgentMessage(
+                    run_id=run.run_id, seq=seq, agent_name=AGENTS[seq % len(AGENTS)], message_type="thought",
+                    content=" ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 2 * content_size // 7))),
+                    token_count=content_size // 4, timestamp=started + timedelta(seconds=seq),
+                ))
+        AgentRun.objects.bulk_create(run_objects)
+        AgentMessage.objects.bulk_create(messages, batch_size=5000)
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / 1024 / (1024 if sys.platform == "darwin" else 1), 1)
+
+
+def run_case(name):
+    export_format, compression = CASES[name]
+    baseline = peak_rss_mb()
+    started = time.perf_counter()
+    written = chunks = 0
+    for chunk in export_chunks(select_runs(), export_format, compression):
+        written += len(chunk)
+        chunks += 1
+    elapsed = time.perf_counter() - started
+    messages = AgentMessage.objects.count()
+    print(json.dumps({
+        "case": name, "messages": messages, "bytes": written, "chunks": chunks,
+        "seconds": round(elapsed, 2), "messages_per_s": round(messages / elapsed) if elapsed else None,
+        "baseline_rss_mb": baseline, "peak_rss_mb": peak_rss_mb(),
+    }), flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10000)
+    parser.add_argument("--messages-per-run", type=int, default=100)
+    parser.add_argument("--content-size", type=int, default=400, help="Average characters per message.")
+    parser.add_argument("--reuse", action="store_true", help="Use the already seeded database.")
+    parser.add_argument("--case", choices=CASES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        run_case(args.case)
+        return
+
+    call_command("migrate", verbosity=0)
+    if not args.reuse:
+        started = time.perf_counter()
+        seed(args.runs, args.messages_per_run, args.content_size)
+        print(json.dumps({"seeded_s": round(time.perf_counter() - started, 1)}), flush=True)
+
+    for name in CASES:
+        subprocess.run([sys.executable, "-m", "benchmarks.export", "--case", name], check=True)
+
+
+if __name__ == "__main__":
+    main()
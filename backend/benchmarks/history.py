@@ -0,0 +1,143 @@
+"""
+History sidebar query time: the old full message scan versus the keyset
+page over AgentRun aggregates.
+
+    python -m benchmarks.history --runs 10000 --messages-per-run 100
+    python -m benchmarks.history --reuse        # skip seeding
+
+Seeds benchmarks/bench.sqlite3 (see benchmarks/settings.py) and prints one
+JSON line per case.
+"""
+import argparse
+import json
+import math
+import os
+import random
+import time
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "benchmarks.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.core.management import call_command  # noqa: E402
+from django.db.models import F  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from core.models import AgentMessage, AgentRun  # noqa: E402
+from core.tokens import count_tokens  # noqa: E402
+from core.views import get_history  # noqa: E402
+
+WORDS = "agent venue budget risk latency market persona schedule catering keynote".split()
+
+
+def legacy_get_history():
+    # The implementation get_history replaced, kept for comparison
+    history = list(
+        AgentMessage.objects
+        .filter(run__status="completed")
+        .select_related("run")
+        .values(
+            "content",
+            run_uuid=F("run__run_id"),
+            run_name=F("run__name"),
+            run_started_at=F("run__started_at"),
+        )
+        .order_by("-timestamp")
+    )
+    new_history = defaultdict(lambda: {"tokens": 0})
+    for msg in history:
+        rid = str(msg["run_uuid"])
+        if "run_id" not in new_history[rid]:
+            new_history[rid].update({
+                "run_id": rid,
+                "name": msg.get("run_name", "Untitled Mission"),
+                "started_at": msg["run_started_at"].strftime("%H:%M:%S") if msg["run_started_at"] else "—",
+            })
+        new_history[rid]["tokens"] += math.ceil(len(msg["content"]) / 4)
+    return dict(new_history).values()
+
+
+def seed(runs, messages_per_run, content_size):
+    call_command("flush", interactive=False, verbosity=0)
+    rng = random.Random(42)
+    now = timezone.now()
+    batch = []
+
+    for i in range(runs):
+        started = now - timedelta(minutes=runs - i)
+        run = AgentRun(
+            run_id=uuid.uuid4(), name=f"Mission {i}", status="completed",
+            finished_at=started + timedelta(minutes=5),
+        )
+        contents = [
+            " ".join(rng.choice(WORDS) for _ in range(content_size // 7))
+            for _ in range(messages_per_run)
+        ]
+        tokens = [count_tokens(c) for c in contents]
+        run.message_count = messages_per_run
+        run.token_count = sum(tokens)
+        run.type_counts = {"thought": messages_per_run}
+        run.save()
+        # auto_now_add ignores the value passed in; spread runs out in time
+        AgentRun.objects.filter(run_id=run.run_id).update(started_at=started)
+
+        for seq, (content, token_count) in enumerate(zip(contents, tokens), start=1):
+            batch.append(AgentMessage(
+                run_id=run.run_id, seq=seq, agent_name="Agent", content=content, token_count=token_count,
+                message_type="thought", timestamp=started + timedelta(seconds=seq),
+            ))
+        if len(batch) >= 20000:
+            AgentMessage.objects.bulk_create(batch, batch_size=5000)
+            batch = []
+    if batch:
+        AgentMessage.objects.bulk_create(batch, batch_size=5000)
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return round(min(samples), 2), round(sorted(samples)[len(samples) // 2], 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10000)
+    parser.add_argument("--messages-per-run", type=int, default=100)
+    parser.add_argument("--content-size", type=int, default=200, help="Approximate characters per message.")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--reuse", action="store_true", help="Use the already seeded database.")
+    args = parser.parse_args()
+
+    call_command("migrate", verbosity=0)
+    if not args.reuse:
+        started = time.perf_counter()
+        seed(args.runs, args.messages_per_run, args.content_size)
+        print(json.dumps({"seeded_s": round(time.perf_counter() - started, 1)}))
+
+    total_runs = AgentRun.objects.count()
+    total_messages = AgentMessage.objects.count()
+
+    _, next_cursor = get_history()
+    cases = {
+        "legacy_full_scan": legacy_get_history,
+        "keyset_first_page": get_history,
+        "keyset_second_page": lambda: get_history(next_cursor),
+    }
+    for name, fn in cases.items():
+        best, median = timed(fn, args.repeat)
+        print(json.dumps({
+            "case": name, "runs": total_runs, "messages": total_messages,
+            "best_ms": best, "median_ms": median,
+        }))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Cold-start import time for the web tier, measured with `python -X importtime`.
+
+    python -m benchmarks.import_time                    # compare to the baseline
+    python -m benchmarks.import_time --update-baseline  # record a new baseline
+    python -m benchmarks.import_time --threshold 1.5 --repeat 7
+
+Each target runs in a fresh interpreter. Prints one JSON line per target with
+the median total import time, the slowest top-level imports and any agent
+stack packages (CrewAI, LiteLLM, ...) that were loaded. Exits non-zero when a
+target is slower than baseline * threshold or loads the agent stack.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from core.missions import AGENT_STACK_MODULES
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+BASELINE_PATH = Path(__file__).resolve().parent / "import_time_baseline.json"
+
+TARGETS = {
+    "manage_check": ["manage.py", "check"],
+    "django_app": [
+        "-c",
+        "from django.core.wsgi import get_wsgi_application; get_wsgi_application(); import app.urls",
+    ],
+    "fastapi_app": ["-c", "import fastapi_app.main"],
+}
+
+
+def parse_importtime(stderr: str):
+    """
+    Returns (total_us, {top-level module: cumulative_us}) from -X importtime
+    output. Top-level entries have no leading indentation in the module column.
+    """
+    top_level = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        if name.startswith("  "):
+            continue
+        module = name.strip()
+        top_level[module] = top_level.get(module, 0) + int(cumulative_us)
+    return sum(top_level.values()), top_level
+
+
+def measure(args):
+    env = {**os.environ, "DJANGO_SETTINGS_MODULE": "app.settings", "PYTHONDONTWRITEBYTECODE": "1"}
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True,
+    )
+    wall_ms = (time.perf_counter() - started) * 1000
+    if proc.returncode != 0:
+        raise RuntimeError(f"{' '.join(args)} failed:\n{proc.stderr[-2000:]}")
+    total_us, modules = parse_importtime(proc.stderr)
+    return wall_ms, total_us, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--threshold", type=float, default=1.25, help="Allowed slowdown factor against the baseline.")
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--top", type=int, default=8, help="Slowest top-level imports to report.")
+    args = parser.parse_args()
+
+    baseline = json.loads(BASELINE_PATH.read_text()) if BASELINE_PATH.exists() else {}
+    results = {}
+    failed = False
+
+    for name, target in TARGETS.items():
+        samples = [measure(target) for _ in range(args.repeat)]
+        import_ms = statistics.median(total for _, total, _ in samples) / 1000
+        wall_ms = statistics.median(wall for wall, _, _ in samples)
+        modules = samples[-1][2]
+        agent_stack = sorted(m for m in modules if m.split(".")[0] in AGENT_STACK_MODULES)
+        slowest = sorted(modules.items(), key=lambda item: item[1], reverse=True)[: args.top]
+
+        result = {
+            "target": name,
+            "import_ms": round(import_ms, 1),
+            "wall_ms": round(wall_ms, 1),
+            "baseline_ms": baseline.get(name),
+            "agent_stack_loaded": agent_stack,
+            "slowest": {module: round(us / 1000, 1) for module, us in slowest},
+        }
+        if baseline.get(name) and import_ms > baseline[name] * args.threshold:
+            result["regression"] = True
+            failed = True
+        if agent_stack:
+            failed = True
+        results[name] = round(import_ms, 1)
+        print(json.dumps(result))
+
+    if args.update_baseline:
+        BASELINE_PATH.write_text(json.dumps(results, indent=2) + "\n")
+        print(json.dumps({"baseline_written": str(BASELINE_PATH.name)}))
+    elif failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
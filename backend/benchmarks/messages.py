@@ -0,0 +1,157 @@
+"""
+run_detail message loading for a run with 50k messages: the old inline JSON
+blob versus keyset pages from the run_messages endpoint.
+
+    python -m benchmarks.messages --messages 50000 --other-runs 200
+    python -m benchmarks.messages --reuse        # skip seeding
+
+Seeds benchmarks/bench.sqlite3 (see benchmarks/settings.py) and prints one
+JSON line per case with time and peak Python memory, plus the query plan
+of the keyset query.
+"""
+import argparse
+import json
+import os
+import random
+import time
+import tracemalloc
+import uuid
+from datetime import timedelta
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "benchmarks.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.core.management import call_command  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from core.models import AgentMessage, AgentRun  # noqa: E402
+from core.views import decode_message_cursor, get_messages  # noqa: E402
+
+WORDS = "agent venue budget risk latency market persona schedule catering keynote".split()
+BIG_RUN_NAME = "benchmark: big run"
+
+
+def legacy_run_detail_messages(run_id):
+    # What run_detail inlined before: every message, sorted, dumped to JSON
+    messages = (
+        AgentMessage.objects.filter(run_id=run_id)
+        .values("agent_name", "content", "message_type", "timestamp", "token_count")
+        .order_by("seq", "timestamp")
+    )
+    messages = [
+        {**msg, "timestamp": msg["timestamp"].strftime("%H:%M:%S") if msg["timestamp"] else "—"}
+        for msg in messages
+    ]
+    return json.dumps(messages)
+
+
+def seed_run(name, count, started, rng, content_size):
+    run = AgentRun.objects.create(
+        run_id=uuid.uuid4(), name=name, status="completed", finished_at=started + timedelta(hours=1),
+        message_count=count,
+    )
+    batch = []
+    for seq in range(1, count + 1):
+        batch.append(AgentMessage(
+            run_id=run.run_id, seq=seq, agent_name="Agent", message_type="thought", token_count=content_size // 4,
+            content=" ".join(rng.choice(WORDS) for _ in range(content_size // 7)),
+            # Several messages share a timestamp, as they do when batched
+            timestamp=started + timedelta(milliseconds=seq // 3),
+        ))
+        if len(batch) >= 20000:
+            AgentMessage.objects.bulk_create(batch, batch_size=5000)
+            batch = []
+    if batch:
+        AgentMessage.objects.bulk_create(batch, batch_size=5000)
+    return run
+
+
+def seed(messages, other_runs, other_messages, content_size):
+    call_command("flush", interactive=False, verbosity=0)
+    rng = random.Random(42)
+    now = timezone.now()
+    # Interleave the big run with others so its rows are not contiguous
+    for i in range(other_runs // 2):
+        seed_run(f"Mission {i}", other_messages, now - timedelta(days=1, minutes=i), rng, content_size)
+    seed_run(BIG_RUN_NAME, messages, now - timedelta(hours=2), rng, content_size)
+    for i in range(other_runs // 2, other_runs):
+        seed_run(f"Mission {i}", other_messages, now - timedelta(days=1, minutes=i), rng, content_size)
+
+
+def walk_all(run_id, limit):
+    cursor = None
+    total = 0
+    while True:
+        page, cursor = get_messages(run_id, cursor, limit=limit)
+        total += len(page)
+        if not cursor:
+            return total
+
+
+def measure(fn, repeat):
+    samples = []
+    peak = 0
+    for _ in range(repeat):
+        tracemalloc.start()
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return round(min(samples), 2), round(sorted(samples)[len(samples) // 2], 2), round(peak / 1024 / 1024, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=50000, help="Messages in the run being viewed.")
+    parser.add_argument("--other-runs", type=int, default=200)
+    parser.add_argument("--other-messages", type=int, default=500, help="Messages per other run.")
+    parser.add_argument("--content-size", type=int, default=400, help="Approximate characters per message.")
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--reuse", action="store_true", help="Use the already seeded database.")
+    args = parser.parse_args()
+
+    call_command("migrate", verbosity=0)
+    if not args.reuse:
+        started = time.perf_counter()
+        seed(args.messages, args.other_runs, args.other_messages, args.content_size)
+        print(json.dumps({"seeded_s": round(time.perf_counter() - started, 1)}))
+
+    run = AgentRun.objects.get(name=BIG_RUN_NAME)
+    run_id = run.run_id
+    total_messages = AgentMessage.objects.count()
+    run_messages = AgentMessage.objects.filter(run_id=run_id).count()
+
+    # A cursor from the middle of the run, for the deep-page case
+    middle = AgentMessage.objects.filter(run_id=run_id).order_by("timestamp", "id")[run_messages // 2]
+    middle_cursor = f"{middle.timestamp.isoformat()}|{middle.id}"
+
+    timestamp, pk = decode_message_cursor(middle_cursor)
+    plan = (
+        AgentMessage.objects.filter(run_id=run_id)
+        .filter(timestamp__gte=timestamp).exclude(timestamp=timestamp, id__lte=pk)
+        .order_by("timestamp", "id")[: args.page_size]
+        .explain()
+    )
+    print(json.dumps({"keyset_query_plan": plan}))
+
+    cases = {
+        "legacy_inline_json": lambda: legacy_run_detail_messages(run_id),
+        "keyset_first_page": lambda: get_messages(run_id, limit=args.page_size),
+        "keyset_middle_page": lambda: get_messages(run_id, middle_cursor, limit=args.page_size),
+        "keyset_walk_all_pages": lambda: walk_all(run_id, 1000),
+    }
+    for name, fn in cases.items():
+        best, median, peak_mb = measure(fn, args.repeat)
+        print(json.dumps({
+            "case": name, "run_messages": run_messages, "total_messages": total_messages,
+            "best_ms": best, "median_ms": median, "peak_mb": peak_mb,
+        }))
+
+
+if __name__ == "__main__":
+    main()
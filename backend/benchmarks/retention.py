@@ -0,0 +1,142 @@
+"""
+Message table size and query time before and after archiving old runs.
+
+    python -m benchmarks.retention --runs 10000 --messages-per-run 100 --months 12
+    BENCH_DATABASE=postgres python -m benchmarks.retention ...     # month partitions
+
+Seeds the benchmark database (see benchmarks/settings.py) with runs spread
+evenly over the last --months months, measures the message table and a
+few queries, archives runs older than --archive-after-days with
+core.retention.archive_runs (Parquet files in a temporary directory)
+and measures again. Old runs are then read from Parquet. Prints one JSON
+line per measurement.
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+import uuid
+from datetime import timedelta
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "benchmarks.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from core.models import AgentMessage, AgentRun  # noqa: E402
+from core.retention import archive_runs, ensure_partitions  # noqa: E402
+from core.views import get_history, get_messages  # noqa: E402
+
+WORDS = "agent venue budget risk latency market persona schedule catering keynote".split()
+
+
+def seed(runs, messages_per_run, months, content_size):
+    call_command("flush", interactive=False, verbosity=0)
+    rng = random.Random(42)
+    now = timezone.now()
+    span = timedelta(days=30 * months)
+    ensure_partitions(start=now - span)
+
+    for start in range(0, runs, 200):
+        run_objects, starts, messages = [], [], []
+        for i in range(start, min(runs, start + 200)):
+            started = now - span + span * i / runs
+            run = AgentRun(
+                run_id=uuid.uuid4(), name=f"Mission {i}", status="completed",
+                finished_at=started + timedelta(minutes=5), message_count=messages_per_run,
+                type_counts={"thought": messages_per_run},
+            )
+            run_objects.append(run)
+            starts.append(started)
+            for seq in range(1, messages_per_run + 1):
+                messages.append(AgentMessage(
+                    run_id=run.run_id, seq=seq, agent_name="Agent", message_type="thought",
+                    content=" ".join(rng.choice(WORDS) for _ in range(content_size // 7)),
+                    token_count=content_size // 4, timestamp=started + timedelta(seconds=seq),
+                ))
+        AgentRun.objects.bulk_create(run_objects)
+        # auto_now_add ignores the value passed in; spread runs out in time
+        for run, started in zip(run_objects, starts):
+            run.started_at = started
+        AgentRun.objects.bulk_update(run_objects, ["started_at"])
+        AgentMessage.objects.bulk_create(messages, batch_size=5000)
+
+
+def table_size() -> int:
+    """Bytes used by core_agent_message with its indexes, over all partitions."""
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute("VACUUM ANALYZE core_agent_message")
+            cursor.execute("SELECT SUM(pg_total_relation_size(relid)) FROM pg_partition_tree('core_agent_message')")
+        else:
+            cursor.execute(
+                "SELECT SUM(s.pgsize) FROM dbstat s JOIN sqlite_master m ON m.name = s.name "
+                "WHERE m.tbl_name = 'core_agent_message'"
+            )
+        return int(cursor.fetchone()[0] or 0)
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {"best_ms": round(samples[0], 2), "median_ms": round(samples[len(samples) // 2], 2)}
+
+
+def measure(phase, old_run, recent_run, repeat):
+    old = AgentRun.objects.get(run_id=old_run)
+    recent_since = timezone.now() - timedelta(days=7)
+    print(json.dumps({
+        "phase": phase, "messages": AgentMessage.objects.count(), "table_bytes": table_size(),
+    }))
+    cases = {
+        "history_first_page": get_history,
+        "recent_run_messages": lambda: get_messages(recent_run),
+        "old_run_messages": lambda: get_messages(old_run, archive_path=old.archive_path),
+        "last_week_message_count": lambda: AgentMessage.objects.filter(timestamp__gte=recent_since).count(),
+        "all_message_tokens": lambda: sum(AgentMessage.objects.values_list("token_count", flat=True).iterator(chunk_size=5000)),
+    }
+    for name, fn in cases.items():
+        print(json.dumps({"phase": phase, "case": name, **timed(fn, repeat)}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10000)
+    parser.add_argument("--messages-per-run", type=int, default=100)
+    parser.add_argument("--months", type=int, default=12, help="Months the runs are spread over.")
+    parser.add_argument("--archive-after-days", type=int, default=90)
+    parser.add_argument("--content-size", type=int, default=400, help="Approximate characters per message.")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    call_command("migrate", verbosity=0)
+    started = time.perf_counter()
+    seed(args.runs, args.messages_per_run, args.months, args.content_size)
+    print(json.dumps({"database": connection.vendor, "seeded_s": round(time.perf_counter() - started, 1)}))
+
+    runs = AgentRun.objects.order_by("started_at").values_list("run_id", flat=True)
+    old_run, recent_run = runs.first(), runs.last()
+    measure("before", old_run, recent_run, args.repeat)
+
+    with tempfile.TemporaryDirectory() as directory:
+        settings.MESSAGE_ARCHIVE_DIR = directory
+        started = time.perf_counter()
+        summary = archive_runs(timezone.now() - timedelta(days=args.archive_after_days))
+        print(json.dumps({"archived_s": round(time.perf_counter() - started, 1), **summary}))
+        measure("after", old_run, recent_run, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+Full-text search latency over a large message table.
+
+    python -m benchmarks.search --runs 10000 --messages-per-run 100   # 1M messages
+    python -m benchmarks.search --reuse                                # skip seeding
+    BENCH_DATABASE=postgres python -m benchmarks.search ...            # tsvector + GIN
+
+Seeds the benchmark database (SQLite FTS5 by default, see
+benchmarks/settings.py) with messages drawn from a Zipf-distributed
+vocabulary, so queries cover rare, medium and very common terms. Each
+case calls core.search.search for one page of ranked runs with
+snippets. Prints one JSON line per case.
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import time
+import uuid
+from datetime import timedelta
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "benchmarks.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.core.management import call_command  # noqa: E402
+from django.db import connection, transaction  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from core.missions import MISSION_TYPES  # noqa: E402
+from core.models import AgentMessage, AgentRun  # noqa: E402
+from core.search import index_rows, search  # noqa: E402
+
+AGENTS = ["Product Manager", "Lead UX Designer", "Engineering Lead", "Marketing Specialist", "Legal Counsel", "Venue Scout"]
+SYLLABLES = ["ka", "lo", "mi", "ren", "tus", "vo", "dal", "pe", "qui", "sar", "tem", "bri", "no", "fa", "gu", "zel"]
+VOCABULARY_SIZE = 20000
+
+
+def vocabulary():
+    # Word i of the vocabulary is the i-th most frequent
+    words = []
+    for length in (2, 3, 4):
+        for combo in itertools.product(SYLLABLES, repeat=length):
+            words.append("".join(combo))
+            if len(words) == VOCABULARY_SIZE:
+                return words
+    return words
+
+
+def seed(runs, messages_per_run, words_per_message):
+    call_command("flush", interactive=False, verbosity=0)
+    if connection.vendor == "sqlite":
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM core_message_fts")
+    rng = random.Random(42)
+    words = vocabulary()
+    weights = [1 / rank for rank in range(1, len(words) + 1)]
+    now = timezone.now()
+    message_id = 0
+
+    for start in range(0, runs, 100):
+        run_objects, messages = [], []
+        for i in range(start, min(runs, start + 100)):
+            run = AgentRun(
+                run_id=uuid.uuid4(), name=f"Mission {i} " + " ".join(rng.choices(words, weights, k=3)),
+                status="completed", mission_type=MISSION_TYPES[i % len(MISSION_TYPES)],
+                finished_at=now, message_count=messages_per_run,
+            )
+            run_objects.append(run)
+            started = now - timedelta(minutes=runs - i)
+            for seq in range(1, messages_per_run + 1):
+                message_id += 1
+                messages.append(AgentMessage(
+                    id=message_id, run_id=run.run_id, seq=seq, agent_name=AGENTS[seq % len(AGENTS)],
+                    content=" ".join(rng.choices(words, weights, k=words_per_message)),
+                    message_type="final" if seq == messages_per_run else "thought",
+                    timestamp=started + timedelta(seconds=seq),
+                ))
+        with transaction.atomic():
+            AgentRun.objects.bulk_create(run_objects)
+            AgentMessage.objects.bulk_create(messages, batch_size=2000)
+            index_rows(((m.id, m.agent_name, m.content) for m in messages), connection)
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("VACUUM ANALYZE core_agent_message")
+
+
+def term_frequencies(words, sample=20000):
+    """Share of messages containing each of a few vocabulary ranks, from a sample."""
+    contents = list(AgentMessage.objects.order_by("id").values_list("content", flat=True)[:sample])
+    found = {}
+    for rank in (0, 9, 99, 999, 9999):
+        word = words[rank]
+        found[word] = sum(1 for content in contents if word in content.split()) / max(1, len(contents))
+    return found
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        "best_ms": round(samples[0], 2),
+        "median_ms": round(samples[len(samples) // 2], 2),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10000)
+    parser.add_argument("--messages-per-run", type=int, default=100)
+    parser.add_argument("--words", type=int, default=30, help="Words per message.")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--reuse", action="store_true", help="Use the already seeded database.")
+    args = parser.parse_args()
+
+    call_command("migrate", verbosity=0)
+    if not args.reuse:
+        started = time.perf_counter()
+        seed(args.runs, args.messages_per_run, args.words)
+        print(json.dumps({"seeded_s": round(time.perf_counter() - started, 1)}))
+
+    words = vocabulary()
+    total_messages = AgentMessage.objects.count()
+    print(json.dumps({
+        "database": connection.vendor, "runs": AgentRun.objects.count(), "messages": total_messages,
+        "message_share": {word: round(share, 5) for word, share in term_frequencies(words).items()},
+    }))
+
+    common, frequent, medium, rare, rarest = words[0], words[9], words[99], words[999], words[9999]
+    cases = {
+        "rare_term": lambda: search(rarest),
+        "medium_term": lambda: search(rare),
+        "frequent_term": lambda: search(medium),
+        "common_term": lambda: search(common),
+        "two_terms": lambda: search(f"{medium} {rare}"),
+        "phrase": lambda: search(f'"{frequent} {medium}"'),
+        "excluded_term": lambda: search(f"{rare} -{common}"),
+        "filter_mission_type": lambda: search(medium, mission_type=MISSION_TYPES[0]),
+        "filter_agent_and_type": lambda: search(rare, agent=AGENTS[2], message_type="thought"),
+        "filter_date_range": lambda: search(medium, since=timezone.now() - timedelta(days=2)),
+        "third_page": lambda: search(medium, page=3),
+    }
+    for name, fn in cases.items():
+        found = fn()
+        print(json.dumps({
+            "case": name, "messages": total_messages, "results": len(found["results"]),
+            "total_runs": found["total"], "truncated": found["truncated"], **timed(fn, args.repeat),
+        }))
+
+
+if __name__ == "__main__":
+    main()
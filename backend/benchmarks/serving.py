@@ -0,0 +1,184 @@
+"""
+Requests/s and latency of the web app under concurrent load: the previous
+setup (runserver, sync views, CONN_MAX_AGE connections) against the ASGI
+server (`manage.py serve`: uvicorn workers, async views, pooled connections).
+
+    BENCH_DATABASE=postgres python -m benchmarks.serving --concurrency 50 --duration 15
+    python -m benchmarks.serving --servers asgi --workers 4 --endpoints history
+    python -m benchmarks.serving --reuse                       # skip seeding
+
+Seeds the benchmark database (see benchmarks/settings.py) with --runs
+completed runs, then starts each server in turn on a free port and drives
+every endpoint with --concurrency concurrent clients for --duration
+seconds. Prints one JSON line per server and endpoint. Connection pooling
+only applies on PostgreSQL; on SQLite both servers use plain connections.
+The load is generated from this process, so leave it spare cores.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from datetime import timedelta
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "benchmarks.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+import httpx  # noqa: E402
+from django.conf import settings  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from core.models import AgentMessage, AgentRun  # noqa: E402
+
+WORDS = "agent venue budget risk latency market persona schedule catering keynote".split()
+ENDPOINTS = {
+    "dashboard": ("GET", "/"),
+    "run_detail": ("GET", "/run/{run_id}/"),
+    "history": ("GET", "/api/history/"),
+    "create_agent": ("POST", "/create_agent/"),
+    # Streamed chunk by chunk; the whole body is read, so this is export throughput
+    "export": ("GET", "/api/runs/{run_id}/export/?format=ndjson"),
+}
+
+
+def server_command(name, port, workers):
+    if name == "runserver":
+        return [sys.executable, "manage.py", "runserver", "--noreload", f"127.0.0.1:{port}"], {"DATABASE_POOL": "false"}
+    return (
+        [sys.executable, "manage.py", "serve", f"127.0.0.1:{port}", "--workers", str(workers)],
+        {"DATABASE_POOL": "true", "ASGI_RELOAD": "false"},
+    )
+
+
+def seed(runs, messages_per_run):
+    call_command("flush", interactive=False, verbosity=0)
+    rng = random.Random(42)
+    now = timezone.now()
+    for start in range(0, runs, 200):
+        run_objects, messages = [], []
+        for i in range(start, min(runs, start + 200)):
+            run = AgentRun(
+                run_id=uuid.uuid4(), name=f"Mission {i}", status="completed",
+                finished_at=now, message_count=messages_per_run, token_count=messages_per_run * 100,
+            )
+            run_objects.append(run)
+            for seq in range(1, messages_per_run + 1):
+                messages.append(AgentMessage(
+                    run_id=run.run_id, seq=seq, agent_name="Agent", message_type="thought",
+                    content=" ".join(rng.choice(WORDS) for _ in range(60)),
+                    token_count=100, timestamp=now - timedelta(minutes=runs - i, seconds=-seq),
+                ))
+        AgentRun.objects.bulk_create(run_objects)
+        AgentMessage.objects.bulk_create(messages, batch_size=5000)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_ready(base_url, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{base_url}/api/history/", timeout=2).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.25)
+    raise RuntimeError(f"Server at {base_url} did not start")
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    if not values:
+        return float("nan")
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+async def load(base_url, method, path, concurrency, duration):
+    latencies, errors = [], 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        deadline = time.perf_counter() + duration
+
+        async def client_loop():
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                try:
+                    response = await client.request(method, path, headers={"Accept-Encoding": "gzip"})
+                    ok = response.status_code < 400
+                except httpx.HTTPError:
+                    ok = False
+                if ok:
+                    latencies.append((time.perf_counter() - started) * 1000)
+                else:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return {
+        "requests": len(latencies), "errors": errors,
+        "requests_per_s": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50), 2), "p99_ms": round(percentile(latencies, 99), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--servers", nargs="+", choices=("runserver", "asgi"), default=["runserver", "asgi"])
+    parser.add_argument("--endpoints", nargs="+", choices=ENDPOINTS, default=list(ENDPOINTS))
+    parser.add_argument("--workers", type=int, default=settings.ASGI_WORKERS, help="uvicorn workers for asgi.")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=15, help="Seconds of load per endpoint.")
+    parser.add_argument("--runs", type=int, default=2000)
+    parser.add_argument("--messages-per-run", type=int, default=50)
+    parser.add_argument("--reuse", action="store_true", help="Use the already seeded database.")
+    args = parser.parse_args()
+
+    call_command("migrate", verbosity=0)
+    if not args.reuse:
+        started = time.perf_counter()
+        seed(args.runs, args.messages_per_run)
+        print(json.dumps({"database": connection.vendor, "seeded_s": round(time.perf_counter() - started, 1)}), flush=True)
+    run_id = AgentRun.objects.filter(status="completed").values_list("run_id", flat=True).first()
+    # The servers open their own connections
+    connection.close()
+
+    for name in args.servers:
+        port = free_port()
+        command, env = server_command(name, port, args.workers)
+        server = subprocess.Popen(
+            command, cwd=settings.BASE_DIR, env={**os.environ, **env, "LOG_LEVEL": "WARNING"},
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        base_url = f"http://127.0.0.1:{port}"
+        try:
+            wait_ready(base_url)
+            for endpoint in args.endpoints:
+                method, path = ENDPOINTS[endpoint]
+                result = asyncio.run(load(base_url, method, path.format(run_id=run_id), args.concurrency, args.duration))
+                print(json.dumps({
+                    "server": name, "endpoint": endpoint, "concurrency": args.concurrency,
+                    "workers": args.workers if name == "asgi" else 1, **result,
+                }), flush=True)
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+
+if __name__ == "__main__":
+    main()
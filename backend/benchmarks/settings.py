@@ -0,0 +1,22 @@
+"""
+Django settings for the benchmarks: the app settings on a local SQLite file
+(or Postgres when BENCH_DATABASE=postgres), so they run without Docker.
+"""
+import os
+
+from app.settings import *  # noqa: F401,F403
+
+if os.getenv("BENCH_DATABASE", "sqlite") == "sqlite":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.getenv("BENCH_SQLITE_PATH", str(BASE_DIR / "benchmarks" / "bench.sqlite3")),
+            # Mission threads and the message flusher write concurrently
+            "OPTIONS": {"timeout": 30},
+        }
+    }
+else:
+    DATABASES["default"]["HOST"] = os.getenv("POSTGRES_HOST", "localhost")
+
+# Keep benchmark output to its JSON result lines
+LOGGING = {**LOGGING, "level": os.getenv("LOG_LEVEL", "WARNING")}
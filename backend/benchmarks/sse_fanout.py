@@ -0,0 +1,160 @@
+"""
+Publish-to-client latency of the SSE fan-out.
+
+Compares the old per-viewer blocking pubsub loop with the shared
+`StreamBroker` used by `fastapi_app.main`. Both run inside one asyncio
+loop, exactly like uvicorn serves them, while a separate thread publishes.
+
+    python -m benchmarks.sse_fanout --viewers 200 --messages 200
+    python -m benchmarks.sse_fanout --redis-url redis://localhost:6379/0
+
+Without --redis-url an in-process fakeredis server is used.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import threading
+import time
+
+import redis
+import redis.asyncio as aioredis
+
+from fastapi_app.broker import StreamBroker
+
+CHANNEL = "run:benchmark"
+
+
+async def legacy_event_stream(sync_client, run_id):
+    # Copy of the loop event_stream used before the shared broker
+    pubsub = sync_client.pubsub()
+    pubsub.subscribe(f"run:{run_id}")
+    try:
+        while True:
+            message = pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            if message and message.get("type") == "message":
+                data = json.loads(message["data"])
+                yield f"data: {json.dumps(data)}\n\n"
+            await asyncio.sleep(1)
+    finally:
+        pubsub.unsubscribe()
+        pubsub.close()
+
+
+async def broker_event_stream(broker):
+    queue = broker.subscribe(CHANNEL)
+    try:
+        while True:
+            data = await queue.get()
+            if data is None:
+                break
+            yield f"data: {data}\n\n"
+    finally:
+        broker.unsubscribe(CHANNEL, queue)
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    if not values:
+        return float("nan")
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+async def consume(stream, expected, latencies):
+    received = 0
+    async for frame in stream:
+        payload = json.loads(frame[len("data: "):])
+        latencies.append((time.time() - payload["sent_at"]) * 1000)
+        received += 1
+        if received >= expected:
+            break
+
+
+def publisher(sync_client, messages, interval, ready):
+    ready.wait()
+    for i in range(messages):
+        sync_client.publish(CHANNEL, json.dumps({"seq": i, "sent_at": time.time(), "content": "x" * 200}))
+        time.sleep(interval)
+
+
+async def run_case(name, make_stream, sync_client, viewers, messages, interval, timeout):
+    latencies = []
+    ready = threading.Event()
+    streams = [make_stream() for _ in range(viewers)]
+    consumers = [asyncio.create_task(consume(s, messages, latencies)) for s in streams]
+
+    # Give every viewer time to subscribe before publishing starts.
+    await asyncio.sleep(1.5)
+    ready.set()
+    thread = threading.Thread(target=publisher, args=(sync_client, messages, interval, ready), daemon=True)
+    started = time.perf_counter()
+    thread.start()
+
+    done, pending = await asyncio.wait(consumers, timeout=timeout)
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+    elapsed = time.perf_counter() - started
+
+    return {
+        "case": name,
+        "viewers": viewers,
+        "messages": messages,
+        "delivered": len(latencies),
+        "expected": viewers * messages,
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "max_ms": round(max(latencies), 2) if latencies else None,
+        "mean_ms": round(statistics.fmean(latencies), 2) if latencies else None,
+        "elapsed_s": round(elapsed, 2),
+    }
+
+
+async def main(args):
+    if args.redis_url:
+        sync_client = redis.from_url(args.redis_url)
+        async_client = aioredis.from_url(args.redis_url)
+    else:
+        try:
+            import fakeredis
+        except ImportError as exc:
+            raise SystemExit(
+                "fakeredis is needed to run without --redis-url: pip install -r requirements-local.txt"
+            ) from exc
+
+        server = fakeredis.FakeServer()
+        sync_client = fakeredis.FakeRedis(server=server)
+        async_client = fakeredis.FakeAsyncRedis(server=server)
+
+    results = []
+
+    broker = StreamBroker(async_client)
+    await broker.start()
+    results.append(await run_case(
+        "shared_broker", lambda: broker_event_stream(broker), sync_client,
+        args.viewers, args.messages, args.interval, args.timeout,
+    ))
+    await broker.stop()
+
+    if not args.skip_legacy:
+        results.append(await run_case(
+            "legacy_loop", lambda: legacy_event_stream(sync_client, "benchmark"), sync_client,
+            args.legacy_viewers, args.messages, args.interval, args.timeout,
+        ))
+
+    for result in results:
+        print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--redis-url", default="")
+    parser.add_argument("--viewers", type=int, default=200)
+    parser.add_argument("--legacy-viewers", type=int, default=5,
+                        help="The legacy loop blocks the event loop, so keep this small.")
+    parser.add_argument("--messages", type=int, default=50)
+    parser.add_argument("--interval", type=float, default=0.05, help="Seconds between publishes.")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--skip-legacy", action="store_true")
+    asyncio.run(main(parser.parse_args()))
@@ -1,6 +1,7 @@
 from django.contrib import admin
-from .models import AgentRun, AgentMessage
+from .models import AgentRun, AgentMessage, TaskCheckpoint
 
 
 admin.site.register(AgentRun)
 admin.site.register(AgentMessage)
+admin.site.register(TaskCheckpoint)
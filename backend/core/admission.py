@@ -0,0 +1,142 @@
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.utils import timezone
+
+from core import mission_queue
+from core.models import AgentRun
+from core.persistence import close_buffer, record_message
+from core.redis_client import publish_message
+
+NEW_STATUS = "new"
+QUEUED_STATUS = "queued"
+EXPIRED_STATUS = "expired"
+REJECTED_STATUS = "rejected"
+RESUMABLE_STATUSES = ("failed", EXPIRED_STATUS)
+# Runs from create_agent wait as "new" until submitted; a run turned away
+# by a full queue was never started either
+NEW_STATUSES = (NEW_STATUS, REJECTED_STATUS)
+
+_durations = {"value": None, "loaded_at": 0.0}
+_durations_lock = threading.Lock()
+
+
+def average_duration() -> float:
+    """Mean duration of the last 20 completed runs, re-read at most once a minute."""
+    with _durations_lock:
+        if _durations["value"] is not None and time.monotonic() - _durations["loaded_at"] < 60:
+            return _durations["value"]
+    durations = list(
+        AgentRun.objects.filter(status="completed", duration_seconds__isnull=False)
+        .order_by("-started_at").values_list("duration_seconds", flat=True)[:20]
+    )
+    value = sum(durations) / len(durations) if durations else settings.MISSION_DEFAULT_DURATION
+    with _durations_lock:
+        _durations.update(value=value, loaded_at=time.monotonic())
+    return value
+
+
+def estimate_wait(position: int, running: int) -> float:
+    """
+    Rough seconds until the run at `position` (1-based) starts: the slots
+    still free take the first runs, the rest wait whole average missions.
+    """
+    free = max(0, settings.MISSION_MAX_RUNNING - running)
+    if position <= free:
+        return 0.0
+    waves = math.ceil((position - free) / max(1, settings.MISSION_MAX_RUNNING))
+    return round(waves * average_duration(), 1)
+
+
+def queue_status(run_id) -> dict:
+    pending = mission_queue.pending_run_ids()
+    run_id = str(run_id)
+    if run_id not in pending:
+        return {"position": 0, "queue_depth": len(pending), "eta_seconds": 0.0}
+    position = pending.index(run_id) + 1
+    return {
+        "position": position,
+        "queue_depth": len(pending),
+        "eta_seconds": estimate_wait(position, mission_queue.running_count()),
+    }
+
+
+def publish_positions() -> None:
+    """Sends every waiting run its place in line and estimated start on its stream."""
+    pending = mission_queue.pending_run_ids()
+    if not pending:
+        return
+    running = mission_queue.running_count()
+    now = timezone.now().isoformat()
+    for position, run_id in enumerate(pending, start=1):
+        publish_message(run_id, {
+            "run_id": run_id,
+            "type": "queue",
+            "agent_name": "System",
+            "position": position,
+            "queue_depth": len(pending),
+            "eta_seconds": estimate_wait(position, running),
+            "timestamp": now,
+        }, verbose=False)
+
+
+def expire_run(job: dict) -> None:
+    waited = time.time() - job["queued_at"]
+    record_message(
+        job["run_id"], "System",
+        f"Error: mission expired after waiting {waited:.0f}s for a free slot. Start it again later.", "error",
+    )
+    close_buffer(job["run_id"])
+    run = AgentRun.objects.filter(run_id=job["run_id"], status=QUEUED_STATUS).first()
+    if run is not None:
+        run.mark_finished(EXPIRED_STATUS)
+
+
+def update_queue() -> list:
+    """
+    Admits what fits, expires what waited too long and republishes queue
+    positions. Called whenever a mission is submitted or finishes, and on
+    every worker heartbeat. Returns the admitted run IDs.
+    """
+    admitted, expired = mission_queue.admit_jobs()
+    for job in expired:
+        expire_run(job)
+    publish_positions()
+    return admitted
+
+
+def is_new(run: AgentRun) -> bool:
+    """True for a run that has never been submitted, which start_mission may start."""
+    return not run.mission_type and run.status in NEW_STATUSES
+
+
+def submit_mission(run: AgentRun, mission_type: str, name: str, priority=None, cache=None, stream=None) -> dict:
+    """
+    Queues a mission behind admission control. Raises QueueFull (the run
+    is marked rejected) or ValueError for an invalid type or priority.
+    Returns the run's queue status.
+    """
+    try:
+        mission_queue.enqueue_mission(run.run_id, mission_type, name, cache=cache, stream=stream, priority=priority)
+    except mission_queue.QueueFull:
+        run.mark_finished(REJECTED_STATUS)
+        raise
+    # Nothing is admitted before update_queue, so a worker cannot have
+    # marked the run running yet
+    AgentRun.objects.filter(run_id=run.run_id).update(
+        status=QUEUED_STATUS, mission_type=mission_type, mission_input=name,
+    )
+    update_queue()
+    return queue_status(run.run_id)
+
+
+def resume_mission(run: AgentRun, priority=None) -> dict:
+    """
+    Queues a failed or expired run again with the mission it was started
+    with. Tasks with a checkpoint are restored instead of re-run.
+    """
+    if run.status not in RESUMABLE_STATUSES or not run.mission_type:
+        raise ValueError(f"Only {' or '.join(RESUMABLE_STATUSES)} runs can be resumed")
+    return submit_mission(run, run.mission_type, run.mission_input, priority=priority)
@@ -3,4 +3,9 @@ from django.apps import AppConfig
 
 class CoreConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
-    name = "core"
\ No newline at end of file
+    name = "core"
+
+    def ready(self):
+        from core.telemetry import setup_tracing
+
+        setup_tracing("agent-swarm-django")
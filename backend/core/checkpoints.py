@@ -0,0 +1,30 @@
+import logging
+
+from core.models import TaskCheckpoint
+
+logger = logging.getLogger(__name__)
+
+
+class RunCheckpoints:
+    """
+    Task outputs of one run, keyed by task name. The scheduler saves each
+    task as it finishes; a resumed run loads them and skips those tasks.
+    A dependent task's context is rebuilt from the stored outputs, so it
+    sees the same text as on the first attempt.
+    """
+
+    def __init__(self, run_id):
+        self.run_id = run_id
+
+    def load(self) -> dict:
+        return dict(TaskCheckpoint.objects.filter(run_id=self.run_id).values_list("task_name", "output"))
+
+    def save(self, task_name: str, agent_name: str, output) -> None:
+        TaskCheckpoint.objects.update_or_create(
+            run_id=self.run_id, task_name=task_name,
+            defaults={"agent_name": agent_name, "output": str(output or "")},
+        )
+        logger.debug("Task checkpoint saved", extra={"run_id": str(self.run_id), "task": task_name})
+
+    def count(self) -> int:
+        return TaskCheckpoint.objects.filter(run_id=self.run_id).count()
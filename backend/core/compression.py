@@ -0,0 +1,180 @@
+"""
+zstd/gzip helpers for stored message bodies and HTTP responses.
+
+Stored bodies start with a one-byte marker: RAW (UTF-8 text as is) or
+ZSTD (a zstd frame, which records the ID of the dictionary it was
+compressed with, if any). Nothing here touches the database, so the
+FastAPI stream service can use the HTTP helpers without Django.
+"""
+import gzip
+import inspect
+import threading
+import zlib
+from functools import wraps
+
+import zstandard
+
+RAW = b"\x00"
+ZSTD = b"\x01"
+
+ENCODINGS = ("zstd", "gzip")
+
+_local = threading.local()
+
+
+def _compressor(level: int, dictionary):
+    # ZstdCompressor instances are not thread-safe; keep one per thread
+    cache = getattr(_local, "compressors", None)
+    if cache is None:
+        cache = _local.compressors = {}
+    key = (level, dictionary.dict_id() if dictionary is not None else 0)
+    compressor = cache.get(key)
+    if compressor is None:
+        compressor = cache[key] = zstandard.ZstdCompressor(level=level, dict_data=dictionary)
+    return compressor
+
+
+def _decompressor(dictionary):
+    cache = getattr(_local, "decompressors", None)
+    if cache is None:
+        cache = _local.decompressors = {}
+    key = dictionary.dict_id() if dictionary is not None else 0
+    decompressor = cache.get(key)
+    if decompressor is None:
+        decompressor = cache[key] = zstandard.ZstdDecompressor(dict_data=dictionary)
+    return decompressor
+
+
+def encode_text(text: str, min_size: int = 512, level: int = 3, dictionary=None) -> bytes:
+    """
+    Encodes text for storage, zstd-compressed when it is at least
+    `min_size` bytes and compression actually saves space.
+    """
+    data = text.encode("utf-8")
+    if len(data) >= min_size:
+        compressed = _compressor(level, dictionary).compress(data)
+        if len(compressed) < len(data):
+            return ZSTD + compressed
+    return RAW + data
+
+
+def frame_dictionary_id(data: bytes) -> int:
+    """Dictionary ID of a stored ZSTD body (0 = none), read from the frame header."""
+    return zstandard.get_frame_parameters(data[1:]).dict_id
+
+
+def decode_text(data, dictionary=None) -> str:
+    """Decodes a stored body. `dictionary` must be the one its frame names."""
+    data = bytes(data)
+    marker, body = data[:1], data[1:]
+    if marker == ZSTD:
+        return _decompressor(dictionary).decompress(body).decode("utf-8")
+    if marker == RAW:
+        return body.decode("utf-8")
+    raise ValueError(f"Unknown stored text marker {marker!r}")
+
+
+def train_dictionary(samples, size: int = 112 * 1024) -> zstandard.ZstdCompressionDict:
+    return zstandard.train_dictionary(size, [sample.encode("utf-8") for sample in samples])
+
+
+def load_dictionary(data: bytes) -> zstandard.ZstdCompressionDict:
+    return zstandard.ZstdCompressionDict(bytes(data))
+
+
+def negotiate_encoding(accept_encoding: str):
+    """
+    Picks zstd or gzip from an Accept-Encoding header, preferring zstd
+    unless the client ranks gzip higher. Returns None for identity.
+    """
+    ranked = {}
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name == "*":
+            for encoding in ENCODINGS:
+                ranked.setdefault(encoding, quality)
+        elif name in ENCODINGS:
+            ranked[name] = quality
+    accepted = [encoding for encoding in ENCODINGS if ranked.get(encoding, 0) > 0]
+    if not accepted:
+        return None
+    # ENCODINGS order breaks ties
+    return max(accepted, key=lambda encoding: ranked[encoding])
+
+
+def compress_body(body: bytes, encoding: str, level: int = None) -> bytes:
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=level or 3).compress(body)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=level or 6, mtime=0)
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+class StreamCompressor:
+    """
+    Compresses a stream that must stay readable as it goes, such as SSE:
+    every chunk is flushed to a block boundary so the client can decode
+    it at once, while later chunks still reuse the earlier window.
+    """
+
+    def __init__(self, encoding: str, level: int = None):
+        self.encoding = encoding
+        if encoding == "zstd":
+            self.compressor = zstandard.ZstdCompressor(level=level or 3).compressobj()
+        elif encoding == "gzip":
+            self.compressor = zlib.compressobj(level or 6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        else:
+            raise ValueError(f"Unsupported encoding: {encoding}")
+
+    def compress(self, chunk: bytes) -> bytes:
+        if self.encoding == "zstd":
+            return self.compressor.compress(chunk) + self.compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+        return self.compressor.compress(chunk) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def close(self) -> bytes:
+        return self.compressor.flush()
+
+
+def compress_response(min_size: int = 1024):
+    """
+    View decorator: compresses the response with zstd or gzip as the
+    client's Accept-Encoding allows, for bodies of at least `min_size`
+    bytes. Streaming and already-encoded responses are left alone. Works
+    on sync and async views alike.
+    """
+    def decorator(view):
+        def compress(request, response):
+            from django.utils.cache import patch_vary_headers
+
+            patch_vary_headers(response, ("Accept-Encoding",))
+            if response.streaming or response.has_header("Content-Encoding") or len(response.content) < min_size:
+                return response
+            encoding = negotiate_encoding(request.headers.get("Accept-Encoding", ""))
+            if encoding is None:
+                return response
+            response.content = compress_body(response.content, encoding)
+            response["Content-Encoding"] = encoding
+            response["Content-Length"] = str(len(response.content))
+            if response.has_header("ETag"):
+                response["ETag"] = response["ETag"].rstrip('"') + f'-{encoding}"'
+            return response
+
+        if inspect.iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                return compress(request, await view(request, *args, **kwargs))
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            return compress(request, view(request, *args, **kwargs))
+        return wrapper
+    return decorator
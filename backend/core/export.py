@@ -0,0 +1,233 @@
+"""
+Streaming exports of runs' messages as NDJSON or Parquet.
+
+An export is an iterator of byte chunks, so the views hand it to
+StreamingHttpResponse and `manage.py export_runs` writes it to a file.
+Runs are read in (started_at, run_id) order and each run's messages with
+a database iterator (a server-side cursor on PostgreSQL), or from the
+run's Parquet archive (core.retention). Memory is bounded by one NDJSON
+chunk or one Parquet row group, however large the export.
+
+Every record is one message with its run's ID, name, mission type and
+status, in COLUMNS order. Under ASGI the views stream an export through
+achunks, since Django would read a sync iterator to the end before
+sending anything.
+"""
+import json
+
+import zstandard
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from core.models import AgentMessage, AgentRun
+from core.retention import archived_messages
+
+FORMATS = ("ndjson", "parquet")
+COMPRESSIONS = ("none", "zstd")
+# NDJSON is exported as is unless asked; Parquet pages are zstd-compressed unless asked
+DEFAULT_COMPRESSION = {"ndjson": "none", "parquet": "zstd"}
+
+RUN_FIELDS = ("run_id", "name", "mission_type", "status", "archive_path")
+MESSAGE_FIELDS = (
+    "seq", "agent_name", "message_type", "tool_used", "content",
+    "token_count", "prompt_tokens", "completion_tokens", "timestamp",
+)
+COLUMNS = ("run_id", "run_name", "mission_type", "run_status", *MESSAGE_FIELDS)
+
+
+def select_runs(run_ids=None, since=None, until=None, mission_type=None, status=None):
+    """Runs to export, oldest first. Dates apply to started_at."""
+    runs = AgentRun.objects.all()
+    if run_ids:
+        runs = runs.filter(run_id__in=run_ids)
+    if since:
+        runs = runs.filter(started_at__gte=since)
+    if until:
+        runs = runs.filter(started_at__lt=until)
+    if mission_type:
+        runs = runs.filter(mission_type=mission_type)
+    if status:
+        runs = runs.filter(status=status)
+    return runs.order_by("started_at", "run_id")
+
+
+def iter_records(runs):
+    """Message records of `runs` as tuples in COLUMNS order, run by run, in publish order."""
+    for run in runs.values(*RUN_FIELDS).iterator(chunk_size=500):
+        prefix = (str(run["run_id"]), run["name"], run["mission_type"], run["status"])
+        if run["archive_path"]:
+            messages = (
+                tuple(message[field] for field in MESSAGE_FIELDS)
+                for message in archived_messages(run["archive_path"], run["run_id"])
+            )
+        else:
+            messages = (
+                AgentMessage.objects.filter(run_id=run["run_id"])
+                .order_by("timestamp", "id")
+                .values_list(*MESSAGE_FIELDS)
+                .iterator(chunk_size=settings.EXPORT_FETCH_SIZE)
+            )
+        for message in messages:
+            yield prefix + message
+
+
+def ndjson_chunks(records, chunk_bytes: int = None):
+    """One JSON object per line, yielded in chunks of about `chunk_bytes`."""
+    chunk_bytes = chunk_bytes or settings.EXPORT_CHUNK_BYTES
+    buffer, size = [], 0
+    for record in records:
+        row = dict(zip(COLUMNS, record))
+        row["timestamp"] = row["timestamp"].isoformat()
+        line = (json.dumps(row, ensure_ascii=False) + "\n").encode("utf-8")
+        buffer.append(line)
+        size += len(line)
+        if size >= chunk_bytes:
+            yield b"".join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield b"".join(buffer)
+
+
+def zstd_chunks(chunks, level: int = None):
+    """Compresses a chunk stream into a single zstd frame."""
+    compressor = zstandard.ZstdCompressor(level=level or settings.EXPORT_ZSTD_LEVEL).compressobj()
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ("run_id", pa.string()),
+        ("run_name", pa.string()),
+        ("mission_type", pa.string()),
+        ("run_status", pa.string()),
+        ("seq", pa.int64()),
+        ("agent_name", pa.string()),
+        ("message_type", pa.string()),
+        ("tool_used", pa.string()),
+        ("content", pa.large_string()),
+        ("token_count", pa.int64()),
+        ("prompt_tokens", pa.int64()),
+        ("completion_tokens", pa.int64()),
+        ("timestamp", pa.timestamp("us", tz="UTC")),
+    ])
+
+
+class ChunkSink:
+    """A write-only file for ParquetWriter whose output is collected and drained between row groups."""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def writable(self) -> bool:
+        return True
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def parquet_chunks(records, compression: str = "zstd", row_group: int = None):
+    """A Parquet file written one row group of `row_group` messages at a time."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    row_group = row_group or settings.EXPORT_PARQUET_ROW_GROUP
+    schema = export_schema()
+    sink = ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression=compression)
+    columns = [[] for _ in COLUMNS]
+
+    def write_group():
+        writer.write_table(pa.Table.from_arrays(
+            [pa.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema,
+        ), row_group_size=row_group)
+        for values in columns:
+            values.clear()
+        return sink.drain()
+
+    for record in records:
+        for values, value in zip(columns, record):
+            values.append(value)
+        if len(columns[0]) >= row_group:
+            yield write_group()
+    if columns[0]:
+        yield write_group()
+    writer.close()
+    yield sink.drain()
+
+
+def export_chunks(runs, export_format: str = "ndjson", compression: str = None):
+    """
+    The export of `runs` as byte chunks. NDJSON with zstd compression is
+    one zstd frame (a .ndjson.zst file); Parquet uses zstd as its page
+    codec.
+    """
+    if export_format not in FORMATS:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+    compression = compression or DEFAULT_COMPRESSION[export_format]
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"compression must be one of {', '.join(COMPRESSIONS)}")
+    records = iter_records(runs)
+    if export_format == "parquet":
+        return parquet_chunks(records, compression)
+    chunks = ndjson_chunks(records)
+    return zstd_chunks(chunks) if compression == "zstd" else chunks
+
+
+async def achunks(chunks):
+    """
+    Async iterator over a sync chunk iterator. Each chunk is produced on
+    the request's sync thread, where the export's database cursors live,
+    and sent before the next one is read.
+    """
+    chunks = iter(chunks)
+    done = object()
+    pull = sync_to_async(next, thread_sensitive=True)
+    try:
+        while True:
+            chunk = await pull(chunks, done)
+            if chunk is done:
+                return
+            yield chunk
+    finally:
+        # Client gone or export finished: release the cursors on their thread
+        if hasattr(chunks, "close"):
+            await sync_to_async(chunks.close, thread_sensitive=True)()
+
+
+def export_filename(name: str, export_format: str, compression: str = None) -> str:
+    compression = compression or DEFAULT_COMPRESSION[export_format]
+    if export_format == "parquet":
+        return f"{name}.parquet"
+    return f"{name}.ndjson.zst" if compression == "zstd" else f"{name}.ndjson"
+
+
+def export_content_type(export_format: str, compression: str = None) -> str:
+    compression = compression or DEFAULT_COMPRESSION[export_format]
+    if export_format == "parquet":
+        return "application/vnd.apache.parquet"
+    return "application/zstd" if compression == "zstd" else "application/x-ndjson"
@@ -0,0 +1,95 @@
+import threading
+import time
+
+from django.conf import settings
+from django.db import models
+
+from core.compression import ZSTD, decode_text, encode_text, frame_dictionary_id, load_dictionary
+
+_lock = threading.Lock()
+_dictionaries = {}
+_active = {"loaded_at": None, "dictionary": None}
+
+
+def get_dictionary(dict_id: int):
+    """Loads a trained dictionary by its zstd ID, once per process."""
+    dictionary = _dictionaries.get(dict_id)
+    if dictionary is None:
+        from core.models import CompressionDictionary
+
+        row = CompressionDictionary.objects.filter(dict_id=dict_id).only("data").first()
+        if row is None:
+            raise LookupError(f"Compression dictionary {dict_id} is missing")
+        with _lock:
+            dictionary = _dictionaries.setdefault(dict_id, load_dictionary(row.data))
+    return dictionary
+
+
+def active_dictionary():
+    """
+    The newest trained dictionary, used for new writes. Re-read every
+    MESSAGE_COMPRESS_DICTIONARY_REFRESH seconds so a freshly trained one
+    is picked up without a restart.
+    """
+    if not settings.MESSAGE_COMPRESS_DICTIONARY:
+        return None
+    loaded_at = _active["loaded_at"]
+    if loaded_at is not None and time.monotonic() - loaded_at < settings.MESSAGE_COMPRESS_DICTIONARY_REFRESH:
+        return _active["dictionary"]
+
+    from core.models import CompressionDictionary
+
+    latest = CompressionDictionary.objects.order_by("-created_at").values_list("dict_id", flat=True).first()
+    dictionary = get_dictionary(latest) if latest is not None else None
+    with _lock:
+        _active.update(loaded_at=time.monotonic(), dictionary=dictionary)
+    return dictionary
+
+
+def forget_dictionaries():
+    """Drops cached dictionaries, e.g. after training a new one in this process."""
+    with _lock:
+        _dictionaries.clear()
+        _active.update(loaded_at=None, dictionary=None)
+
+
+class CompressedTextField(models.BinaryField):
+    """
+    Text stored as bytes: zstd-compressed (with the newest trained
+    dictionary, if any) once it reaches MESSAGE_COMPRESS_MIN_BYTES,
+    raw UTF-8 below that. Reads always return `str`, whatever format a
+    row was written in, so callers use it like a TextField. The column
+    cannot be filtered on by content.
+    """
+
+    description = "Compressed text"
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("editable", True)
+        super().__init__(*args, **kwargs)
+
+    def get_prep_value(self, value):
+        value = super().get_prep_value(value)
+        if isinstance(value, str):
+            value = encode_text(
+                value,
+                min_size=settings.MESSAGE_COMPRESS_MIN_BYTES,
+                level=settings.MESSAGE_COMPRESS_LEVEL,
+                dictionary=active_dictionary(),
+            )
+        return value
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return None
+        value = bytes(value)
+        dict_id = frame_dictionary_id(value) if value[:1] == ZSTD else 0
+        return decode_text(value, get_dictionary(dict_id) if dict_id else None)
+
+    def to_python(self, value):
+        if isinstance(value, (bytes, memoryview)):
+            return self.from_db_value(value, None, None)
+        return value
+
+    def value_to_string(self, obj):
+        return self.value_from_object(obj)
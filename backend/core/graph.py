@@ -0,0 +1,241 @@
+"""
+The live agent graph of a run, kept on the server.
+
+A RunGraph is created by the mission from its task graph (agents.scheduler)
+and updated as tasks start, take steps and finish. Every change bumps the
+graph's version, stores the new snapshot in Redis and publishes the
+change as a compact `graph_delta` event on the run channel:
+
+    {"type": "graph_delta", "version": 7, "ops": [
+        {"op": "node", "id": "n_ux", "state": "running", "started_at": "..."},
+        {"op": "edge", "from": "n_pm", "to": "n_ux"}]}
+
+A `node` op adds the node or patches the fields it carries. Viewers
+load the snapshot from GET /api/runs/<run_id>/graph/ and apply deltas
+with higher versions. A gap in versions means they missed one and must
+reload the snapshot. When the run ends the snapshot is saved to
+AgentRun.graph, so the graph outlives the Redis copy.
+"""
+import datetime
+import json
+import re
+import threading
+
+from django.utils import timezone
+
+from core.models import AgentMessage, AgentRun
+from core.redis_client import EVENT_LOG_TTL, UUIDEncoder, publish_message, r
+
+START, MANAGER, DONE = "start", "manager", "done"
+# Node states; "restored" tasks were finished by an earlier attempt of the run
+PENDING, RUNNING, FINISHED, RESTORED, FAILED = "pending", "running", "done", "restored", "failed"
+
+_active = {}
+_active_lock = threading.Lock()
+
+
+def graph_key(run_id) -> str:
+    return f"run:{str(run_id)}:graph"
+
+
+def node_id(task_name: str) -> str:
+    # Prefixed so task names never clash with Mermaid keywords such as "end"
+    return f"n_{task_name}"
+
+
+def base_graph(run_id) -> dict:
+    return {
+        "run_id": str(run_id),
+        "version": 0,
+        "nodes": [
+            {"id": START, "label": "Swarm Ready", "kind": "start", "state": FINISHED},
+            {"id": MANAGER, "label": "Manager", "kind": "manager", "state": PENDING},
+        ],
+        "edges": [{"from": START, "to": MANAGER}],
+    }
+
+
+def agent_node_id(agent_name: str) -> str:
+    return "a_" + re.sub(r"\W", "_", agent_name)
+
+
+def active_graph(run_id):
+    """The RunGraph of a run being executed in this process, if any."""
+    return _active.get(str(run_id))
+
+
+class RunGraph:
+    """
+    Graph model of one run. Thread-safe: the scheduler updates it from the
+    mission thread and the agents' step callbacks from task threads.
+    Changes are published while holding the lock, so deltas reach the
+    run channel in version order.
+    """
+
+    def __init__(self, run_id):
+        self.run_id = str(run_id)
+        self.lock = threading.Lock()
+        self.graph = base_graph(run_id)
+        self.nodes = {node["id"]: node for node in self.graph["nodes"]}
+        self.roles = {}
+        # A resumed run continues the versions its viewers already have
+        stored = r.get(graph_key(run_id))
+        if stored:
+            self.graph["version"] = json.loads(stored)["version"]
+        else:
+            saved = AgentRun.objects.filter(run_id=run_id).values_list("graph", flat=True).first()
+            self.graph["version"] = (saved or {}).get("version", 0)
+
+    def __enter__(self):
+        with _active_lock:
+            _active[self.run_id] = self
+        return self
+
+    def __exit__(self, *exc_info):
+        with _active_lock:
+            _active.pop(self.run_id, None)
+        self.save()
+
+    def _commit(self, ops) -> None:
+        # Patches that changed nothing come back as None
+        ops = [op for op in ops if op]
+        if not ops:
+            return
+        self.graph["version"] += 1
+        r.set(graph_key(self.run_id), json.dumps(self.graph, cls=UUIDEncoder), ex=EVENT_LOG_TTL)
+        publish_message(self.run_id, {
+            "run_id": self.run_id,
+            "type": "graph_delta",
+            "version": self.graph["version"],
+            "ops": ops,
+        }, verbose=False)
+
+    def _patch(self, key: str, **fields) -> dict:
+        node = self.nodes.get(key)
+        if node is None:
+            node = self.nodes[key] = {"id": key}
+            self.graph["nodes"].append(node)
+        changed = {field: value for field, value in fields.items() if node.get(field) != value}
+        node.update(changed)
+        return {"op": "node", "id": key, **changed} if changed else None
+
+    def _edge(self, source: str, target: str) -> dict:
+        edge = {"from": source, "to": target}
+        if edge in self.graph["edges"]:
+            return None
+        self.graph["edges"].append(edge)
+        return {"op": "edge", **edge}
+
+    def define(self, task_nodes, restored=()) -> None:
+        """
+        Adds a node per task with edges from its dependencies, or from the
+        Manager for tasks without any, and into "Mission Complete" from
+        tasks nothing depends on. Tasks in `restored` start out finished.
+        Starts with a `reset` op, so viewers of an earlier attempt of the
+        run start over.
+        """
+        task_nodes = list(task_nodes)
+        needed = {dep for node in task_nodes for dep in node.depends_on}
+        with self.lock:
+            ops = [{"op": "reset", "graph": base_graph(self.run_id)}]
+            ops.append(self._patch(MANAGER, state=RUNNING, started_at=timezone.now().isoformat()))
+            ops.append(self._patch(DONE, label="Mission Complete", kind="done", state=PENDING))
+            for task_node in task_nodes:
+                role = task_node.task.agent.role
+                self.roles.setdefault(role, []).append(node_id(task_node.name))
+                ops.append(self._patch(
+                    node_id(task_node.name), label=role, kind="agent",
+                    state=RESTORED if task_node.name in restored else PENDING, steps=0,
+                ))
+                for dep in task_node.depends_on or ():
+                    ops.append(self._edge(node_id(dep), node_id(task_node.name)))
+                if not task_node.depends_on:
+                    ops.append(self._edge(MANAGER, node_id(task_node.name)))
+                if task_node.name not in needed:
+                    ops.append(self._edge(node_id(task_node.name), DONE))
+            self._commit(ops)
+
+    def task_started(self, task_name: str) -> None:
+        with self.lock:
+            self._commit([self._patch(node_id(task_name), state=RUNNING, started_at=timezone.now().isoformat())])
+
+    def task_finished(self, task_name: str, failed: bool = False) -> None:
+        with self.lock:
+            node = self.nodes.get(node_id(task_name), {})
+            finished_at = timezone.now()
+            fields = {"state": FAILED if failed else FINISHED, "finished_at": finished_at.isoformat()}
+            if node.get("started_at"):
+                started_at = datetime.datetime.fromisoformat(node["started_at"])
+                fields["duration_seconds"] = round((finished_at - started_at).total_seconds(), 2)
+            self._commit([self._patch(node_id(task_name), **fields)])
+
+    def step(self, agent_name: str) -> None:
+        """Counts an agent step against the agent's running task."""
+        with self.lock:
+            candidates = self.roles.get(agent_name, [])
+            running = [node for node in candidates if self.nodes[node].get("state") == RUNNING]
+            target = (running or candidates or [None])[0]
+            if target is None:
+                return
+            self._commit([self._patch(target, steps=self.nodes[target].get("steps", 0) + 1)])
+
+    def finish(self, failed: bool = False) -> None:
+        """Marks the mission complete, or failed along with its unfinished tasks."""
+        with self.lock:
+            now = timezone.now().isoformat()
+            ops = [self._patch(MANAGER, state=FAILED if failed else FINISHED, finished_at=now)]
+            if failed:
+                ops += [
+                    self._patch(node["id"], state=FAILED)
+                    for node in self.graph["nodes"]
+                    if node.get("kind") == "agent" and node.get("state") in (PENDING, RUNNING)
+                ]
+            else:
+                ops.append(self._patch(DONE, state=FINISHED, finished_at=now))
+            self._commit(ops)
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return json.loads(json.dumps(self.graph, cls=UUIDEncoder))
+
+    def save(self) -> None:
+        AgentRun.objects.filter(run_id=self.run_id).update(graph=self.snapshot())
+
+
+def graph_from_messages(run_id) -> dict:
+    """
+    The graph of a run recorded before graphs were kept: one node per
+    agent that posted, under the Manager, as the dashboard used to draw it.
+    """
+    graph = base_graph(run_id)
+    graph["nodes"][1]["state"] = FINISHED
+    agents = (
+        AgentMessage.objects.filter(run_id=run_id).exclude(agent_name__in=("Manager", "System"))
+        .order_by("agent_name").values_list("agent_name", flat=True).distinct()
+    )
+    for agent_name in agents:
+        graph["nodes"].append({"id": agent_node_id(agent_name), "label": agent_name, "kind": "agent", "state": FINISHED})
+        graph["edges"].append({"from": MANAGER, "to": agent_node_id(agent_name)})
+    return graph
+
+
+def graph_snapshot(run) -> dict:
+    """The newest graph of `run`: live from Redis, else saved on the run, else derived from its messages."""
+    stored = r.get(graph_key(run.run_id))
+    if stored:
+        return json.loads(stored)
+    if run.graph:
+        return run.graph
+    if run.archive_path:
+        return base_graph(run.run_id)
+    return graph_from_messages(run.run_id)
+
+
+def copy_graph(source: AgentRun, target: AgentRun) -> None:
+    """Gives a replay the graph of the run it replays, as a `reset` delta."""
+    graph = {**graph_snapshot(source), "run_id": str(target.run_id), "version": 1}
+    r.set(graph_key(target.run_id), json.dumps(graph, cls=UUIDEncoder), ex=EVENT_LOG_TTL)
+    AgentRun.objects.filter(run_id=target.run_id).update(graph=graph)
+    publish_message(target.run_id, {
+        "run_id": str(target.run_id), "type": "graph_delta", "version": 1, "ops": [{"op": "reset", "graph": graph}],
+    }, verbose=False)
@@ -0,0 +1,216 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from core.redis_client import r
+
+logger = logging.getLogger(__name__)
+
+CACHE_MODES = ("off", "read", "readwrite")
+
+# Request parameters that change what the model returns. Anything else
+# (api keys, callbacks, timeouts) is left out of the key.
+KEY_PARAMS = (
+    "temperature", "top_p", "n", "stop", "max_tokens", "max_completion_tokens",
+    "presence_penalty", "frequency_penalty", "seed", "response_format", "reasoning_effort", "tools",
+)
+
+
+def cache_key(model: str, params: dict, messages) -> str:
+    """Content address of one LLM request: model, output-affecting parameters and the full prompt."""
+    payload = {
+        "model": model,
+        "params": {name: params[name] for name in KEY_PARAMS if params.get(name) is not None},
+        "messages": messages,
+    }
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+def resolve_mode(mode, temperature) -> str:
+    """
+    An explicit mission mode wins. Otherwise only deterministic requests
+    (temperature 0) are cached, using LLM_CACHE_DEFAULT_MODE.
+    """
+    if mode:
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Invalid cache mode: {mode}")
+        return mode
+    if temperature is not None and float(temperature) == 0:
+        return settings.LLM_CACHE_DEFAULT_MODE
+    return "off"
+
+
+class CacheStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+
+    def record(self, name: str):
+        with self.lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "writes": self.writes,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+
+class LRUBackend:
+    """In-process cache; evicts the least recently used entry past `max_entries`."""
+
+    def __init__(self, max_entries: int, ttl: int):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at and expires_at < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self.lock:
+            self.entries[key] = (value, expires_at)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class DiskBackend:
+    """On-disk cache shared by processes on one host, bounded by bytes on disk."""
+
+    def __init__(self, directory: str, size_limit: int, ttl: int):
+        import diskcache
+
+        self.ttl = ttl
+        self.cache = diskcache.Cache(directory, size_limit=size_limit, eviction_policy="least-recently-used")
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def set(self, key, value):
+        self.cache.set(key, value, expire=self.ttl or None)
+
+    def clear(self):
+        self.cache.clear()
+
+
+# Stores the entry, records it in the recency index and drops the oldest
+# entries once the index grows past the limit.
+_REDIS_SET_SCRIPT = r.register_script("""
+local ttl = tonumber(ARGV[2])
+if ttl > 0 then
+    redis.call('SET', KEYS[1], ARGV[1], 'EX', ttl)
+else
+    redis.call('SET', KEYS[1], ARGV[1])
+end
+redis.call('ZADD', KEYS[2], ARGV[3], KEYS[1])
+local overflow = redis.call('ZCARD', KEYS[2]) - tonumber(ARGV[4])
+if overflow > 0 then
+    local evicted = redis.call('ZRANGE', KEYS[2], 0, overflow - 1)
+    redis.call('ZREMRANGEBYRANK', KEYS[2], 0, overflow - 1)
+    redis.call('DEL', unpack(evicted))
+end
+return overflow
+""")
+
+
+class RedisBackend:
+    """Cache shared by every worker; entries expire by TTL and the oldest are evicted past `max_entries`."""
+
+    KEY = "llmcache:{key}"
+    INDEX_KEY = "llmcache:index"
+
+    def __init__(self, max_entries: int, ttl: int):
+        self.max_entries = max_entries
+        self.ttl = ttl
+
+    def get(self, key):
+        value = r.get(self.KEY.format(key=key))
+        if value is None:
+            return None
+        # Refresh recency so hot entries survive eviction
+        r.zadd(self.INDEX_KEY, {self.KEY.format(key=key): time.time()})
+        return value.decode() if isinstance(value, bytes) else value
+
+    def set(self, key, value):
+        _REDIS_SET_SCRIPT(
+            keys=[self.KEY.format(key=key), self.INDEX_KEY],
+            args=[value, self.ttl, time.time(), self.max_entries],
+        )
+
+    def clear(self):
+        keys = r.zrange(self.INDEX_KEY, 0, -1)
+        if keys:
+            r.delete(*keys)
+        r.delete(self.INDEX_KEY)
+
+
+class LLMCache:
+    def __init__(self, backend):
+        self.backend = backend
+        self.stats = CacheStats()
+
+    def get(self, key):
+        try:
+            value = self.backend.get(key)
+        except Exception as e:
+            logger.warning("LLM cache read failed: %s", e)
+            value = None
+        self.stats.record("misses" if value is None else "hits")
+        return value
+
+    def set(self, key, value):
+        try:
+            self.backend.set(key, value)
+            self.stats.record("writes")
+        except Exception as e:
+            logger.warning("LLM cache write failed: %s", e)
+
+
+def build_backend(name: str):
+    if name == "lru":
+        return LRUBackend(settings.LLM_CACHE_MAX_ENTRIES, settings.LLM_CACHE_TTL)
+    if name == "disk":
+        return DiskBackend(settings.LLM_CACHE_DIR, settings.LLM_CACHE_DISK_SIZE_LIMIT, settings.LLM_CACHE_TTL)
+    if name == "redis":
+        return RedisBackend(settings.LLM_CACHE_MAX_ENTRIES, settings.LLM_CACHE_TTL)
+    raise ValueError(f"Unknown LLM cache backend: {name}")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> LLMCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMCache(build_backend(settings.LLM_CACHE_BACKEND))
+        return _cache
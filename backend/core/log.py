@@ -0,0 +1,193 @@
+"""
+Structured, non-blocking logging for the Django app, the mission workers
+and the FastAPI stream service.
+
+Records are put on an in-memory queue by a `QueueHandler` and written to
+stdout by a `QueueListener` thread, so emitting a log line never waits on
+stdout from a mission thread or the event loop. Configuration:
+
+    LOG_LEVEL=INFO                       root level
+    LOG_LEVELS=core.redis_client=DEBUG,fastapi_app=WARNING
+    LOG_FORMAT=json|text                 (default json)
+    LOG_DEBUG_SAMPLE_RATE=1.0            fraction of DEBUG records kept
+    LOG_DEBUG_RATE_LIMIT=20              DEBUG records per second per call site (0 = unlimited)
+
+Django reads these in app/settings.py and applies them through
+LOGGING_CONFIG; the stream service calls `configure_logging()` with
+`config_from_env()`.
+"""
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+# Attributes every LogRecord has; anything else came in through `extra`
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+CREW_LOGGER = "agents.crew_mission"
+
+_lock = threading.Lock()
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message and any `extra` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class _QueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Like QueueHandler.prepare, but the traceback stays out of the
+        # message so the JSON formatter can put it in its own field.
+        record = copy.copy(record)
+        record.message = record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class DebugSampler(logging.Filter):
+    """
+    Thins out DEBUG records, which are logged per message on hot paths.
+
+    Each record is kept with probability `sample_rate`, and at most
+    `rate_limit` records per second pass for any one call site (logger
+    plus message template). The next record let through from a call site
+    carries how many were `suppressed` since. Other levels always pass.
+    """
+
+    def __init__(self, sample_rate: float = 1.0, rate_limit: float = 0):
+        super().__init__()
+        self.sample_rate = sample_rate
+        self.rate_limit = rate_limit
+        self.lock = threading.Lock()
+        self.buckets = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG:
+            return True
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return False
+        if not self.rate_limit:
+            return True
+
+        site = (record.name, record.msg)
+        now = time.monotonic()
+        with self.lock:
+            tokens, updated, suppressed = self.buckets.get(site, (self.rate_limit, now, 0))
+            tokens = min(self.rate_limit, tokens + (now - updated) * self.rate_limit)
+            if tokens < 1:
+                self.buckets[site] = (tokens, now, suppressed + 1)
+                return False
+            self.buckets[site] = (tokens - 1, now, 0)
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+def parse_levels(value: str) -> dict:
+    """"core.redis_client=DEBUG,fastapi_app=WARNING" -> {"core.redis_client": "DEBUG", ...}"""
+    levels = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        name, sep, level = item.partition("=")
+        if not sep:
+            raise ValueError(f"LOG_LEVELS entry {item!r} is not module=LEVEL")
+        levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def config_from_env() -> dict:
+    return {
+        "level": os.getenv("LOG_LEVEL", "INFO"),
+        "levels": os.getenv("LOG_LEVELS", ""),
+        "format": os.getenv("LOG_FORMAT", "json"),
+        "debug_sample_rate": float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "1.0")),
+        "debug_rate_limit": float(os.getenv("LOG_DEBUG_RATE_LIMIT", "20")),
+    }
+
+
+def configure_logging(config=None):
+    """
+    Routes the root logger through a queue to a stdout writer thread.
+    Safe to call more than once; the last configuration wins. Used as
+    Django's LOGGING_CONFIG callable, which runs after Django's defaults.
+    """
+    global _listener
+    config = {**config_from_env(), **(config or {})}
+
+    if config["format"] == "text":
+        formatter = logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s")
+    else:
+        formatter = JsonFormatter()
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(formatter)
+
+    handler = _QueueHandler(queue.SimpleQueue())
+    handler.addFilter(DebugSampler(config["debug_sample_rate"], config["debug_rate_limit"]))
+
+    root = logging.getLogger()
+    with _lock:
+        previous = _listener
+        _listener = QueueListener(handler.queue, output, respect_handler_level=True)
+        _listener.start()
+        for existing in [h for h in root.handlers if isinstance(h, QueueHandler)]:
+            root.removeHandler(existing)
+        root.addHandler(handler)
+        if previous is not None:
+            # Writes out whatever was still queued for the old handler
+            previous.stop()
+
+    root.setLevel(config["level"].upper())
+    # Django's default console handler would print its records a second time
+    logging.getLogger("django").handlers = []
+
+    levels = config["levels"]
+    for name, level in (parse_levels(levels) if isinstance(levels, str) else levels).items():
+        logging.getLogger(name).setLevel(level)
+
+
+def crew_verbose() -> bool:
+    """CrewAI's own console output is on when the `agents.crew_mission` logger is at DEBUG."""
+    return logging.getLogger(CREW_LOGGER).isEnabledFor(logging.DEBUG)
+
+
+def _stop_listener():
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+
+
+def _restart_listener_in_child():
+    # Mission worker processes are forked; the writer thread does not survive
+    global _listener
+    if _listener is not None:
+        _listener = QueueListener(_listener.queue, *_listener.handlers, respect_handler_level=True)
+        _listener.start()
+
+
+atexit.register(_stop_listener)
+os.register_at_fork(after_in_child=_restart_listener_in_child)
@@ -0,0 +1,45 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.retention import archivable_runs, archive_runs, ensure_partitions
+
+
+class Command(BaseCommand):
+    help = (
+        "Move the messages of completed runs older than --older-than-days to Parquet "
+        "files, drop emptied month partitions and create the coming months' partitions. "
+        "Archived runs stay readable from their run pages."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than-days", type=int, default=settings.MESSAGE_ARCHIVE_AFTER_DAYS,
+            help="Archive runs started more than this many days ago.",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=settings.MESSAGE_ARCHIVE_BATCH_RUNS,
+            help="Runs written per Parquet file.",
+        )
+        parser.add_argument("--dry-run", action="store_true", help="Only count the runs that would be archived.")
+
+    def handle(self, *args, **options):
+        before = timezone.now() - timedelta(days=options["older_than_days"])
+        if options["dry_run"]:
+            count = archivable_runs(before).count()
+            self.stdout.write(f"{count} run(s) started before {before:%Y-%m-%d %H:%M} would be archived")
+            return
+
+        created = ensure_partitions()
+        if created:
+            self.stdout.write(f"Created message partition(s) {', '.join(created)}")
+
+        summary = archive_runs(before, batch_size=options["batch_size"])
+        if summary["dropped_partitions"]:
+            self.stdout.write(f"Dropped empty partition(s) {', '.join(summary['dropped_partitions'])}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {summary['runs']} run(s) and {summary['messages']} message(s) "
+            f"to {summary['files']} file(s), {summary['bytes'] / 1024 / 1024:.1f} MiB"
+        ))
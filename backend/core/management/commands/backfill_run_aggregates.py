@@ -0,0 +1,78 @@
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+
+from core.models import AgentMessage, AgentRun
+from core.tokens import count_tokens
+
+AGGREGATE_FIELDS = [
+    "message_count", "token_count", "prompt_tokens", "completion_tokens", "type_counts", "duration_seconds",
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the message/token aggregates on AgentRun from stored messages, "
+        "counting tokens for messages that predate stored counts."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500, help="Runs written per bulk_update.")
+        parser.add_argument(
+            "--only-missing", action="store_true",
+            help="Skip runs that already have a message count.",
+        )
+
+    def handle(self, *args, **options):
+        # Archived runs have no rows left to count (core.retention)
+        runs = (
+            AgentRun.objects.filter(archived_at__isnull=True)
+            .only("run_id", "started_at", "finished_at").order_by("started_at")
+        )
+        if options["only_missing"]:
+            runs = runs.filter(message_count=0)
+
+        pending = []
+        done = 0
+        for run in runs.iterator(chunk_size=options["batch_size"]):
+            type_counts = Counter()
+            totals = Counter()
+            recounted = []
+            messages = (
+                AgentMessage.objects.filter(run_id=run.run_id)
+                .values_list("id", "message_type", "content", "token_count", "prompt_tokens", "completion_tokens")
+                .order_by()
+            )
+            for pk, message_type, content, tokens, prompt, completion in messages.iterator(chunk_size=2000):
+                if not tokens and content:
+                    # Rows written before token counts were stored
+                    tokens = count_tokens(content)
+                    recounted.append(AgentMessage(id=pk, token_count=tokens))
+                type_counts[message_type] += 1
+                totals["tokens"] += tokens
+                totals["prompt"] += prompt or 0
+                totals["completion"] += completion or 0
+
+            if recounted:
+                AgentMessage.objects.bulk_update(recounted, ["token_count"], batch_size=1000)
+
+            run.message_count = sum(type_counts.values())
+            run.token_count = totals["tokens"]
+            run.prompt_tokens = totals["prompt"]
+            run.completion_tokens = totals["completion"]
+            run.type_counts = dict(type_counts)
+            if run.finished_at and run.started_at:
+                run.duration_seconds = (run.finished_at - run.started_at).total_seconds()
+            pending.append(run)
+
+            if len(pending) >= options["batch_size"]:
+                AgentRun.objects.bulk_update(pending, AGGREGATE_FIELDS)
+                done += len(pending)
+                pending = []
+                self.stdout.write(f"Backfilled {done} run(s)...")
+
+        if pending:
+            AgentRun.objects.bulk_update(pending, AGGREGATE_FIELDS)
+            done += len(pending)
+
+        self.stdout.write(self.style.SUCCESS(f"Backfilled aggregates for {done} run(s)"))
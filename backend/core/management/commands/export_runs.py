@@ -0,0 +1,60 @@
+import sys
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.export import COMPRESSIONS, FORMATS, export_chunks, select_runs
+from core.missions import MISSION_TYPES
+from core.views import parse_query_datetime
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream the messages of one run, a date range or a filtered set of runs "
+        "to an NDJSON or Parquet file, in constant memory."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("output", help="File to write, or - for stdout.")
+        parser.add_argument("--run", action="append", default=[], help="Run ID to export; repeatable.")
+        parser.add_argument("--since", help="Runs started at or after this ISO date.")
+        parser.add_argument("--until", help="Runs started before this ISO date.")
+        parser.add_argument("--type", choices=MISSION_TYPES, help="Only runs of this mission type.")
+        parser.add_argument("--status", help="Only runs with this status, e.g. completed.")
+        parser.add_argument("--format", choices=FORMATS, default="ndjson")
+        parser.add_argument(
+            "--compression", choices=COMPRESSIONS,
+            help="zstd frames NDJSON as .ndjson.zst and sets the Parquet page codec "
+                 "(default: none for NDJSON, zstd for Parquet).",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            run_ids = [uuid.UUID(value) for value in options["run"]]
+            since = parse_query_datetime(options["since"]) if options["since"] else None
+            until = parse_query_datetime(options["until"]) if options["until"] else None
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        runs = select_runs(
+            run_ids=run_ids, since=since, until=until, mission_type=options["type"], status=options["status"],
+        )
+        chunks = export_chunks(runs, options["format"], options["compression"])
+
+        started = time.perf_counter()
+        written = 0
+        to_stdout = options["output"] == "-"
+        output = sys.stdout.buffer if to_stdout else open(options["output"], "wb")
+        try:
+            for chunk in chunks:
+                output.write(chunk)
+                written += len(chunk)
+        finally:
+            if not to_stdout:
+                output.close()
+
+        # Keep stdout for the export itself
+        (self.stderr if to_stdout else self.stdout).write(self.style.SUCCESS(
+            f"Exported {written / 1024 / 1024:.1f} MiB in {time.perf_counter() - started:.1f}s"
+        ))
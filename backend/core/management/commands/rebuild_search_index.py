@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core.search import rebuild_index, supported
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-index every agent message and run name for full-text search. Messages are "
+        "indexed as they are written; this is for rows loaded another way."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if not supported(connection):
+            raise CommandError(f"Full-text search is not available on {connection.vendor}")
+        indexed = rebuild_index(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} message(s)"))
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import AgentRun
+from core.replay import parse_speed, start_replay
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-stream a recorded run from the database to new run channels, "
+        "without calling the LLM."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("run_id", help="The recorded run to replay.")
+        parser.add_argument(
+            "--speed", default="1",
+            help="1 = original timing, N = N times faster, 'max' = as fast as possible.",
+        )
+        parser.add_argument("--copies", type=int, default=1, help="Replays to run in parallel.")
+        parser.add_argument(
+            "--max-gap", type=float, default=None,
+            help="Longest pause between two messages, in seconds after applying --speed.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            speed = parse_speed(options["speed"])
+            source = AgentRun.objects.get(run_id=options["run_id"])
+        except ValueError as e:
+            raise CommandError(str(e))
+        except AgentRun.DoesNotExist:
+            raise CommandError(f"Run {options['run_id']} not found")
+        if source.status != "completed":
+            raise CommandError(f"Run {source.run_id} is {source.status}; only completed runs can be replayed")
+
+        replays = [start_replay(source, speed=speed, max_gap=options["max_gap"]) for _ in range(options["copies"])]
+        for target, _ in replays:
+            self.stdout.write(f"Replaying {source.run_id} as {target.run_id}")
+
+        for _, thread in replays:
+            thread.join()
+        self.stdout.write(self.style.SUCCESS(f"Finished {len(replays)} replay(s)"))
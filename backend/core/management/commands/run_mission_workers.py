@@ -0,0 +1,86 @@
+import multiprocessing
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core.retention import ensure_partitions
+from core.telemetry import mark_process_dead
+from core.worker import recover_orphaned_jobs, run_worker_process
+
+
+class Command(BaseCommand):
+    help = "Start a pool of mission worker processes that execute queued crews."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--processes", type=int, default=settings.MISSION_WORKER_PROCESSES,
+            help="Number of worker processes to run.",
+        )
+        parser.add_argument(
+            "--concurrency", type=int, default=settings.MISSION_WORKER_CONCURRENCY,
+            help="Maximum missions each worker process runs at the same time.",
+        )
+
+    def handle(self, *args, **options):
+        processes = options["processes"]
+        concurrency = options["concurrency"]
+        self.stopping = False
+
+        recovered = recover_orphaned_jobs()
+        if recovered:
+            self.stdout.write(f"Recovered {recovered} orphaned mission job(s)")
+
+        created = ensure_partitions()
+        if created:
+            self.stdout.write(f"Created message partition(s) {', '.join(created)}")
+
+        # Children must not inherit the parent's database sockets.
+        connections.close_all()
+
+        self.workers = [self._spawn(concurrency) for _ in range(processes)]
+        self.stdout.write(f"Started {processes} mission worker(s) x {concurrency} concurrent mission(s)")
+
+        signal.signal(signal.SIGTERM, self._request_stop)
+        signal.signal(signal.SIGINT, self._request_stop)
+
+        last_recovery = time.monotonic()
+        while not self.stopping:
+            for i, proc in enumerate(self.workers):
+                if not proc.is_alive():
+                    self.stdout.write(f"Worker pid {proc.pid} exited with {proc.exitcode}, restarting")
+                    mark_process_dead(proc.pid)
+                    self.workers[i] = self._spawn(concurrency)
+
+            if time.monotonic() - last_recovery >= settings.MISSION_WORKER_HEARTBEAT_TTL:
+                recover_orphaned_jobs()
+                last_recovery = time.monotonic()
+
+            time.sleep(1)
+
+        for proc in self.workers:
+            proc.join()
+            mark_process_dead(proc.pid)
+        self.stdout.write("All mission workers stopped")
+
+    def _spawn(self, concurrency):
+        proc = multiprocessing.Process(target=run_worker_process, args=(concurrency,), daemon=False)
+        proc.start()
+        return proc
+
+    def _request_stop(self, signum, frame):
+        if self.stopping:
+            # Second signal: stop waiting for in-flight missions. Their jobs
+            # stay in the processing lists and are recovered on next start.
+            for proc in self.workers:
+                if proc.is_alive():
+                    proc.kill()
+            return
+
+        self.stopping = True
+        self.stdout.write("Stopping mission workers, waiting for running missions to finish...")
+        for proc in self.workers:
+            if proc.is_alive():
+                proc.terminate()
@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = (
+        "Serve the app over ASGI with uvicorn: async views on an event loop, "
+        "one database connection pool per worker process (DATABASE_POOL)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("addrport", nargs="?", default="0.0.0.0:8000", help="Address and port, e.g. 0.0.0.0:8000.")
+        parser.add_argument(
+            "--workers", type=int, default=settings.ASGI_WORKERS,
+            help="Number of uvicorn worker processes.",
+        )
+        parser.add_argument(
+            "--reload", action="store_true", default=settings.ASGI_RELOAD,
+            help="Restart on code changes (development; runs a single worker).",
+        )
+
+    def handle(self, *args, **options):
+        import uvicorn
+
+        host, _, port = options["addrport"].rpartition(":")
+        if not port.isdigit():
+            raise CommandError(f"{options['addrport']!r} is not a valid address:port")
+
+        # Workers open their own connections and pools
+        connections.close_all()
+
+        self.stdout.write(
+            f"Serving on {host or '0.0.0.0'}:{port} with "
+            f"{1 if options['reload'] else options['workers']} worker(s)"
+        )
+        uvicorn.run(
+            "app.asgi:application",
+            host=host or "0.0.0.0",
+            port=int(port),
+            workers=None if options["reload"] else options["workers"],
+            reload=options["reload"],
+            reload_dirs=[str(settings.BASE_DIR)] if options["reload"] else None,
+            # Django's ASGI handler does not implement the lifespan protocol
+            lifespan="off",
+            access_log=False,
+        )
@@ -0,0 +1,60 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.compression import train_dictionary
+from core.fields import forget_dictionaries
+from core.models import AgentMessage, CompressionDictionary
+
+
+class Command(BaseCommand):
+    help = (
+        "Train a zstd dictionary on recent agent messages. New messages are "
+        "compressed with the newest dictionary; older rows stay readable."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--samples", type=int, default=5000, help="Most recent messages to train on.")
+        parser.add_argument("--size", type=int, default=112 * 1024, help="Dictionary size in bytes.")
+        parser.add_argument(
+            "--recompress", action="store_true",
+            help="Rewrite existing compressible messages with the new dictionary.",
+        )
+
+    def handle(self, *args, **options):
+        min_size = settings.MESSAGE_COMPRESS_MIN_BYTES
+        samples = [
+            content
+            for content in AgentMessage.objects.order_by("-id").values_list("content", flat=True)[: options["samples"]]
+            if len(content) >= min_size
+        ]
+        if len(samples) < 10:
+            raise CommandError(f"Need at least 10 messages of {min_size}+ bytes to train on, found {len(samples)}")
+
+        try:
+            dictionary = train_dictionary(samples, size=options["size"])
+        except Exception as e:
+            raise CommandError(f"Training failed: {e}")
+
+        CompressionDictionary.objects.update_or_create(
+            dict_id=dictionary.dict_id(),
+            defaults={"data": dictionary.as_bytes(), "sample_count": len(samples)},
+        )
+        forget_dictionaries()
+        self.stdout.write(
+            f"Trained dictionary {dictionary.dict_id()} ({len(dictionary.as_bytes())} bytes) on {len(samples)} messages"
+        )
+
+        if options["recompress"]:
+            rewritten = 0
+            last_id = 0
+            while True:
+                batch = list(AgentMessage.objects.filter(id__gt=last_id).order_by("id").only("id", "content")[:1000])
+                if not batch:
+                    break
+                # Saving re-encodes each body with the active dictionary
+                AgentMessage.objects.bulk_update(batch, ["content"])
+                rewritten += len(batch)
+                last_id = batch[-1].id
+            self.stdout.write(f"Recompressed {rewritten} message(s)")
+
+        self.stdout.write(self.style.SUCCESS("Done"))
@@ -0,0 +1,39 @@
+# Generated by Django 5.1.3 on 2026-10-17 15:19
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def number_existing_messages(apps, schema_editor):
+    AgentMessage = apps.get_model('core', 'AgentMessage')
+    run_ids = list(AgentMessage.objects.order_by('run_id').values_list('run_id', flat=True).distinct())
+    for run_id in run_ids:
+        messages = list(AgentMessage.objects.filter(run_id=run_id).order_by('timestamp', 'id').only('id'))
+        for seq, message in enumerate(messages, start=1):
+            message.seq = seq
+        AgentMessage.objects.bulk_update(messages, ['seq'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='agentmessage',
+            name='seq',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='agentmessage',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(number_existing_messages, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='agentmessage',
+            constraint=models.UniqueConstraint(fields=('run', 'seq'), name='agent_message_run_seq_uniq'),
+        ),
+    ]
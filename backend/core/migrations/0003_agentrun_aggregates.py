@@ -0,0 +1,33 @@
+# Generated by Django 5.1.3 on 2026-10-17 15:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_agentmessage_seq'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='agentrun',
+            name='duration_seconds',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='agentrun',
+            name='message_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='agentrun',
+            name='token_count',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='agentrun',
+            name='type_counts',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
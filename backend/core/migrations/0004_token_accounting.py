@@ -0,0 +1,38 @@
+# Generated by Django 5.1.3 on 2026-10-17 15:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_agentrun_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='agentmessage',
+            name='completion_tokens',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='agentmessage',
+            name='prompt_tokens',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='agentmessage',
+            name='token_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='agentrun',
+            name='completion_tokens',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='agentrun',
+            name='prompt_tokens',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
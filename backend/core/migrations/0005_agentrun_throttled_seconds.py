@@ -0,0 +1,18 @@
+# Generated by Django 5.1.3 on 2026-10-17 15:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_token_accounting'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='agentrun',
+            name='throttled_seconds',
+            field=models.FloatField(default=0),
+        ),
+    ]
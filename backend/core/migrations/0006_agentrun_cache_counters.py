@@ -0,0 +1,23 @@
+# Generated by Django 5.1.3 on 2026-10-17 15:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_agentrun_throttled_seconds'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='agentrun',
+            name='cache_hits',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='agentrun',
+            name='cache_misses',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.1.3 on 2026-10-17 15:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_agentrun_cache_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='agentmessage',
+            index=models.Index(fields=['run', 'timestamp', 'id'], name='agent_msg_run_ts_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='agentrun',
+            index=models.Index(fields=['status', 'started_at'], name='agent_run_status_started_idx'),
+        ),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 5.1.3 on 2026-10-17 16:05
+
+import core.fields
+from django.db import migrations, models
+
+
+def compress_contents(apps, schema_editor):
+    AgentMessage = apps.get_model('core', 'AgentMessage')
+    last_id = 0
+    while True:
+        batch = list(AgentMessage.objects.filter(id__gt=last_id).order_by('id').only('id', 'content_text')[:1000])
+        if not batch:
+            return
+        for message in batch:
+            message.content = message.content_text
+        AgentMessage.objects.bulk_update(batch, ['content'])
+        last_id = batch[-1].id
+
+
+def decompress_contents(apps, schema_editor):
+    AgentMessage = apps.get_model('core', 'AgentMessage')
+    last_id = 0
+    while True:
+        batch = list(AgentMessage.objects.filter(id__gt=last_id).order_by('id').only('id', 'content')[:1000])
+        if not batch:
+            return
+        for message in batch:
+            message.content_text = message.content
+        AgentMessage.objects.bulk_update(batch, ['content_text'])
+        last_id = batch[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_message_and_run_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompressionDictionary',
+            fields=[
+                ('dict_id', models.PositiveBigIntegerField(primary_key=True, serialize=False)),
+                ('data', models.BinaryField()),
+                ('sample_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'core_compression_dictionary',
+            },
+        ),
+        migrations.RenameField(
+            model_name='agentmessage',
+            old_name='content',
+            new_name='content_text',
+        ),
+        # blank=True so reversing the RemoveField below can re-add the column with a default
+        migrations.AlterField(
+            model_name='agentmessage',
+            name='content_text',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='agentmessage',
+            name='content',
+            field=core.fields.CompressedTextField(null=True),
+        ),
+        migrations.RunPython(compress_contents, decompress_contents),
+        migrations.AlterField(
+            model_name='agentmessage',
+            name='content',
+            field=core.fields.CompressedTextField(),
+        ),
+        migrations.RemoveField(
+            model_name='agentmessage',
+            name='content_text',
+        ),
+    ]
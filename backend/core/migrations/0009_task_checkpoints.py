@@ -0,0 +1,40 @@
+# Generated by Django 5.1.3 on 2026-10-17 16:05
+
+import core.fields
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_compressed_message_content'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='agentrun',
+            name='mission_type',
+            field=models.CharField(blank=True, max_length=32),
+        ),
+        migrations.AddField(
+            model_name='agentrun',
+            name='mission_input',
+            field=models.TextField(blank=True),
+        ),
+        migrations.CreateModel(
+            name='TaskCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task_name', models.CharField(max_length=100)),
+                ('agent_name', models.CharField(max_length=100)),
+                ('output', core.fields.CompressedTextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='checkpoints', to='core.agentrun')),
+            ],
+            options={
+                'db_table': 'core_task_checkpoint',
+                'constraints': [models.UniqueConstraint(fields=('run', 'task_name'), name='task_checkpoint_run_task_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 5.1.3 on 2026-10-17 16:40
+
+from django.db import migrations
+
+POSTGRES_FORWARD = [
+    "ALTER TABLE core_agent_message ADD COLUMN search_vector tsvector",
+    "CREATE INDEX agent_msg_search_idx ON core_agent_message USING gin (search_vector)",
+    # core.search queries run names with this same expression
+    "CREATE INDEX agent_run_name_search_idx ON core_agent_run USING gin (to_tsvector('english', name))",
+]
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS agent_run_name_search_idx",
+    "DROP INDEX IF EXISTS agent_msg_search_idx",
+    "ALTER TABLE core_agent_message DROP COLUMN IF EXISTS search_vector",
+]
+
+SQLITE_FORWARD = [
+    # Bodies are compressed in core_agent_message, so this table keeps its own copy of the text
+    "CREATE VIRTUAL TABLE core_message_fts USING fts5(body, agent_name, tokenize = 'porter unicode61')",
+    """CREATE TRIGGER core_message_fts_delete AFTER DELETE ON core_agent_message BEGIN
+        DELETE FROM core_message_fts WHERE rowid = old.id;
+    END""",
+    # Run names are plain text, so an external-content table kept in sync by triggers is enough
+    """CREATE VIRTUAL TABLE core_run_fts USING fts5(
+        name, content = 'core_agent_run', content_rowid = 'rowid', tokenize = 'porter unicode61'
+    )""",
+    # Triggers on core_agent_run are created by core.search.install_run_index
+]
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS core_run_fts_delete",
+    "DROP TRIGGER IF EXISTS core_run_fts_update",
+    "DROP TRIGGER IF EXISTS core_run_fts_insert",
+    "DROP TABLE IF EXISTS core_run_fts",
+    "DROP TRIGGER IF EXISTS core_message_fts_delete",
+    "DROP TABLE IF EXISTS core_message_fts",
+]
+
+
+def run_statements(schema_editor, statements):
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def create_search_index(apps, schema_editor):
+    from core.search import index_rows, install_run_index
+
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        run_statements(schema_editor, POSTGRES_FORWARD)
+    elif vendor == 'sqlite':
+        run_statements(schema_editor, SQLITE_FORWARD)
+        install_run_index(schema_editor.connection)
+    else:
+        return
+
+    AgentMessage = apps.get_model('core', 'AgentMessage')
+    last_id = 0
+    while True:
+        batch = list(
+            AgentMessage.objects.filter(id__gt=last_id).order_by('id')
+            .values_list('id', 'agent_name', 'content')[:1000]
+        )
+        if not batch:
+            break
+        index_rows(batch, schema_editor.connection)
+        last_id = batch[-1][0]
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        run_statements(schema_editor, POSTGRES_BACKWARD)
+    elif vendor == 'sqlite':
+        run_statements(schema_editor, SQLITE_BACKWARD)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_task_checkpoints'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,108 @@
+# Generated by Django 5.1.3 on 2026-10-17 17:05
+
+from django.db import migrations, models
+
+TABLE = 'core_agent_message'
+PREVIOUS = 'core_agent_message_previous'
+SEQUENCE = 'core_agent_message_id_seq'
+
+
+def table_definitions(cursor):
+    """
+    CREATE INDEX statements and foreign keys of core_agent_message, other
+    than the primary key and unique constraint, to recreate them by name
+    on the new table.
+    """
+    cursor.execute(
+        """
+        SELECT indexdef FROM pg_indexes
+        WHERE schemaname = current_schema() AND tablename = %s
+          AND indexname NOT IN (SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(%s))
+        """,
+        [TABLE, TABLE],
+    )
+    # Indexes of a partitioned table are defined ON ONLY the parent
+    indexes = [row[0].replace(' ON ONLY ', ' ON ') for row in cursor.fetchall()]
+    cursor.execute(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid = to_regclass(%s) AND contype = 'f'",
+        [TABLE],
+    )
+    return indexes, cursor.fetchall()
+
+
+def restore_definitions(cursor, key_columns, unique_columns, indexes, foreign_keys):
+    cursor.execute(f"ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_pkey PRIMARY KEY ({key_columns})")
+    cursor.execute(f"ALTER TABLE {TABLE} ADD CONSTRAINT agent_message_run_seq_uniq UNIQUE ({unique_columns})")
+    for statement in indexes:
+        cursor.execute(statement)
+    for name, definition in foreign_keys:
+        cursor.execute(f"ALTER TABLE {TABLE} ADD CONSTRAINT {name} {definition}")
+
+
+def partition_messages(apps, schema_editor):
+    """
+    Rebuilds core_agent_message as a table partitioned by month on
+    timestamp and copies the rows across. The id identity becomes a plain
+    sequence, since partitioned tables cannot have one before PostgreSQL 17.
+    """
+    from core.retention import DEFAULT_PARTITION, ensure_partitions
+
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        indexes, foreign_keys = table_definitions(cursor)
+        cursor.execute(f'SELECT MIN("timestamp") FROM {TABLE}')
+        first = cursor.fetchone()[0]
+
+        cursor.execute(f"ALTER TABLE {TABLE} RENAME TO {PREVIOUS}")
+        cursor.execute(f'CREATE TABLE {TABLE} (LIKE {PREVIOUS} INCLUDING DEFAULTS) PARTITION BY RANGE ("timestamp")')
+        cursor.execute(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {TABLE} DEFAULT")
+    ensure_partitions(start=first, connection=connection)
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {TABLE} SELECT * FROM {PREVIOUS}")
+        cursor.execute(f"DROP TABLE {PREVIOUS}")
+        cursor.execute(f"CREATE SEQUENCE {SEQUENCE} OWNED BY {TABLE}.id")
+        cursor.execute(f"SELECT setval('{SEQUENCE}', COALESCE(MAX(id), 0) + 1, false) FROM {TABLE}")
+        cursor.execute(f"ALTER TABLE {TABLE} ALTER COLUMN id SET DEFAULT nextval('{SEQUENCE}')")
+        restore_definitions(cursor, 'id, "timestamp"', 'run_id, seq, "timestamp"', indexes, foreign_keys)
+
+
+def unpartition_messages(apps, schema_editor):
+    from core.retention import partitioned
+
+    connection = schema_editor.connection
+    if not partitioned(connection):
+        return
+    with connection.cursor() as cursor:
+        indexes, foreign_keys = table_definitions(cursor)
+        cursor.execute(f"ALTER TABLE {TABLE} RENAME TO {PREVIOUS}")
+        # The sequence would be dropped with the old table otherwise
+        cursor.execute(f"ALTER SEQUENCE {SEQUENCE} OWNED BY NONE")
+        cursor.execute(f"CREATE TABLE {TABLE} (LIKE {PREVIOUS} INCLUDING DEFAULTS)")
+        cursor.execute(f"INSERT INTO {TABLE} SELECT * FROM {PREVIOUS}")
+        cursor.execute(f"DROP TABLE {PREVIOUS}")
+        cursor.execute(f"ALTER SEQUENCE {SEQUENCE} OWNED BY {TABLE}.id")
+        restore_definitions(cursor, 'id', 'run_id, seq', indexes, foreign_keys)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_message_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='agentrun',
+            name='archived_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='agentrun',
+            name='archive_path',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.RunPython(partition_messages, unpartition_messages),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.3 on 2026-10-17 18:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_message_partitions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='agentrun',
+            name='graph',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
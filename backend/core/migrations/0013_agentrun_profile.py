@@ -0,0 +1,18 @@
+# Generated by Django 5.1.3 on 2026-10-17 19:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_agentrun_graph'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='agentrun',
+            name='profile',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.1.3 on 2026-10-17 21:10
+
+from django.db import migrations
+
+
+def restore_run_index(apps, schema_editor):
+    # 0011-0013 rebuilt core_agent_run on SQLite, dropping its search triggers
+    from core.search import install_run_index
+
+    install_run_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_agentrun_profile'),
+    ]
+
+    operations = [
+        migrations.RunPython(restore_run_index, migrations.RunPython.noop),
+    ]
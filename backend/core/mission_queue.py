@@ -0,0 +1,251 @@
+import json
+import time
+
+from django.conf import settings
+
+from core.missions import JOBS, MISSION_TYPES
+from core.redis_client import r
+
+# Admitted jobs, consumed by `run_mission_workers`
+QUEUE_KEY = "missions:queue"
+PROCESSING_KEY = "missions:processing:{worker_id}"
+HEARTBEAT_KEY = "missions:worker:{worker_id}:heartbeat"
+# Admission control: jobs wait in PENDING_KEY (run_id scored by priority,
+# then arrival) with their JSON in JOBS_KEY until a slot is free. Slots are
+# "<type>:<run_id>" members of SLOTS_KEY, scored by lease expiry; workers
+# renew the leases of missions they are running, so a crashed worker's
+# slots free themselves.
+PENDING_KEY = "missions:pending"
+JOBS_KEY = "missions:pending:jobs"
+SLOTS_KEY = "missions:slots"
+
+# Orders by priority first (higher first), then by arrival
+_PRIORITY_SCALE = 10 ** 13
+
+# Expires jobs that waited past their deadline, then admits pending jobs
+# in order while the global and per-type limits allow. A job whose type is
+# at its limit is skipped, not blocking the jobs behind it.
+# Returns {admitted run_ids, expired job JSON}.
+_ADMIT_SCRIPT = r.register_script("""
+local now = tonumber(ARGV[1])
+local lease = tonumber(ARGV[2])
+local max_running = tonumber(ARGV[3])
+local limits = cjson.decode(ARGV[4])
+
+redis.call('ZREMRANGEBYSCORE', KEYS[3], '-inf', now)
+local running = redis.call('ZRANGE', KEYS[3], 0, -1)
+local total = #running
+local counts = {}
+for _, member in ipairs(running) do
+  local kind = string.match(member, '^([^:]+):')
+  counts[kind] = (counts[kind] or 0) + 1
+end
+
+local admitted, expired = {}, {}
+for _, run_id in ipairs(redis.call('ZRANGE', KEYS[1], 0, -1)) do
+  local raw = redis.call('HGET', KEYS[2], run_id)
+  local job = raw and cjson.decode(raw)
+  if not job then
+    redis.call('ZREM', KEYS[1], run_id)
+  elseif now > tonumber(job['expires_at']) then
+    redis.call('ZREM', KEYS[1], run_id)
+    redis.call('HDEL', KEYS[2], run_id)
+    table.insert(expired, raw)
+  elseif total < max_running then
+    local limit = limits[job['type']]
+    if limit == nil or (counts[job['type']] or 0) < limit then
+      redis.call('ZREM', KEYS[1], run_id)
+      redis.call('HDEL', KEYS[2], run_id)
+      redis.call('ZADD', KEYS[3], now + lease, job['type'] .. ':' .. run_id)
+      redis.call('LPUSH', KEYS[4], raw)
+      counts[job['type']] = (counts[job['type']] or 0) + 1
+      total = total + 1
+      table.insert(admitted, run_id)
+    end
+  end
+end
+return {admitted, expired}
+""")
+
+# Rejects a new job when the pending queue is full; re-queued jobs pass ARGV[4] = 0
+_SUBMIT_SCRIPT = r.register_script("""
+local limit = tonumber(ARGV[4])
+if limit > 0 and redis.call('ZCARD', KEYS[1]) >= limit then
+  return 0
+end
+redis.call('HSET', KEYS[2], ARGV[1], ARGV[3])
+redis.call('ZADD', KEYS[1], ARGV[2], ARGV[1])
+return 1
+""")
+
+
+class QueueFull(Exception):
+    pass
+
+
+def enqueue_mission(
+    run_id, mission_type: str, name: str, attempts: int = 0, cache=None, stream=None, priority=None, queued_at=None,
+) -> dict:
+    """
+    Adds a mission job to the pending queue and admits whatever fits.
+    Higher `priority` runs first; equal priorities run in arrival order.
+    Raises QueueFull when MISSION_QUEUE_MAX jobs are already waiting
+    (retries of admitted jobs are always accepted).
+    """
+    if mission_type not in MISSION_TYPES:
+        raise ValueError(f"Invalid mission type: {mission_type}")
+    priority = settings.MISSION_DEFAULT_PRIORITY if priority is None else priority
+    if not 0 <= priority <= settings.MISSION_MAX_PRIORITY:
+        raise ValueError(f"priority must be between 0 and {settings.MISSION_MAX_PRIORITY}")
+
+    now = time.time()
+    job = {
+        "run_id": str(run_id),
+        "type": mission_type,
+        "name": name,
+        "attempts": attempts,
+        "cache": cache,
+        "stream": stream,
+        "priority": priority,
+        "queued_at": queued_at or now,
+        "enqueued_at": now,
+        "expires_at": now + settings.MISSION_QUEUE_TIMEOUT,
+    }
+    score = (settings.MISSION_MAX_PRIORITY - priority) * _PRIORITY_SCALE + int(job["queued_at"] * 1000)
+    limit = 0 if attempts else settings.MISSION_QUEUE_MAX
+    if not _SUBMIT_SCRIPT(keys=[PENDING_KEY, JOBS_KEY], args=[job["run_id"], score, json.dumps(job), limit]):
+        raise QueueFull(f"{limit} missions are already waiting")
+    return job
+
+
+def enqueue_job(run_id, job_type: str, name: str, params: dict = None, attempts: int = 0) -> dict:
+    """
+    Hands a job from JOBS straight to the workers, behind admitted
+    missions. Its `params` are passed to the job's entry point.
+    """
+    if job_type not in JOBS:
+        raise ValueError(f"Invalid job type: {job_type}")
+    job = {
+        "run_id": str(run_id),
+        "type": job_type,
+        "name": name,
+        "attempts": attempts,
+        "params": params or {},
+        "queued_at": time.time(),
+    }
+    r.lpush(QUEUE_KEY, json.dumps(job))
+    return job
+
+
+def admit_jobs() -> tuple:
+    """
+    Moves pending jobs into the worker queue while slots are free and
+    drops jobs that have waited MISSION_QUEUE_TIMEOUT seconds for a slot.
+    Returns (admitted run IDs, expired jobs).
+    """
+    admitted, expired = _ADMIT_SCRIPT(
+        keys=[PENDING_KEY, JOBS_KEY, SLOTS_KEY, QUEUE_KEY],
+        args=[
+            time.time(), settings.MISSION_SLOT_LEASE, settings.MISSION_MAX_RUNNING,
+            json.dumps(settings.MISSION_TYPE_LIMITS or {}),
+        ],
+    )
+    admitted = [run_id.decode() if isinstance(run_id, bytes) else run_id for run_id in admitted]
+    return admitted, [json.loads(raw) for raw in expired]
+
+
+def slot_member(job: dict) -> str:
+    return f"{job['type']}:{job['run_id']}"
+
+
+def renew_slots(jobs) -> None:
+    """Extends the slot leases of missions this worker is running."""
+    if jobs:
+        expiry = time.time() + settings.MISSION_SLOT_LEASE
+        r.zadd(SLOTS_KEY, {slot_member(job): expiry for job in jobs}, xx=True)
+
+
+def release_slot(job: dict) -> None:
+    r.zrem(SLOTS_KEY, slot_member(job))
+
+
+def pending_run_ids() -> list:
+    """Waiting runs in the order they will be admitted (as far as type limits allow)."""
+    return [run_id.decode() if isinstance(run_id, bytes) else run_id for run_id in r.zrange(PENDING_KEY, 0, -1)]
+
+
+def running_count() -> int:
+    return r.zcount(SLOTS_KEY, time.time(), "+inf")
+
+
+def claim_job(worker_id: str, timeout: float = 1.0):
+    """
+    Atomically moves the oldest job into the worker's processing list.
+
+    The job stays there until `ack_job` so a crashed worker's jobs can be
+    found again by `recover_orphaned_jobs`.
+    """
+    raw = r.blmove(QUEUE_KEY, PROCESSING_KEY.format(worker_id=worker_id), timeout, "RIGHT", "LEFT")
+    if raw is None:
+        return None, None
+    return raw, json.loads(raw)
+
+
+def ack_job(worker_id: str, raw) -> None:
+    r.lrem(PROCESSING_KEY.format(worker_id=worker_id), 1, raw)
+
+
+def heartbeat(worker_id: str) -> None:
+    r.set(HEARTBEAT_KEY.format(worker_id=worker_id), time.time(), ex=settings.MISSION_WORKER_HEARTBEAT_TTL)
+
+
+def clear_heartbeat(worker_id: str) -> None:
+    r.delete(HEARTBEAT_KEY.format(worker_id=worker_id))
+
+
+def queue_depth() -> int:
+    """Missions not yet started: waiting for admission or for a worker."""
+    return r.zcard(PENDING_KEY) + r.llen(QUEUE_KEY)
+
+
+def recover_orphaned_jobs(on_failed, on_requeued=None) -> int:
+    """
+    Requeues jobs held by workers whose heartbeat has expired, handing
+    each to `on_requeued` first so the run can be marked queued again.
+
+    Jobs that already used up `MISSION_MAX_ATTEMPTS` are handed to `on_failed`
+    instead so the run can be marked failed rather than restarted forever.
+    Returns the number of jobs recovered.
+    """
+    recovered = 0
+    for key in r.scan_iter(match=PROCESSING_KEY.format(worker_id="*")):
+        key = key.decode() if isinstance(key, bytes) else key
+        worker_id = key.rsplit(":", 1)[-1]
+        if r.exists(HEARTBEAT_KEY.format(worker_id=worker_id)):
+            continue
+
+        while True:
+            raw = r.rpop(key)
+            if raw is None:
+                break
+            job = json.loads(raw)
+            job["attempts"] = job.get("attempts", 0) + 1
+            # The lost worker's slot would only free itself when its lease ran out
+            release_slot(job)
+            if job["attempts"] < settings.MISSION_MAX_ATTEMPTS:
+                # Before it is back in line, where a worker may claim it
+                if on_requeued is not None:
+                    on_requeued(job)
+                if job["type"] in JOBS:
+                    enqueue_job(job["run_id"], job["type"], job["name"], job.get("params"), attempts=job["attempts"])
+                else:
+                    # Back in line, ahead of later arrivals of the same priority
+                    enqueue_mission(
+                        job["run_id"], job["type"], job["name"], attempts=job["attempts"],
+                        cache=job.get("cache"), stream=job.get("stream"),
+                        priority=job.get("priority"), queued_at=job.get("queued_at"),
+                    )
+            else:
+                on_failed(job)
+            recovered += 1
+    return recovered
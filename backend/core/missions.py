@@ -0,0 +1,34 @@
+from functools import lru_cache
+
+from django.utils.module_loading import import_string
+
+# Mission type -> dotted path of its entry point. Entry points are only
+# imported when a mission runs, so the web tier and management commands
+# never load CrewAI, LiteLLM and the rest of the agent stack.
+MISSIONS = {
+    "research": "agents.crew_mission.run_research_mission",
+    "feasibility": "agents.crew_mission.run_feasibility_mission",
+    "conference": "agents.crew_mission.run_conference_planing",
+}
+
+MISSION_TYPES = tuple(MISSIONS)
+
+# Other jobs the mission workers run. They call no LLM, so they skip
+# admission control (core.mission_queue.enqueue_job).
+JOBS = {
+    "replay": "core.replay.run_replay_job",
+}
+
+# Top-level packages of the agent stack; benchmarks.import_time checks that
+# none of them are loaded outside the worker.
+AGENT_STACK_MODULES = ("crewai", "langchain_groq", "langchain_core", "litellm", "chromadb", "lancedb")
+
+
+@lru_cache(maxsize=None)
+def get_mission(mission_type: str):
+    """Imports and returns the entry point for `mission_type` (or a job type in JOBS)."""
+    try:
+        path = MISSIONS.get(mission_type) or JOBS[mission_type]
+    except KeyError:
+        raise ValueError(f"Invalid mission type: {mission_type}") from None
+    return import_string(path)
@@ -1,5 +1,8 @@
 import uuid
 from django.db import models
+from django.utils import timezone
+
+from core.fields import CompressedTextField
 
 class AgentRun(models.Model):
     run_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -8,23 +11,111 @@ class AgentRun(models.Model):
     started_at = models.DateTimeField(auto_now_add=True)
     finished_at = models.DateTimeField(null=True, blank=True)
 
+    # Maintained incrementally by core.persistence as messages are written
+    message_count = models.PositiveIntegerField(default=0)
+    token_count = models.PositiveBigIntegerField(default=0)
+    prompt_tokens = models.PositiveBigIntegerField(default=0)
+    completion_tokens = models.PositiveBigIntegerField(default=0)
+    type_counts = models.JSONField(default=dict, blank=True)
+    duration_seconds = models.FloatField(null=True, blank=True)
+    # Time missions spent waiting on the shared LLM rate limiter
+    throttled_seconds = models.FloatField(default=0)
+    # LLM response cache lookups (core.llm_cache)
+    cache_hits = models.PositiveIntegerField(default=0)
+    cache_misses = models.PositiveIntegerField(default=0)
+    # What was started, so a failed run can be resumed (core.admission)
+    mission_type = models.CharField(max_length=32, blank=True)
+    mission_input = models.TextField(blank=True)
+    # Set when core.retention moves the run's messages to a Parquet file,
+    # named relative to MESSAGE_ARCHIVE_DIR
+    archived_at = models.DateTimeField(null=True, blank=True)
+    archive_path = models.CharField(max_length=255, blank=True)
+    # Final snapshot of the live agent graph (core.graph)
+    graph = models.JSONField(default=dict, blank=True)
+    # Per-task timing and token profile of the latest attempt (core.profiler)
+    profile = models.JSONField(default=dict, blank=True)
+
     def __str__(self):
         return f"{self.name} ({self.run_id})"
 
+    def mark_finished(self, status: str):
+        self.status = status
+        self.finished_at = timezone.now()
+        self.duration_seconds = (self.finished_at - self.started_at).total_seconds()
+        # Never write the aggregate columns from a stale instance
+        self.save(update_fields=["name", "status", "finished_at", "duration_seconds"])
+
     class Meta:
         app_label = 'core'
         db_table = 'core_agent_run'
+        indexes = [
+            # History sidebar: completed runs, newest first
+            models.Index(fields=["status", "started_at"], name="agent_run_status_started_idx"),
+        ]
 
 
 class AgentMessage(models.Model):
     run = models.ForeignKey(AgentRun, on_delete=models.CASCADE, related_name="messages")
     agent_name = models.CharField(max_length=100)
-    content = models.TextField()
+    # Not searchable in SQL; core.search keeps a full-text index beside it
+    content = CompressedTextField()
     message_type = models.CharField(max_length=20)
     tool_used = models.CharField(max_length=100, blank=True)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Per-run publish order; timestamps can tie when messages are batched.
+    seq = models.PositiveIntegerField(default=0)
+    # Counted once at write time; LLM usage is stored when the provider reports it
+    token_count = models.PositiveIntegerField(default=0)
+    prompt_tokens = models.PositiveIntegerField(null=True, blank=True)
+    completion_tokens = models.PositiveIntegerField(null=True, blank=True)
+    timestamp = models.DateTimeField(default=timezone.now)
 
     class Meta:
         ordering = ["timestamp"]
         app_label = 'core'
-        db_table = 'core_agent_message'
\ No newline at end of file
+        db_table = 'core_agent_message'
+        # On PostgreSQL the table is partitioned by month on timestamp, so
+        # this constraint and the primary key also include it (core.retention)
+        constraints = [
+            models.UniqueConstraint(fields=["run", "seq"], name="agent_message_run_seq_uniq"),
+        ]
+        indexes = [
+            # Keyset pages of one run's messages (core.views.get_messages)
+            models.Index(fields=["run", "timestamp", "id"], name="agent_msg_run_ts_id_idx"),
+        ]
+
+
+class CompressionDictionary(models.Model):
+    """A zstd dictionary trained on agent messages; rows compressed with it name it by ID."""
+    dict_id = models.PositiveBigIntegerField(primary_key=True)
+    data = models.BinaryField()
+    sample_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"zstd dictionary {self.dict_id} ({len(self.data)} bytes)"
+
+    class Meta:
+        app_label = 'core'
+        db_table = 'core_compression_dictionary'
+
+
+class TaskCheckpoint(models.Model):
+    """
+    A crew task's final output, saved when the task completes so a failed
+    run can be resumed without running it again (agents.scheduler).
+    """
+    run = models.ForeignKey(AgentRun, on_delete=models.CASCADE, related_name="checkpoints")
+    task_name = models.CharField(max_length=100)
+    agent_name = models.CharField(max_length=100)
+    output = CompressedTextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.task_name} of {self.run_id}"
+
+    class Meta:
+        app_label = 'core'
+        db_table = 'core_task_checkpoint'
+        constraints = [
+            models.UniqueConstraint(fields=["run", "task_name"], name="task_checkpoint_run_task_uniq"),
+        ]
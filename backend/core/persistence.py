@@ -0,0 +1,285 @@
+import atexit
+import logging
+import threading
+import time
+from collections import Counter, deque
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from core.models import AgentMessage, AgentRun
+from core.redis_client import publish_message
+from core.search import index_messages
+from core.telemetry import BUFFERED_MESSAGES, DB_WRITE_SECONDS, MESSAGES_WRITTEN, current_span_link, tracer
+from core.tokens import count_tokens, usage_tokens
+
+logger = logging.getLogger(__name__)
+
+
+class FlushMetrics:
+    """Process-wide counters for the write-behind message buffers."""
+
+    def __init__(self, window: int = 1000):
+        self.lock = threading.Lock()
+        self.flushes = 0
+        self.messages = 0
+        self.failures = 0
+        self.sizes = deque(maxlen=window)
+        self.latencies_ms = deque(maxlen=window)
+
+    def record(self, size: int, latency_ms: float):
+        with self.lock:
+            self.flushes += 1
+            self.messages += size
+            self.sizes.append(size)
+            self.latencies_ms.append(latency_ms)
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            sizes = sorted(self.sizes)
+            latencies = sorted(self.latencies_ms)
+
+        def pct(values, p):
+            return values[min(len(values) - 1, int(p / 100 * len(values)))] if values else 0
+
+        return {
+            "flushes": self.flushes,
+            "messages": self.messages,
+            "failures": self.failures,
+            "flush_size_p50": pct(sizes, 50),
+            "flush_size_max": sizes[-1] if sizes else 0,
+            "flush_latency_ms_p50": round(pct(latencies, 50), 2),
+            "flush_latency_ms_p99": round(pct(latencies, 99), 2),
+        }
+
+
+metrics = FlushMetrics()
+
+
+def saved_seqs(run_id, messages) -> set:
+    """
+    Seqs of `messages` that are already stored, by a flush that committed
+    although it was reported as failed. Locks the run row first, so no
+    other flush of the run can insert between this check and the insert.
+    """
+    list(AgentRun.objects.select_for_update().filter(run_id=run_id).values_list("pk", flat=True))
+    return set(
+        AgentMessage.objects.filter(run_id=run_id, seq__in=[message.seq for message in messages])
+        .values_list("seq", flat=True)
+    )
+
+
+def update_run_aggregates(run_id, messages):
+    """
+    Adds a batch of messages to the run's counters. Must run in the same
+    transaction as the insert so the counters and rows commit together.
+    """
+    fields = ["message_count", "token_count", "prompt_tokens", "completion_tokens", "type_counts"]
+    run = AgentRun.objects.select_for_update().only(*fields).get(run_id=run_id)
+    type_counts = Counter(run.type_counts)
+    type_counts.update(message.message_type for message in messages)
+
+    run.message_count += len(messages)
+    run.token_count += sum(message.token_count for message in messages)
+    run.prompt_tokens += sum(message.prompt_tokens or 0 for message in messages)
+    run.completion_tokens += sum(message.completion_tokens or 0 for message in messages)
+    run.type_counts = dict(type_counts)
+    run.save(update_fields=fields)
+
+
+class MessageBuffer:
+    """
+    Collects a run's messages in memory and writes them with `bulk_create`.
+
+    Every message gets a per-run `seq` so the timeline order does not depend
+    on timestamp ties. Flushes happen on the background flusher thread once
+    `MESSAGE_FLUSH_SIZE` messages are pending or `MESSAGE_FLUSH_INTERVAL`
+    seconds have passed, and synchronously on `close`. A failed flush keeps
+    its messages for the next attempt. A retried batch only inserts and
+    counts the messages that are not stored yet, so rows and aggregates
+    stay exact even when the failed attempt had in fact committed.
+    """
+
+    def __init__(self, run_id):
+        self.run_id = str(run_id)
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.pending: list[AgentMessage] = []
+        # Spans that produced the pending messages, linked from the flush span
+        self.links = []
+        self.oldest = None
+        last = AgentMessage.objects.filter(run_id=run_id).aggregate(last=Max("seq"))["last"]
+        self.next_seq = (last or 0) + 1
+
+    def add(self, agent_name: str, content: str, msg_type: str, timestamp=None, usage=None) -> AgentMessage:
+        token_count = count_tokens(content)
+        prompt_tokens, completion_tokens = usage_tokens(usage)
+        link = current_span_link()
+        with self.lock:
+            message = AgentMessage(
+                run_id=self.run_id,
+                seq=self.next_seq,
+                agent_name=agent_name,
+                content=content,
+                message_type=msg_type,
+                timestamp=timestamp or timezone.now(),
+                token_count=token_count,
+                prompt_tokens=prompt_tokens,
+                completion_tokens=completion_tokens,
+            )
+            self.next_seq += 1
+            self.pending.append(message)
+            if link is not None:
+                self.links.append(link)
+            if self.oldest is None:
+                self.oldest = time.monotonic()
+            full = len(self.pending) >= settings.MESSAGE_FLUSH_SIZE
+        BUFFERED_MESSAGES.inc()
+
+        if full:
+            _flusher.wake()
+        return message
+
+    def due(self) -> bool:
+        with self.lock:
+            if not self.pending:
+                return False
+            return (
+                len(self.pending) >= settings.MESSAGE_FLUSH_SIZE
+                or time.monotonic() - self.oldest >= settings.MESSAGE_FLUSH_INTERVAL
+            )
+
+    def flush(self) -> int:
+        with self.flush_lock:
+            with self.lock:
+                batch, self.pending, self.oldest = self.pending, [], None
+                links, self.links = self.links, []
+            if not batch:
+                return 0
+
+            started = time.perf_counter()
+            with tracer.start_as_current_span("db.flush", links=links, attributes={
+                "run.id": self.run_id, "db.batch_size": len(batch),
+            }):
+                try:
+                    with transaction.atomic():
+                        saved = saved_seqs(self.run_id, batch)
+                        written = [message for message in batch if message.seq not in saved]
+                        if written:
+                            AgentMessage.objects.bulk_create(written, ignore_conflicts=True)
+                            update_run_aggregates(self.run_id, written)
+                            index_messages(self.run_id, written)
+                except Exception:
+                    metrics.record_failure()
+                    with self.lock:
+                        self.pending = batch + self.pending
+                        self.links = links + self.links
+                        self.oldest = time.monotonic()
+                    raise
+
+            elapsed = time.perf_counter() - started
+            metrics.record(len(written), elapsed * 1000)
+            DB_WRITE_SECONDS.observe(elapsed)
+            MESSAGES_WRITTEN.inc(len(written))
+            BUFFERED_MESSAGES.dec(len(batch))
+            return len(written)
+
+    def close(self, retries: int = 3):
+        for attempt in range(retries):
+            try:
+                self.flush()
+                return
+            except Exception as e:
+                logger.warning("Message flush failed (%s), attempt %d", e, attempt + 1, extra={"run_id": self.run_id})
+                time.sleep(0.5 * (attempt + 1))
+        logger.error("Dropping %d unsaved message(s)", len(self.pending), extra={"run_id": self.run_id})
+        BUFFERED_MESSAGES.dec(len(self.pending))
+
+
+class _Flusher:
+    def __init__(self):
+        self.buffers: dict[str, MessageBuffer] = {}
+        self.lock = threading.Lock()
+        self.event = threading.Event()
+        self.thread = None
+
+    def wake(self):
+        self.event.set()
+
+    def get(self, run_id) -> MessageBuffer:
+        run_id = str(run_id)
+        with self.lock:
+            buffer = self.buffers.get(run_id)
+            if buffer is None:
+                buffer = self.buffers[run_id] = MessageBuffer(run_id)
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._loop, name="message-flusher", daemon=True)
+                self.thread.start()
+        return buffer
+
+    def close(self, run_id):
+        with self.lock:
+            buffer = self.buffers.pop(str(run_id), None)
+        if buffer is not None:
+            buffer.close()
+
+    def close_all(self):
+        for run_id in list(self.buffers):
+            self.close(run_id)
+
+    def _loop(self):
+        while True:
+            self.event.wait(timeout=settings.MESSAGE_FLUSH_INTERVAL)
+            self.event.clear()
+            with self.lock:
+                buffers = list(self.buffers.values())
+            for buffer in buffers:
+                if not buffer.due():
+                    continue
+                try:
+                    buffer.flush()
+                except Exception as e:
+                    logger.warning("Message flush failed, will retry: %s", e, extra={"run_id": buffer.run_id})
+            close_old_connections()
+
+
+_flusher = _Flusher()
+atexit.register(_flusher.close_all)
+
+
+def get_buffer(run_id) -> MessageBuffer:
+    return _flusher.get(run_id)
+
+
+def close_buffer(run_id):
+    """Flushes and forgets a run's buffer. Call when the mission ends or fails."""
+    _flusher.close(run_id)
+
+
+def record_message(run_id, agent_name: str, content: str, msg_type: str = "thought", usage=None) -> AgentMessage:
+    """
+    Publishes a message to the run's live stream and queues it for
+    batched persistence. `usage` is the LLM usage behind the message
+    (CrewAI UsageMetrics or a LiteLLM usage dict), when known.
+    """
+    with tracer.start_as_current_span("publish", attributes={
+        "run.id": str(run_id), "agent.name": agent_name, "message.type": msg_type,
+    }) as span:
+        message = get_buffer(run_id).add(agent_name, content, msg_type, usage=usage)
+        span.set_attribute("message.seq", message.seq)
+        publish_message(run_id, {
+            "run_id": str(run_id),
+            "seq": message.seq,
+            "agent_name": agent_name,
+            "content": content,
+            "type": msg_type,
+            "token_count": message.token_count,
+            "timestamp": message.timestamp.isoformat(),
+        })
+    return message
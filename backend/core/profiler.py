@@ -0,0 +1,198 @@
+"""
+Per-run profile of where a mission spends its time.
+
+A RunProfile is kept next to the run's graph (core.graph) while the
+mission graph runs. It records for every task and the agent running it:
+start and finish times, LLM calls with cache hits and rate-limit retries,
+time throttled by the shared rate limiter (core.rate_limit), time spent
+waiting for the provider versus generating, and prompt and completion
+tokens.
+
+LLM calls are attributed by the CrewAI Task and Agent objects that
+MissionLLM receives as `from_task` and `from_agent`, not by step text.
+The profile is saved to AgentRun.profile whenever a task finishes and
+when the run ends. GET /api/runs/<run_id>/profile/ returns it and
+run_detail draws it as a waterfall.
+
+Wait is how long the provider took to start answering: the time to the
+first streamed token, else the queue and prompt time the provider reports
+in its usage (Groq does), else zero. Generation is the rest of the call.
+"""
+import threading
+import time
+
+from django.utils import timezone
+
+from core.models import AgentRun
+
+PENDING, RUNNING, FINISHED, RESTORED, FAILED = "pending", "running", "done", "restored", "failed"
+TIMINGS = ("throttle_seconds", "wait_seconds", "generation_seconds")
+COUNTERS = ("llm_calls", "cache_hits", "retries", "steps", "prompt_tokens", "completion_tokens", *TIMINGS)
+
+_active = {}
+_active_lock = threading.Lock()
+
+
+def active_profile(run_id):
+    """The RunProfile of a run being executed in this process, if any."""
+    return _active.get(str(run_id))
+
+
+def provider_wait(usage):
+    """Queue plus prompt processing time from a provider's usage, or None."""
+    if usage is None:
+        return None
+    if not isinstance(usage, dict):
+        usage = usage.model_dump() if hasattr(usage, "model_dump") else vars(usage)
+    if usage.get("queue_time") is None and usage.get("prompt_time") is None:
+        return None
+    return float(usage.get("queue_time") or 0) + float(usage.get("prompt_time") or 0)
+
+
+class RunProfile:
+    """
+    Profile of one run. Thread-safe: tasks start and finish on the
+    scheduler's pool threads, and LLM calls and steps are recorded from
+    whichever thread runs the agent.
+    """
+
+    def __init__(self, run_id):
+        self.run_id = str(run_id)
+        self.lock = threading.Lock()
+        self.started_at = timezone.now()
+        self.finished_at = None
+        self.tasks = {}
+        self.task_names = {}
+        self.clocks = {}
+
+    def __enter__(self):
+        with _active_lock:
+            _active[self.run_id] = self
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        with _active_lock:
+            _active.pop(self.run_id, None)
+        with self.lock:
+            self.finished_at = timezone.now()
+            if exc_type is not None:
+                for entry in self.tasks.values():
+                    if entry["state"] in (PENDING, RUNNING):
+                        entry["state"] = FAILED
+        self.save()
+
+    def define(self, task_nodes, restored=()) -> None:
+        """Adds an entry per task; tasks in `restored` were finished by an earlier attempt."""
+        with self.lock:
+            for node in task_nodes:
+                self.task_names[id(node.task)] = node.name
+                self.tasks[node.name] = {
+                    "task": node.name,
+                    "agent": node.task.agent.role,
+                    "depends_on": list(node.depends_on),
+                    "state": RESTORED if node.name in restored else PENDING,
+                    "started_at": None,
+                    "finished_at": None,
+                    "duration_seconds": None,
+                    **dict.fromkeys(COUNTERS, 0),
+                }
+
+    def task_started(self, task_name: str) -> None:
+        with self.lock:
+            entry = self.tasks[task_name]
+            entry.update(state=RUNNING, started_at=timezone.now())
+            self.clocks[task_name] = time.perf_counter()
+
+    def task_finished(self, task_name: str, failed: bool = False) -> None:
+        with self.lock:
+            entry = self.tasks[task_name]
+            entry.update(state=FAILED if failed else FINISHED, finished_at=timezone.now())
+            if task_name in self.clocks:
+                entry["duration_seconds"] = time.perf_counter() - self.clocks.pop(task_name)
+        self.save()
+
+    def _entry(self, task=None, agent_name: str = None):
+        # Callers hold the lock. The Task object is authoritative; the agent's
+        # running task covers calls made without one.
+        task_name = self.task_names.get(id(task)) if task is not None else None
+        if task_name is not None:
+            return self.tasks[task_name]
+        candidates = [entry for entry in self.tasks.values() if entry["agent"] == agent_name]
+        running = [entry for entry in candidates if entry["state"] == RUNNING]
+        return (running or candidates or [None])[0]
+
+    def llm_call(self, task, agent_name: str, elapsed: float, throttled: float = 0.0, first_token=None,
+                 usage=None, prompt_tokens=None, completion_tokens=None, retries: int = 0) -> None:
+        """
+        Records one LLM call that took `elapsed` seconds at the provider,
+        after `throttled` seconds waiting for the rate limiter and
+        `retries` rate-limited attempts.
+        """
+        wait = first_token if first_token is not None else provider_wait(usage)
+        wait = min(max(wait or 0.0, 0.0), elapsed)
+        with self.lock:
+            entry = self._entry(task, agent_name)
+            if entry is None:
+                return
+            entry["llm_calls"] += 1
+            entry["retries"] += retries
+            entry["throttle_seconds"] += throttled
+            entry["wait_seconds"] += wait
+            entry["generation_seconds"] += elapsed - wait
+            entry["prompt_tokens"] += prompt_tokens or 0
+            entry["completion_tokens"] += completion_tokens or 0
+
+    def cache_hit(self, task, agent_name: str) -> None:
+        with self.lock:
+            entry = self._entry(task, agent_name)
+            if entry is not None:
+                entry["cache_hits"] += 1
+
+    def step(self, agent_name: str) -> None:
+        with self.lock:
+            entry = self._entry(agent_name=agent_name)
+            if entry is not None:
+                entry["steps"] += 1
+
+    def snapshot(self) -> dict:
+        """
+        The profile as stored: tasks in start order with their offset from
+        the start of the run, totals per agent and for the run.
+        """
+        with self.lock:
+            finished_at = self.finished_at or timezone.now()
+            tasks = sorted(
+                (dict(entry) for entry in self.tasks.values()),
+                key=lambda entry: (entry["started_at"] is None, entry["started_at"] or finished_at),
+            )
+        agents = {}
+        for entry in tasks:
+            entry["offset_seconds"] = (
+                round((entry["started_at"] - self.started_at).total_seconds(), 3) if entry["started_at"] else None
+            )
+            for field in ("started_at", "finished_at"):
+                entry[field] = entry[field].isoformat() if entry[field] else None
+            for field in ("duration_seconds", *TIMINGS):
+                if entry[field] is not None:
+                    entry[field] = round(entry[field], 3)
+            totals = agents.setdefault(entry["agent"], {"tasks": 0, **dict.fromkeys(COUNTERS, 0)})
+            totals["tasks"] += 1
+            for field in COUNTERS:
+                totals[field] += entry[field]
+        return {
+            "run_id": self.run_id,
+            "started_at": self.started_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "wall_seconds": round((finished_at - self.started_at).total_seconds(), 3),
+            "tasks": tasks,
+            "agents": {
+                name: {field: round(value, 3) if field in TIMINGS else value for field, value in totals.items()}
+                for name, totals in agents.items()
+            },
+            "totals": {
+                field: round(sum(totals[field] for totals in agents.values()), 3) for field in COUNTERS
+            },
+        }
+
+    def save(self) -> None:
+        AgentRun.objects.filter(run_id=self.run_id).update(profile=self.snapshot())
@@ -0,0 +1,175 @@
+import re
+import time
+
+from django.conf import settings
+
+from core.redis_client import r
+
+BUCKET_KEY = "ratelimit:{model}"
+
+# Two token buckets (requests and tokens per minute) in one hash, refilled
+# from Redis' clock so every worker process shares the same budget.
+# Returns 0 and takes the budget when there is room, otherwise the number of
+# milliseconds to wait before trying again.
+_ACQUIRE_SCRIPT = r.register_script("""
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local rpm = tonumber(ARGV[1])
+local tpm = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'req', 'tok', 'ts', 'blocked_until')
+local req = tonumber(state[1]) or rpm
+local tok = tonumber(state[2]) or tpm
+local ts = tonumber(state[3]) or now
+local blocked = tonumber(state[4]) or 0
+if blocked > now then
+    return blocked - now
+end
+local elapsed = math.max(0, now - ts)
+req = math.min(rpm, req + elapsed * rpm / 60000)
+tok = math.min(tpm, tok + elapsed * tpm / 60000)
+local wait = 0
+if req < 1 then
+    wait = math.max(wait, (1 - req) * 60000 / rpm)
+end
+if tok < cost then
+    wait = math.max(wait, (cost - tok) * 60000 / tpm)
+end
+if wait == 0 then
+    req = req - 1
+    tok = tok - cost
+end
+redis.call('HSET', KEYS[1], 'req', req, 'tok', tok, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], 120000)
+return math.ceil(wait)
+""")
+
+# Pause the bucket after a 429 or an exhausted provider quota.
+_BLOCK_SCRIPT = r.register_script("""
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local until_ms = now + tonumber(ARGV[1])
+local blocked = tonumber(redis.call('HGET', KEYS[1], 'blocked_until')) or 0
+if until_ms > blocked then
+    redis.call('HSET', KEYS[1], 'blocked_until', until_ms, 'tok', 0, 'ts', now)
+end
+redis.call('PEXPIRE', KEYS[1], math.max(120000, tonumber(ARGV[1]) + 1000))
+return until_ms
+""")
+
+# Brings the token bucket up to Redis' clock, so a change made after it
+# applies from now: without moving `ts`, the next acquire would refill it
+# again for time that has already been counted.
+_REFILL = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local tpm = tonumber(ARGV[1])
+local state = redis.call('HMGET', KEYS[1], 'tok', 'ts')
+local tok = tonumber(state[1])
+local ts = tonumber(state[2]) or now
+if tok ~= nil then
+    tok = math.min(tpm, tok + math.max(0, now - ts) * tpm / 60000)
+end
+"""
+
+# Charges (or refunds) the difference between a call's estimate and its real
+# usage. An expired bucket is left alone: the next acquire starts it full.
+_SETTLE_SCRIPT = r.register_script(_REFILL + """
+if tok == nil then
+    return 0
+end
+tok = math.min(tpm, tok - tonumber(ARGV[2]))
+redis.call('HSET', KEYS[1], 'tok', tok, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], 120000)
+return 1
+""")
+
+# Lower (never raise) the token bucket to what the provider says is left.
+_SYNC_SCRIPT = r.register_script(_REFILL + """
+local remaining = tonumber(ARGV[2])
+if tok == nil or remaining < tok then
+    redis.call('HSET', KEYS[1], 'tok', remaining, 'ts', now)
+    redis.call('PEXPIRE', KEYS[1], 120000)
+end
+return 1
+""")
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+
+
+def parse_reset(value) -> float:
+    """Parses provider reset values such as "7.66s", "2m59.5s" or "120" into seconds."""
+    if value is None:
+        return 0.0
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    units = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+    return sum(float(amount) * units[unit] for amount, unit in _DURATION_PART.findall(value))
+
+
+def model_key(model: str) -> str:
+    return model.rsplit("/", 1)[-1]
+
+
+class RateLimiter:
+    """
+    Shared requests/minute and tokens/minute budget for one model.
+
+    `acquire` only sleeps when the budget is actually exhausted and returns
+    how long it waited, so callers can account throttle time per run.
+    """
+
+    def __init__(self, model: str):
+        configured = {model_key(name): value for name, value in settings.LLM_RATE_LIMITS.items()}
+        limits = configured.get(model_key(model)) or configured["default"]
+        self.model = model
+        self.key = BUCKET_KEY.format(model=model_key(model))
+        self.rpm = limits["rpm"]
+        self.tpm = limits["tpm"]
+
+    def acquire(self, tokens: int) -> float:
+        cost = max(1, min(int(tokens), self.tpm))
+        waited = 0.0
+        while True:
+            wait_ms = _ACQUIRE_SCRIPT(keys=[self.key], args=[self.rpm, self.tpm, cost])
+            if not wait_ms:
+                return waited
+            delay = min(wait_ms / 1000, settings.LLM_RATE_LIMIT_MAX_SLEEP)
+            time.sleep(delay)
+            waited += delay
+
+    def settle(self, reserved: int, actual: int):
+        """Charges or refunds the difference between the estimate and real usage."""
+        delta = actual - reserved
+        if delta:
+            _SETTLE_SCRIPT(keys=[self.key], args=[self.tpm, delta])
+
+    def block(self, seconds: float):
+        _BLOCK_SCRIPT(keys=[self.key], args=[int(max(seconds, 1) * 1000)])
+
+    def observe_headers(self, headers):
+        """Adapts the buckets to x-ratelimit-* response headers."""
+        if not headers:
+            return
+        headers = {k.lower().removeprefix("llm_provider-"): v for k, v in headers.items()}
+
+        remaining_tokens = headers.get("x-ratelimit-remaining-tokens")
+        if remaining_tokens is not None:
+            _SYNC_SCRIPT(keys=[self.key], args=[self.tpm, float(remaining_tokens)])
+
+        remaining_requests = headers.get("x-ratelimit-remaining-requests")
+        if remaining_requests is not None and int(float(remaining_requests)) <= 0:
+            self.block(parse_reset(headers.get("x-ratelimit-reset-requests")))
+
+
+_limiters: dict[str, RateLimiter] = {}
+
+
+def get_rate_limiter(model: str) -> RateLimiter:
+    key = model_key(model)
+    if key not in _limiters:
+        _limiters[key] = RateLimiter(model)
+    return _limiters[key]
@@ -2,29 +2,86 @@ import os
 import json
 import uuid
 import redis
+import logging
 import datetime
 
+from core.telemetry import EVENTS_PUBLISHED, inject_trace_context, tracer
+
+logger = logging.getLogger(__name__)
+
 r = redis.from_url(os.getenv("REDIS_URL", "redis://localhost:6379/0"))
 
+# Every published event is also appended to a capped per-run stream so
+# late or reconnecting viewers can replay what they missed.
+EVENT_LOG_MAXLEN = int(os.getenv("RUN_EVENT_LOG_MAXLEN", "10000"))
+EVENT_LOG_TTL = int(os.getenv("RUN_EVENT_LOG_TTL", str(24 * 3600)))
+
+# XADD + EXPIRE + PUBLISH in one round-trip so the live message carries the
+# same ID as its log entry. Pub/sub payload is "<stream id>\n<json>".
+_PUBLISH_SCRIPT = r.register_script("""
+local id = redis.call('XADD', KEYS[1], 'MAXLEN', '~', ARGV[1], '*', 'data', ARGV[3])
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+redis.call('PUBLISH', KEYS[2], id .. '\\n' .. ARGV[3])
+return id
+""")
+
+
 class UUIDEncoder(json.JSONEncoder):
     def default(self, obj):
         if isinstance(obj, uuid.UUID):
             return str(obj)
-        if isinstance(obj, datetime):
+        if isinstance(obj, datetime.datetime):
             return obj.isoformat()
         return super().default(obj)
 
-def publish_message(run_id, data: dict):
-    """
-    Publishes a message to Redis channel `run:{run_id}`
-    """
-    channel = f"run:{str(run_id)}"
-    now = datetime.datetime.now()
-    formatted_string = now.strftime("%H:%M:%S.%f")
-    print(f"[REDIS DEBUG] Publishing to channel '{channel}' content:{data['content'][:300]} time:{formatted_string}")
 
-    payload = json.dumps(data, cls=UUIDEncoder)
+def channel_name(run_id) -> str:
+    return f"run:{str(run_id)}"
+
 
-    # Pub/sub (live subscribers)
-    result = r.publish(channel, payload)
-    print(f"[REDIS DEBUG] Pub/sub result: {result} affected subscribers")
+def event_log_key(run_id) -> str:
+    return f"run:{str(run_id)}:events"
+
+
+def parse_event_id(event_id: str) -> tuple:
+    """Stream IDs are "<ms>-<seq>"; compare them as integer pairs."""
+    ms, _, seq = event_id.partition("-")
+    return int(ms), int(seq or 0)
+
+
+def publish_message(run_id, data: dict, verbose: bool = True, log: bool = True) -> str:
+    """
+    Appends a message to the run's event log and publishes it to Redis
+    channel `run:{run_id}`. Returns the event ID. High-rate events such as
+    token deltas pass verbose=False to skip even the (sampled) debug line.
+
+    With log=False the message is only published: it has no event ID, is
+    not replayed to late viewers and does not push older events out of the
+    capped log. For transient events such as token deltas. Returns "".
+    """
+    channel = channel_name(run_id)
+    event_type = data.get("type", "")
+    with tracer.start_as_current_span("redis.publish", attributes={
+        "run.id": str(run_id), "event.type": event_type,
+    }) as span:
+        # Viewers continue this trace from the context carried in the payload
+        payload = json.dumps(inject_trace_context(dict(data)), cls=UUIDEncoder)
+        if log:
+            event_id = _PUBLISH_SCRIPT(
+                keys=[event_log_key(run_id), channel],
+                args=[EVENT_LOG_MAXLEN, EVENT_LOG_TTL, payload],
+            )
+        else:
+            # No "<id>\n" prefix: the stream service sends it without an SSE id
+            r.publish(channel, payload)
+            event_id = ""
+        if isinstance(event_id, bytes):
+            event_id = event_id.decode()
+        span.set_attribute("event.id", event_id)
+    EVENTS_PUBLISHED.labels(type=event_type).inc()
+    if verbose and logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Published %s event", event_type, extra={
+            "run_id": str(run_id), "event_id": event_id, "agent_name": data.get("agent_name"),
+            "content_chars": len(data.get("content") or ""),
+        })
+    return event_id
@@ -0,0 +1,164 @@
+import json
+import logging
+import threading
+import time
+
+from django.db import connections
+from django.utils import timezone
+
+from core import mission_queue
+from core.graph import copy_graph
+from core.models import AgentMessage, AgentRun
+from core.redis_client import event_log_key, publish_message, r
+from core.retention import archived_messages
+
+logger = logging.getLogger(__name__)
+
+# Replays are not missions: they never show up in history and their
+# messages only live in the run's event log.
+REPLAY_STATUS = "replaying"
+REPLAYED_STATUS = "replayed"
+# A replay whose worker kept getting lost; unlike "failed" it is not resumable
+REPLAY_FAILED_STATUS = "replay_failed"
+
+
+def parse_speed(value) -> float:
+    """
+    Playback speed: 1 is the original timing, N is N times faster and
+    "max" (or 0) publishes as fast as possible. Returns 0 for "max".
+    """
+    if value in (None, ""):
+        return 1.0
+    if str(value).lower() in ("max", "0"):
+        return 0.0
+    speed = float(value)
+    if speed <= 0:
+        raise ValueError("speed must be positive or 'max'")
+    return speed
+
+
+def create_replay_run(source: AgentRun) -> AgentRun:
+    return AgentRun.objects.create(name=f"Replay: {source.name}", status=REPLAY_STATUS)
+
+
+def last_published_seq(run_id) -> int:
+    """The highest message seq already in a replay's event log, or 0."""
+    end = "+"
+    while True:
+        entries = r.xrevrange(event_log_key(run_id), max=end, count=100)
+        for entry_id, fields in entries:
+            seq = json.loads(fields[b"data"]).get("seq")
+            if seq is not None:
+                return seq
+        if len(entries) < 100:
+            return 0
+        end = "(" + entries[-1][0].decode()
+
+
+def replay_run(source_run_id, target: AgentRun, speed: float = 1.0, max_gap=None, after_seq: int = 0) -> int:
+    """
+    Republishes a recorded run's messages, in order, to `target`'s channel
+    through publish_message, sleeping for the original gaps between
+    messages divided by `speed` (0 = no sleeping), capped at `max_gap`
+    seconds. Messages up to `after_seq` are skipped. Nothing is written to
+    AgentMessage. Archived runs are read from their Parquet file. Returns
+    the number of messages published.
+    """
+    fields = ("seq", "agent_name", "content", "message_type", "token_count", "timestamp")
+    archive_path = AgentRun.objects.filter(run_id=source_run_id).values_list("archive_path", flat=True).first()
+    if archive_path:
+        messages = (
+            tuple(message[field] for field in fields)
+            for message in archived_messages(archive_path, source_run_id)
+            if message["seq"] > after_seq
+        )
+    else:
+        messages = (
+            AgentMessage.objects
+            .filter(run_id=source_run_id, seq__gt=after_seq)
+            .values_list(*fields)
+            .order_by("timestamp", "id")
+            .iterator(chunk_size=500)
+        )
+    published = 0
+    previous = None
+    # Sleep against a schedule so publish time does not add up as drift
+    clock = time.monotonic()
+    try:
+        for seq, agent_name, content, message_type, token_count, timestamp in messages:
+            if speed and previous is not None:
+                gap = max(0.0, (timestamp - previous).total_seconds()) / speed
+                clock += min(gap, max_gap) if max_gap is not None else gap
+                delay = clock - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            previous = timestamp
+
+            publish_message(target.run_id, {
+                "run_id": str(target.run_id),
+                "seq": seq,
+                "agent_name": agent_name,
+                "content": content,
+                "type": message_type,
+                "token_count": token_count,
+                "timestamp": timezone.now().isoformat(),
+            }, verbose=False)
+            published += 1
+    finally:
+        target.mark_finished(REPLAYED_STATUS)
+    return published
+
+
+def run_replay_job(_name, run_id, source_run_id, speed: float = 1.0, max_gap=None, **_):
+    """
+    Entry point of a "replay" job (core.missions.JOBS) on the mission
+    workers. A job requeued after its worker was lost carries on after the
+    last message it published, so viewers do not get events twice.
+    """
+    target = AgentRun.objects.get(run_id=run_id)
+    try:
+        count = replay_run(source_run_id, target, speed=speed, max_gap=max_gap, after_seq=last_published_seq(run_id))
+        logger.info("Replayed %d message(s) of %s as %s", count, source_run_id, target.run_id)
+    except Exception:
+        # The target is already marked replayed; a replay leaves no error message behind
+        logger.exception("Replay of %s failed", source_run_id)
+
+
+def fail_replay(run_id, reason: str) -> None:
+    """Ends a replay that could not finish; like its messages, the error is only published."""
+    publish_message(run_id, {
+        "run_id": str(run_id),
+        "agent_name": "System",
+        "content": f"Error: {reason}",
+        "type": "error",
+        "timestamp": timezone.now().isoformat(),
+    })
+    run = AgentRun.objects.filter(run_id=run_id, status=REPLAY_STATUS).first()
+    if run is not None:
+        run.mark_finished(REPLAY_FAILED_STATUS)
+
+
+def queue_replay(source: AgentRun, speed: float = 1.0, max_gap=None) -> AgentRun:
+    """Creates the replay run and queues it for the mission workers; returns the target run."""
+    target = create_replay_run(source)
+    copy_graph(source, target)
+    mission_queue.enqueue_job(target.run_id, "replay", target.name, params={
+        "source_run_id": str(source.run_id), "speed": speed, "max_gap": max_gap,
+    })
+    return target
+
+
+def start_replay(source: AgentRun, speed: float = 1.0, max_gap=None) -> tuple:
+    """Starts a replay on a background thread of this process; returns (target run, thread)."""
+    target = create_replay_run(source)
+    copy_graph(source, target)
+
+    def run():
+        try:
+            run_replay_job(target.name, target.run_id, source.run_id, speed=speed, max_gap=max_gap)
+        finally:
+            connections.close_all()
+
+    thread = threading.Thread(target=run, name=f"replay-{target.run_id}", daemon=True)
+    thread.start()
+    return target, thread
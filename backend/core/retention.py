@@ -0,0 +1,300 @@
+"""
+Message retention: month partitions of core_agent_message and Parquet
+archives of old runs.
+
+On PostgreSQL core_agent_message is range-partitioned by month on
+`timestamp` (migration 0011), with a default partition catching rows
+outside the months created so far. PostgreSQL requires the partition key
+in every unique constraint, so there the primary key is (id, timestamp)
+and agent_message_run_seq_uniq is (run, seq, timestamp). SQLite keeps a
+plain table and the partition helpers do nothing.
+
+`archive_runs` writes the messages of completed runs older than a cutoff
+to Parquet files under MESSAGE_ARCHIVE_DIR and deletes them from the
+table. The AgentRun row stays, with `archive_path` naming its file, and
+month partitions left empty are dropped. `archived_messages` reads a
+run's messages back, so run pages and replays work as before.
+"""
+import datetime
+import logging
+import os
+import re
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection as default_connection, transaction
+from django.utils import timezone
+
+from core.models import AgentMessage, AgentRun
+
+logger = logging.getLogger(__name__)
+
+TABLE = "core_agent_message"
+DEFAULT_PARTITION = f"{TABLE}_default"
+ARCHIVE_STATUSES = ("completed",)
+# Message columns kept in archives, besides run_id
+ARCHIVE_FIELDS = (
+    "id", "seq", "agent_name", "content", "message_type", "tool_used",
+    "token_count", "prompt_tokens", "completion_tokens", "timestamp",
+)
+
+_PARTITION_NAME = re.compile(rf"^{TABLE}_p(\d{{4}})_(\d{{2}})$")
+
+
+def month_start(value: datetime.datetime) -> datetime.datetime:
+    value = value.astimezone(datetime.timezone.utc)
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(month: datetime.datetime, count: int) -> datetime.datetime:
+    index = month.year * 12 + month.month - 1 + count
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_name(month: datetime.datetime) -> str:
+    return f"{TABLE}_p{month:%Y_%m}"
+
+
+def partitioned(connection=None) -> bool:
+    connection = connection or default_connection
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)", [TABLE])
+        return cursor.fetchone() is not None
+
+
+def month_partitions(connection=None) -> dict:
+    """{first day of month: partition name} of the attached month partitions."""
+    connection = connection or default_connection
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(%s)",
+            [TABLE],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    partitions = {}
+    for name in names:
+        match = _PARTITION_NAME.match(name)
+        if match:
+            month = datetime.datetime(int(match[1]), int(match[2]), 1, tzinfo=datetime.timezone.utc)
+            partitions[month] = name
+    return partitions
+
+
+def create_partition(month: datetime.datetime, connection=None) -> str:
+    """
+    Adds the partition for one month. Rows of that month already in the
+    default partition are moved into it first, as ATTACH requires.
+    """
+    connection = connection or default_connection
+    name = partition_name(month)
+    # Bounds are generated here, not user input; DDL takes no parameters
+    lower, upper = month.isoformat(), add_months(month, 1).isoformat()
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute(f"CREATE TABLE {name} (LIKE {TABLE} INCLUDING DEFAULTS)")
+        cursor.execute(
+            f"""
+            WITH moved AS (
+                DELETE FROM {DEFAULT_PARTITION} WHERE "timestamp" >= %s AND "timestamp" < %s RETURNING *
+            )
+            INSERT INTO {name} SELECT * FROM moved
+            """,
+            [lower, upper],
+        )
+        # Matching indexes, keys and foreign keys are created on attach
+        cursor.execute(f"ALTER TABLE {TABLE} ATTACH PARTITION {name} FOR VALUES FROM ('{lower}') TO ('{upper}')")
+    return name
+
+
+def ensure_partitions(months_ahead: int = None, start=None, connection=None) -> list:
+    """
+    Creates missing month partitions from `start` (default: this month)
+    through MESSAGE_PARTITION_MONTHS_AHEAD months ahead. Returns the names
+    created; does nothing unless the table is partitioned.
+    """
+    connection = connection or default_connection
+    if not partitioned(connection):
+        return []
+    if months_ahead is None:
+        months_ahead = settings.MESSAGE_PARTITION_MONTHS_AHEAD
+    current = month_start(timezone.now())
+    month = month_start(start) if start else current
+    last = add_months(current, months_ahead)
+    existing = month_partitions(connection)
+
+    created = []
+    while month <= last:
+        if month not in existing:
+            created.append(create_partition(month, connection))
+        month = add_months(month, 1)
+    if created:
+        logger.info("Created message partitions %s", ", ".join(created))
+    return created
+
+
+def drop_empty_partitions(before: datetime.datetime, connection=None) -> list:
+    """Drops month partitions that end by the start of `before`'s month and hold no rows."""
+    connection = connection or default_connection
+    if not partitioned(connection):
+        return []
+    cutoff = month_start(before)
+    dropped = []
+    for month, name in sorted(month_partitions(connection).items()):
+        if add_months(month, 1) > cutoff:
+            continue
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {name})")
+            if cursor.fetchone()[0]:
+                continue
+            cursor.execute(f"DROP TABLE {name}")
+        dropped.append(name)
+    if dropped:
+        logger.info("Dropped empty message partitions %s", ", ".join(dropped))
+    return dropped
+
+
+def archive_schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ("run_id", pa.string()),
+        ("id", pa.int64()),
+        ("seq", pa.int64()),
+        ("agent_name", pa.string()),
+        ("content", pa.large_string()),
+        ("message_type", pa.string()),
+        ("tool_used", pa.string()),
+        ("token_count", pa.int64()),
+        ("prompt_tokens", pa.int64()),
+        ("completion_tokens", pa.int64()),
+        ("timestamp", pa.timestamp("us", tz="UTC")),
+    ])
+
+
+def archive_file(archive_path: str) -> Path:
+    return Path(settings.MESSAGE_ARCHIVE_DIR) / archive_path
+
+
+def archivable_runs(before: datetime.datetime):
+    return (
+        AgentRun.objects
+        .filter(status__in=ARCHIVE_STATUSES, started_at__lt=before, archived_at__isnull=True)
+        .order_by("started_at", "run_id")
+    )
+
+
+def write_archive(run_ids, month: datetime.datetime) -> tuple:
+    """
+    Writes the runs' messages to a new Parquet file, sorted by run so each
+    run's rows share row groups that readers can pick out from the
+    footer statistics. Rows are written one row group of
+    MESSAGE_ARCHIVE_ROW_GROUP messages at a time, so memory does not grow
+    with the batch. Returns (path relative to MESSAGE_ARCHIVE_DIR,
+    messages written).
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    row_group = settings.MESSAGE_ARCHIVE_ROW_GROUP
+    schema = archive_schema()
+    columns = [[] for _ in schema.names]
+    rows = (
+        AgentMessage.objects.filter(run_id__in=run_ids)
+        .order_by("run_id", "timestamp", "id")
+        .values_list("run_id", *ARCHIVE_FIELDS)
+    )
+
+    relative = f"{month:%Y-%m}/messages-{uuid.uuid4().hex}.parquet"
+    path = archive_file(relative)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_suffix(".partial")
+    writer = pq.ParquetWriter(partial, schema, compression="zstd")
+
+    def write_group():
+        writer.write_table(pa.Table.from_arrays(
+            [pa.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema,
+        ), row_group_size=row_group)
+        for values in columns:
+            values.clear()
+
+    written = 0
+    try:
+        for run_id, *fields in rows.iterator(chunk_size=2000):
+            for values, value in zip(columns, (str(run_id), *fields)):
+                values.append(value)
+            written += 1
+            if len(columns[0]) >= row_group:
+                write_group()
+        if columns[0]:
+            write_group()
+        writer.close()
+    except BaseException:
+        writer.close()
+        partial.unlink(missing_ok=True)
+        raise
+    os.replace(partial, path)
+    return relative, written
+
+
+def archive_runs(before: datetime.datetime, batch_size: int = None) -> dict:
+    """
+    Archives completed runs started before `before`, `batch_size` runs per
+    Parquet file. Each batch's runs are marked archived and their rows
+    deleted in one transaction, after its file is complete. Then drops
+    the month partitions this emptied. Returns counts of what was done.
+    """
+    batch_size = batch_size or settings.MESSAGE_ARCHIVE_BATCH_RUNS
+    summary = {"runs": 0, "messages": 0, "files": 0, "bytes": 0}
+    while True:
+        runs = list(archivable_runs(before).values_list("run_id", "started_at")[:batch_size])
+        if not runs:
+            break
+        run_ids = [run_id for run_id, _ in runs]
+        relative, written = write_archive(run_ids, month_start(runs[0][1]))
+        try:
+            with transaction.atomic():
+                AgentRun.objects.filter(run_id__in=run_ids).update(archived_at=timezone.now(), archive_path=relative)
+                AgentMessage.objects.filter(run_id__in=run_ids).delete()
+        except Exception:
+            archive_file(relative).unlink(missing_ok=True)
+            raise
+        summary["runs"] += len(run_ids)
+        summary["messages"] += written
+        summary["files"] += 1
+        summary["bytes"] += archive_file(relative).stat().st_size
+        logger.info("Archived %d run(s) and %d message(s) to %s", len(run_ids), written, relative)
+
+    summary["dropped_partitions"] = drop_empty_partitions(before)
+    return summary
+
+
+def archived_messages(archive_path: str, run_id, after=None):
+    """
+    One archived run's messages as dicts of ARCHIVE_FIELDS, in (timestamp,
+    id) order, or only those after the (timestamp, id) position `after`.
+    Read lazily, one row group at a time: row groups whose run_id
+    statistics exclude the run are skipped, so a page of a run only reads
+    the row groups up to the end of that page.
+    """
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    run_id = str(run_id)
+    with pq.ParquetFile(archive_file(archive_path)) as parquet:
+        run_column = parquet.schema_arrow.get_field_index("run_id")
+        for index in range(parquet.num_row_groups):
+            stats = parquet.metadata.row_group(index).column(run_column).statistics
+            if stats is not None and stats.has_min_max:
+                # Rows are sorted by run: past the run, nothing further can match
+                if stats.min > run_id:
+                    return
+                if stats.max < run_id:
+                    continue
+            table = parquet.read_row_group(index, columns=["run_id", *ARCHIVE_FIELDS])
+            table = table.filter(pc.equal(table["run_id"], run_id)).select(list(ARCHIVE_FIELDS))
+            for message in table.to_pylist():
+                if after is None or (message["timestamp"], message["id"]) > after:
+                    yield message
@@ -0,0 +1,398 @@
+"""
+Full-text search over agent messages and run names.
+
+PostgreSQL keeps a `search_vector` tsvector column on core_agent_message
+with a GIN index, and an expression GIN index over run names. SQLite,
+for local development, keeps FTS5 tables instead (core_message_fts and
+core_run_fts). Both are created by migration 0010. Message bodies are
+stored compressed, so the database cannot index them itself: the index is
+written from the text when messages are flushed (`index_messages`).
+
+core_run_fts reads run names from core_agent_run and is kept in sync by
+triggers on that table. SQLite drops a table's triggers when a migration
+rebuilds it, so `install_run_index` recreates them and rebuilds the
+index; migrations that alter core_agent_run run it afterwards, and so
+does `rebuild_index`.
+
+Snippets are cut from the decompressed text of each result's best
+message, so they look the same on both backends.
+"""
+import html
+import math
+import re
+import uuid
+
+from django.conf import settings
+from django.db import connection as default_connection
+
+from core.models import AgentMessage, AgentRun
+
+TS_CONFIG = "english"
+# Weight of a run-name match against the rank of its best message
+NAME_WEIGHT = 2.0
+
+_TOKEN = re.compile(r'(-?)"([^"]+)"|(-?)([\w]+)')
+_SUFFIXES = ("ing", "ed", "es", "s")
+
+
+SQLITE_RUN_TRIGGERS = [
+    """CREATE TRIGGER core_run_fts_insert AFTER INSERT ON core_agent_run BEGIN
+        INSERT INTO core_run_fts (rowid, name) VALUES (new.rowid, new.name);
+    END""",
+    """CREATE TRIGGER core_run_fts_update AFTER UPDATE OF name ON core_agent_run BEGIN
+        INSERT INTO core_run_fts (core_run_fts, rowid, name) VALUES ('delete', old.rowid, old.name);
+        INSERT INTO core_run_fts (rowid, name) VALUES (new.rowid, new.name);
+    END""",
+    """CREATE TRIGGER core_run_fts_delete AFTER DELETE ON core_agent_run BEGIN
+        INSERT INTO core_run_fts (core_run_fts, rowid, name) VALUES ('delete', old.rowid, old.name);
+    END""",
+]
+
+
+def supported(connection=None) -> bool:
+    return (connection or default_connection).vendor in ("postgresql", "sqlite")
+
+
+def parse_query(query: str):
+    """Splits a search string into (text, negated, is_phrase) terms; OR is kept as a bare operator."""
+    terms = []
+    for negated, phrase, word_negated, word in _TOKEN.findall(query or ""):
+        if phrase:
+            terms.append((phrase.strip(), bool(negated), True))
+        elif word:
+            terms.append((word, bool(word_negated), False))
+    return terms
+
+
+def fts5_query(query: str) -> str:
+    """
+    The search syntax accepted by Postgres' websearch_to_tsquery (words,
+    "quoted phrases", -excluded, OR) rewritten as an FTS5 MATCH expression.
+    Returns "" when nothing positive is left to match.
+    """
+    positive, negative = [], []
+    for text, negated, is_phrase in parse_query(query):
+        if not is_phrase and text.upper() == "OR":
+            if positive and positive[-1] != "OR":
+                positive.append("OR")
+            continue
+        quoted = '"' + text.replace('"', '""') + '"'
+        (negative if negated else positive).append(quoted)
+    while positive and positive[-1] == "OR":
+        positive.pop()
+    if not positive:
+        return ""
+    return "(" + " ".join(positive) + ")" + "".join(f" NOT {term}" for term in negative)
+
+
+def _stem(word: str) -> str:
+    word = word.lower()
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[: -len(suffix)]
+    return word
+
+
+def term_pattern(query: str):
+    """Regex for the positive query words, matching their inflections roughly as the stemmers do."""
+    stems = set()
+    for text, negated, _ in parse_query(query):
+        if negated or text.upper() == "OR":
+            continue
+        stems.update(_stem(word) for word in re.findall(r"\w+", text))
+    if not stems:
+        return None
+    alternatives = "|".join(re.escape(stem) for stem in sorted(stems, key=len, reverse=True))
+    return re.compile(rf"\b(?:{alternatives})\w*", re.IGNORECASE)
+
+
+def highlight(text: str, query: str, width: int = None) -> str:
+    """An HTML-escaped window of `text` around the first match, with matches in <mark>."""
+    width = width or settings.SEARCH_SNIPPET_CHARS
+    pattern = term_pattern(query)
+    match = pattern.search(text) if pattern else None
+    start = max(0, match.start() - width // 3) if match else 0
+    end = min(len(text), start + width)
+    window = text[start:end]
+
+    parts, last = [], 0
+    for found in (pattern.finditer(window) if pattern else ()):
+        parts.append(html.escape(window[last:found.start()]))
+        parts.append(f"<mark>{html.escape(found.group())}</mark>")
+        last = found.end()
+    parts.append(html.escape(window[last:]))
+    return ("…" if start else "") + "".join(parts) + ("…" if end < len(text) else "")
+
+
+def index_rows(rows, connection=None) -> None:
+    """
+    Writes search entries for stored messages given as (id, agent_name,
+    text) rows. Re-indexing a row replaces its entry.
+    """
+    connection = connection or default_connection
+    rows = list(rows)
+    if not rows or not supported(connection):
+        return
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            values = ", ".join(["(%s, %s)"] * len(rows))
+            cursor.execute(
+                f"""
+                UPDATE core_agent_message AS m
+                SET search_vector = setweight(to_tsvector('{TS_CONFIG}', m.agent_name), 'B')
+                                 || setweight(to_tsvector('{TS_CONFIG}', v.body), 'D')
+                FROM (VALUES {values}) AS v(id, body)
+                WHERE m.id = v.id::bigint
+                """,
+                [param for message_id, _, text in rows for param in (message_id, text)],
+            )
+        else:
+            cursor.executemany(
+                "INSERT OR REPLACE INTO core_message_fts (rowid, body, agent_name) VALUES (%s, %s, %s)",
+                [(message_id, text, agent_name) for message_id, agent_name, text in rows],
+            )
+
+
+def index_messages(run_id, messages, connection=None) -> None:
+    """
+    Indexes messages just written by the flusher. `bulk_create` with
+    ignore_conflicts returns no IDs, so they are looked up by (run, seq).
+    """
+    if not messages or not supported(connection):
+        return
+    ids = dict(
+        AgentMessage.objects.filter(run_id=run_id, seq__in=[message.seq for message in messages])
+        .values_list("seq", "id")
+    )
+    index_rows(
+        ((ids[message.seq], message.agent_name, message.content) for message in messages if message.seq in ids),
+        connection,
+    )
+
+
+def install_run_index(connection=None) -> None:
+    """
+    SQLite: (re)creates the core_run_fts triggers and rebuilds the index
+    from core_agent_run, whose rowids a table rebuild may have renumbered.
+    """
+    connection = connection or default_connection
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        for name in ("insert", "update", "delete"):
+            cursor.execute(f"DROP TRIGGER IF EXISTS core_run_fts_{name}")
+        for statement in SQLITE_RUN_TRIGGERS:
+            cursor.execute(statement)
+        cursor.execute("INSERT INTO core_run_fts (core_run_fts) VALUES ('rebuild')")
+
+
+def rebuild_index(batch_size: int = 1000, connection=None) -> int:
+    """
+    Re-indexes every stored message and run name, e.g. after a bulk
+    import. Returns the number of messages indexed.
+    """
+    connection = connection or default_connection
+    if not supported(connection):
+        return 0
+    if connection.vendor == "sqlite":
+        install_run_index(connection)
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM core_message_fts")
+    indexed = 0
+    last_id = 0
+    while True:
+        batch = list(
+            AgentMessage.objects.filter(id__gt=last_id).order_by("id")
+            .values_list("id", "agent_name", "content")[:batch_size]
+        )
+        if not batch:
+            return indexed
+        index_rows(batch, connection)
+        indexed += len(batch)
+        last_id = batch[-1][0]
+
+
+def _filters(connection, mission_type=None, agent=None, message_type=None, since=None, until=None):
+    """WHERE fragments (on m = messages, r = runs) and their params."""
+    message_clauses, run_clauses, params_m, params_r = [], [], [], []
+    if agent:
+        message_clauses.append("m.agent_name = %s")
+        params_m.append(agent)
+    if message_type:
+        message_clauses.append("m.message_type = %s")
+        params_m.append(message_type)
+    if mission_type:
+        run_clauses.append("r.mission_type = %s")
+        params_r.append(mission_type)
+    if since:
+        run_clauses.append("r.started_at >= %s")
+        params_r.append(connection.ops.adapt_datetimefield_value(since))
+    if until:
+        run_clauses.append("r.started_at < %s")
+        params_r.append(connection.ops.adapt_datetimefield_value(until))
+    return message_clauses, run_clauses, params_m, params_r
+
+
+def _message_hits(connection, query, limit, message_clauses, run_clauses, params_m, params_r):
+    """
+    (run_id, best rank, best message id, matching messages) per run, over
+    the newest `limit` matching messages. Grouped in the database so only
+    one row per run comes back.
+    """
+    join = "JOIN core_agent_run r ON r.run_id = m.run_id" if run_clauses else ""
+    where = "".join(f" AND {clause}" for clause in message_clauses + run_clauses)
+    if connection.vendor == "postgresql":
+        # Newest first lets the planner walk the primary key backwards for
+        # common terms and use the GIN index for rare ones
+        sql = f"""
+            SELECT h.run_id, MAX(h.rank), (array_agg(h.id ORDER BY h.rank DESC))[1], COUNT(*)
+            FROM (
+                SELECT m.run_id, m.id, ts_rank_cd(m.search_vector, q) AS rank
+                FROM core_agent_message m
+                CROSS JOIN websearch_to_tsquery('{TS_CONFIG}', %s) q
+                {join}
+                WHERE m.search_vector @@ q{where}
+                ORDER BY m.id DESC
+                LIMIT %s
+            ) h
+            GROUP BY h.run_id
+        """
+        params = [query, *params_m, *params_r, limit]
+    else:
+        match = fts5_query(query)
+        if not match:
+            return []
+        # bm25 is lower-is-better; the agent name column weighs less than the
+        # body. SQLite takes the bare h.id from the row that has the MAX.
+        sql = f"""
+            SELECT h.run_id, MAX(h.rank), h.id, COUNT(*)
+            FROM (
+                SELECT m.run_id, m.id, -bm25(core_message_fts, 1.0, 0.5) AS rank
+                FROM core_message_fts
+                JOIN core_agent_message m ON m.id = core_message_fts.rowid
+                {join}
+                WHERE core_message_fts MATCH %s{where}
+                ORDER BY core_message_fts.rowid DESC
+                LIMIT %s
+            ) h
+            GROUP BY h.run_id
+        """
+        params = [match, *params_m, *params_r, limit]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def _name_hits(connection, query, limit, run_clauses, params_r):
+    """(run_id, rank) of runs whose name matches."""
+    where = "".join(f" AND {clause}" for clause in run_clauses)
+    if connection.vendor == "postgresql":
+        # Must match the expression of agent_run_name_search_idx
+        sql = f"""
+            SELECT r.run_id, ts_rank(to_tsvector('{TS_CONFIG}', r.name), q) AS rank
+            FROM core_agent_run r
+            CROSS JOIN websearch_to_tsquery('{TS_CONFIG}', %s) q
+            WHERE to_tsvector('{TS_CONFIG}', r.name) @@ q{where}
+            LIMIT %s
+        """
+        params = [query, *params_r, limit]
+    else:
+        match = fts5_query(query)
+        if not match:
+            return []
+        sql = f"""
+            SELECT r.run_id, -bm25(core_run_fts) AS rank
+            FROM core_run_fts
+            JOIN core_agent_run r ON r.rowid = core_run_fts.rowid
+            WHERE core_run_fts MATCH %s{where}
+            LIMIT %s
+        """
+        params = [match, *params_r, limit]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def _run_key(value) -> str:
+    # Postgres returns UUIDs, SQLite their 32-character hex
+    return str(value if isinstance(value, uuid.UUID) else uuid.UUID(str(value)))
+
+
+def search(query: str, mission_type=None, agent=None, message_type=None, since=None, until=None,
+           page: int = 1, page_size: int = None, connection=None) -> dict:
+    """
+    Runs matching `query` in their messages or name, best first. A run's
+    score is its best matching message's rank, raised slightly for every
+    further matching message, plus NAME_WEIGHT times its name's rank.
+    Agent and message type filters apply to messages (a name match alone
+    does not satisfy them); mission type and the date range (on
+    started_at) apply to runs. Returns one page of results with a
+    highlighted snippet of each run's best message.
+    """
+    connection = connection or default_connection
+    page = max(1, page)
+    page_size = min(max(1, page_size or settings.SEARCH_PAGE_SIZE), settings.SEARCH_PAGE_MAX)
+    limit = settings.SEARCH_MAX_CANDIDATES
+    message_clauses, run_clauses, params_m, params_r = _filters(
+        connection, mission_type, agent, message_type, since, until,
+    )
+
+    runs = {}
+    for run_id, rank, message_id, hits in _message_hits(connection, query, limit, message_clauses, run_clauses, params_m, params_r):
+        runs[_run_key(run_id)] = {"best": rank, "best_id": message_id, "hits": hits, "name_rank": 0.0}
+    if not message_clauses:
+        for run_id, rank in _name_hits(connection, query, limit, run_clauses, params_r):
+            entry = runs.setdefault(_run_key(run_id), {"best": 0.0, "best_id": None, "hits": 0, "name_rank": 0.0})
+            entry["name_rank"] = rank
+
+    for entry in runs.values():
+        entry["score"] = entry["best"] * (1 + 0.1 * math.log1p(max(0, entry["hits"] - 1))) + NAME_WEIGHT * entry["name_rank"]
+    ranked = sorted(runs.items(), key=lambda item: (-item[1]["score"], item[0]))
+    offset = (page - 1) * page_size
+    page_items = ranked[offset:offset + page_size]
+
+    run_rows = {
+        str(run["run_id"]): run
+        for run in AgentRun.objects.filter(run_id__in=[run_id for run_id, _ in page_items])
+        .values("run_id", "name", "status", "mission_type", "started_at", "token_count")
+    }
+    messages = {
+        message["id"]: message
+        for message in AgentMessage.objects.filter(id__in=[entry["best_id"] for _, entry in page_items if entry["best_id"]])
+        .values("id", "seq", "agent_name", "message_type", "content", "timestamp")
+    }
+
+    results = []
+    for run_id, entry in page_items:
+        run = run_rows.get(run_id)
+        if run is None:
+            continue
+        message = messages.get(entry["best_id"])
+        results.append({
+            "run_id": run_id,
+            "name": run["name"],
+            "name_highlighted": highlight(run["name"], query) if entry["name_rank"] else html.escape(run["name"]),
+            "status": run["status"],
+            "mission_type": run["mission_type"],
+            "started_at": run["started_at"].isoformat() if run["started_at"] else None,
+            "tokens": run["token_count"],
+            "score": round(entry["score"], 6),
+            "matching_messages": entry["hits"],
+            "message": {
+                "id": message["id"],
+                "seq": message["seq"],
+                "agent_name": message["agent_name"],
+                "message_type": message["message_type"],
+                "timestamp": message["timestamp"].isoformat(),
+                "snippet": highlight(message["content"], query),
+            } if message else None,
+        })
+
+    return {
+        "results": results,
+        "page": page,
+        "next_page": page + 1 if offset + page_size < len(ranked) else None,
+        "total": len(ranked),
+        # Only the newest SEARCH_MAX_CANDIDATES matching messages were ranked
+        "truncated": sum(entry["hits"] for _, entry in ranked) >= limit,
+    }
@@ -0,0 +1,66 @@
+import threading
+import time
+
+from django.conf import settings
+
+from core.redis_client import publish_message
+
+
+class DeltaStream:
+    """
+    Coalesces LLM token chunks for one agent step into `delta` events.
+
+    Chunks are buffered and published together once STREAM_DELTA_INTERVAL
+    has passed or STREAM_DELTA_CHUNKS have arrived, so Redis and SSE see a
+    few frames per second per agent rather than one per token. Deltas are
+    only published, not added to the run's event log, so they never push
+    agent messages out of it; the step's full text is persisted and logged
+    once by the regular step message.
+    """
+
+    def __init__(self, run_id, agent_name: str, step: str):
+        self.run_id = str(run_id)
+        self.agent_name = agent_name
+        self.step = step
+        self.lock = threading.Lock()
+        self.pending = []
+        self.index = 0
+        self.opened = self.last_flush = time.monotonic()
+        # Seconds from opening the stream to its first chunk (core.profiler)
+        self.first_chunk_seconds = None
+
+    def feed(self, chunk: str):
+        if not chunk:
+            return
+        with self.lock:
+            if self.first_chunk_seconds is None:
+                self.first_chunk_seconds = time.monotonic() - self.opened
+            self.pending.append(chunk)
+            due = (
+                len(self.pending) >= settings.STREAM_DELTA_CHUNKS
+                or time.monotonic() - self.last_flush >= settings.STREAM_DELTA_INTERVAL
+            )
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            if not self.pending:
+                return
+            content = "".join(self.pending)
+            self.pending = []
+            index = self.index
+            self.index += 1
+            self.last_flush = time.monotonic()
+
+        publish_message(self.run_id, {
+            "run_id": self.run_id,
+            "type": "delta",
+            "agent_name": self.agent_name,
+            "step": self.step,
+            "index": index,
+            "content": content,
+        }, verbose=False, log=False)
+
+    def close(self):
+        self.flush()
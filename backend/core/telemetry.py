@@ -0,0 +1,209 @@
+"""
+Tracing and metrics shared by the Django app, the mission workers and the
+FastAPI stream service.
+
+Tracing is configured from the environment so the stream service, which
+does not load Django settings, uses the same switches:
+
+    TRACING_EXPORTER=none|console|file|otlp   (default none)
+    TRACING_FILE=/tmp/agent-swarm-traces.jsonl
+    OTEL_EXPORTER_OTLP_ENDPOINT=http://localhost:4318  (standard OTel variable)
+    OTEL_SERVICE_NAME=agent-swarm-django
+
+With TRACING_EXPORTER=none the OpenTelemetry API's no-op tracer is used
+and no trace context is added to published events.
+
+Prometheus metrics live in the default registry. When
+PROMETHEUS_MULTIPROC_DIR is set, /metrics aggregates every process that
+shares the directory (the web process and the mission workers).
+"""
+import json
+import logging
+import os
+import threading
+
+from opentelemetry import context as otel_context, propagate, trace
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest, multiprocess,
+)
+from prometheus_client.core import GaugeMetricFamily
+
+logger = logging.getLogger(__name__)
+
+TRACER_NAME = "agent-swarm"
+tracer = trace.get_tracer(TRACER_NAME)
+
+_setup_lock = threading.Lock()
+_tracing_enabled = False
+
+
+# LLM
+LLM_LATENCY = Histogram(
+    "llm_call_seconds", "LLM call latency per agent.", ["agent", "model"],
+    buckets=(0.25, 0.5, 1, 2, 4, 8, 15, 30, 60, 120),
+)
+LLM_TOKENS = Counter("llm_tokens_total", "Tokens used by LLM calls.", ["agent", "kind"])
+LLM_TOKENS_PER_SECOND = Histogram(
+    "llm_completion_tokens_per_second", "Completion tokens per second of each LLM call.", ["agent"],
+    buckets=(5, 10, 25, 50, 100, 200, 400, 800, 1600),
+)
+
+# Publishing and persistence
+EVENTS_PUBLISHED = Counter("run_events_published_total", "Events published to run channels.", ["type"])
+DB_WRITE_SECONDS = Histogram(
+    "message_flush_seconds", "Latency of one batched AgentMessage insert plus aggregate update.",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1),
+)
+MESSAGES_WRITTEN = Counter("messages_written_total", "AgentMessage rows written.")
+BUFFERED_MESSAGES = Gauge(
+    "messages_buffered", "Messages waiting in write-behind buffers.", multiprocess_mode="livesum",
+)
+
+# SSE
+SSE_EVENTS_SENT = Counter("sse_events_sent_total", "Events written to SSE connections.", ["source"])
+
+
+class JsonLinesSpanExporter:
+    """Appends finished spans to a file as one JSON object per line, for offline use."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def export(self, spans):
+        from opentelemetry.sdk.trace.export import SpanExportResult
+
+        lines = [span.to_json(indent=None) for span in spans]
+        with self.lock, open(self.path, "a") as f:
+            f.write("\n".join(lines) + "\n")
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self):
+        pass
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return True
+
+
+def _build_exporter(name: str):
+    if name == "console":
+        from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+
+        return ConsoleSpanExporter()
+    if name == "file":
+        return JsonLinesSpanExporter(os.getenv("TRACING_FILE", "/tmp/agent-swarm-traces.jsonl"))
+    if name == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+
+        return OTLPSpanExporter()
+    raise ValueError(f"Unknown TRACING_EXPORTER: {name}")
+
+
+def setup_tracing(service_name: str) -> bool:
+    """
+    Installs the global tracer provider once per process. Returns whether
+    tracing is enabled.
+    """
+    global _tracing_enabled
+    with _setup_lock:
+        if _tracing_enabled:
+            return True
+        exporter_name = os.getenv("TRACING_EXPORTER", "none").lower()
+        if exporter_name == "none":
+            return False
+
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+
+        resource = Resource.create({"service.name": os.getenv("OTEL_SERVICE_NAME", service_name)})
+        provider = TracerProvider(resource=resource)
+        provider.add_span_processor(BatchSpanProcessor(_build_exporter(exporter_name)))
+        trace.set_tracer_provider(provider)
+        _tracing_enabled = True
+        logger.info("Tracing %s with the %s exporter", service_name, exporter_name)
+        return True
+
+
+def tracing_enabled() -> bool:
+    return _tracing_enabled
+
+
+def inject_trace_context(payload: dict) -> dict:
+    """Adds the current span's W3C trace context to an event payload."""
+    if _tracing_enabled:
+        carrier = {}
+        propagate.inject(carrier)
+        if carrier:
+            payload["trace"] = carrier
+    return payload
+
+
+def extract_trace_context(payload: str):
+    """Returns the OTel context carried in a published JSON payload, or None."""
+    if '"trace"' not in payload:
+        return None
+    try:
+        carrier = json.loads(payload).get("trace")
+    except (ValueError, AttributeError):
+        return None
+    return propagate.extract(carrier) if carrier else None
+
+
+def current_span_link():
+    """A link to the active span, for work that finishes in another trace, or None."""
+    span_context = trace.get_current_span().get_span_context()
+    return trace.Link(span_context) if span_context.is_valid else None
+
+
+def current_context():
+    """For handing the active trace to another thread; attach it with `attach_context`."""
+    return otel_context.get_current()
+
+
+def attach_context(ctx):
+    return otel_context.attach(ctx)
+
+
+def detach_context(token):
+    otel_context.detach(token)
+
+
+def mark_process_dead(pid: int):
+    """Drops an exited worker's live gauges from the multiprocess directory."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(pid)
+
+
+def metrics_response(gauges=None) -> tuple:
+    """
+    Renders Prometheus metrics. `gauges` maps metric name to
+    (help text, callable) for values read at scrape time, such as queue
+    depths. Returns (body, content type).
+    """
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+
+    body = generate_latest(registry)
+    if gauges:
+        scrape = CollectorRegistry()
+        scrape.register(_ScrapeTimeGauges(gauges))
+        body += generate_latest(scrape)
+    return body, CONTENT_TYPE_LATEST
+
+
+class _ScrapeTimeGauges:
+    def __init__(self, gauges):
+        self.gauges = gauges
+
+    def collect(self):
+        for name, (documentation, read) in self.gauges.items():
+            try:
+                value = read()
+            except Exception as e:
+                logger.warning("Could not read %s: %s", name, e)
+                continue
+            yield GaugeMetricFamily(name, documentation, value=value)
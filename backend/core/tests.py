@@ -1,3 +1,356 @@
-from django.test import TestCase
+"""
+Smoke test of the mission path with the fake LLM from benchmarks.e2e and
+an in-process fakeredis server, so it runs offline:
 
-# Create your tests here.
+    python manage.py test core --settings=benchmarks.settings
+"""
+import json
+from argparse import Namespace
+from datetime import timedelta
+from unittest import mock
+
+from benchmarks import e2e
+
+# Before any app module creates its Redis client
+e2e.use_redis("")
+
+from django.db import connection  # noqa: E402
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings  # noqa: E402
+from django.urls import reverse  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from agents.scheduler import TaskNode, check_graph  # noqa: E402
+from core import admission, mission_queue, replay, search  # noqa: E402
+from core.compression import negotiate_encoding  # noqa: E402
+from core.rate_limit import RateLimiter, parse_reset  # noqa: E402
+from core.views import get_history, get_messages  # noqa: E402
+from core.models import AgentMessage, AgentRun  # noqa: E402
+from core.redis_client import event_log_key, publish_message, r  # noqa: E402
+
+
+class FakeMissionTest(TransactionTestCase):
+    def test_research_mission_runs_end_to_end(self):
+        import agents.crew_mission as crew_mission
+
+        run = AgentRun.objects.create(name="Smoke test")
+        llm = Namespace(llm_latency=0, tokens_per_second=100000, output_words=20)
+
+        with mock.patch.object(crew_mission, "build_llm"):
+            e2e.install_fake_llm(llm)
+            e2e.run_mission("research", run.run_id, cache="off", stream=False)
+
+        run.refresh_from_db()
+        self.assertEqual(run.status, "completed")
+        self.assertTrue(AgentMessage.objects.filter(run=run, message_type="final").exists())
+        self.assertEqual(run.message_count, AgentMessage.objects.filter(run=run).count())
+
+
+class RunNameSearchTest(TestCase):
+    def setUp(self):
+        if not search.supported(connection):
+            self.skipTest(f"No full-text search on {connection.vendor}")
+
+    def test_new_run_is_found_by_name(self):
+        run = AgentRun.objects.create(name="Quarterly zebra launch")
+
+        result = search.search("zebra")
+
+        self.assertEqual(result["total"], 1)
+        self.assertEqual(result["results"][0]["run_id"], str(run.run_id))
+        self.assertIn("<mark>zebra</mark>", result["results"][0]["name_highlighted"])
+
+    def test_renamed_run_is_found_by_its_new_name(self):
+        run = AgentRun.objects.create(name="Untitled")
+        run.name = "Okapi summit"
+        run.save(update_fields=["name"])
+
+        self.assertEqual(search.search("okapi")["total"], 1)
+        self.assertEqual(search.search("untitled")["total"], 0)
+
+    def test_rebuild_index_restores_run_names(self):
+        run = AgentRun.objects.create(name="Narwhal retreat")
+        if connection.vendor == "sqlite":
+            # What a table rebuild by a later migration leaves behind
+            with connection.cursor() as cursor:
+                cursor.execute("DROP TRIGGER core_run_fts_insert")
+                cursor.execute("INSERT INTO core_run_fts (core_run_fts) VALUES ('delete-all')")
+
+        search.rebuild_index()
+
+        self.assertEqual(search.search("narwhal")["results"][0]["run_id"], str(run.run_id))
+
+
+class ReplayTest(TestCase):
+    def setUp(self):
+        r.flushall()
+        self.source = AgentRun.objects.create(name="Recorded", status="completed")
+        started = timezone.now()
+        for seq in range(1, 5):
+            AgentMessage.objects.create(
+                run=self.source, seq=seq, agent_name="Agent", message_type="thought",
+                content=f"message {seq}", timestamp=started + timedelta(seconds=seq),
+            )
+
+    def published_seqs(self, run_id):
+        return [json.loads(fields[b"data"]).get("seq") for _, fields in r.xrange(event_log_key(run_id))]
+
+    def test_replay_publishes_every_message_in_order(self):
+        target = replay.create_replay_run(self.source)
+
+        replay.run_replay_job(target.name, target.run_id, self.source.run_id, speed=0)
+
+        self.assertEqual(self.published_seqs(target.run_id), [1, 2, 3, 4])
+        target.refresh_from_db()
+        self.assertEqual(target.status, replay.REPLAYED_STATUS)
+
+    def test_requeued_replay_continues_after_the_last_published_message(self):
+        target = replay.create_replay_run(self.source)
+        for seq in (1, 2):
+            publish_message(target.run_id, {"seq": seq, "type": "thought"})
+        publish_message(target.run_id, {"type": "graph_delta"})
+
+        replay.run_replay_job(target.name, target.run_id, self.source.run_id, speed=0)
+
+        self.assertEqual(self.published_seqs(target.run_id), [1, 2, None, 3, 4])
+
+    def test_failed_replay_is_not_resumable(self):
+        target = replay.create_replay_run(self.source)
+
+        replay.fail_replay(target.run_id, "lost")
+
+        target.refresh_from_db()
+        self.assertEqual(target.status, replay.REPLAY_FAILED_STATUS)
+        self.assertFalse(AgentMessage.objects.filter(run=target).exists())
+
+    def test_replay_api_rejects_bad_bodies(self):
+        url = reverse("replay_run", args=[self.source.run_id])
+        for body in ("{not json", "[1, 2]", '{"speed": -1}'):
+            response = self.client.post(url, body, content_type="application/json")
+            self.assertEqual(response.status_code, 400, body)
+
+    def test_replay_api_requires_a_completed_run(self):
+        running = AgentRun.objects.create(name="Live", status="running", mission_type="research")
+        response = self.client.post(reverse("replay_run", args=[running.run_id]), "{}", content_type="application/json")
+        self.assertEqual(response.status_code, 409)
+
+
+class RateLimiterTest(TestCase):
+    def setUp(self):
+        r.flushall()
+        self.limiter = RateLimiter("groq/test-model")
+
+    def bucket(self):
+        return {key.decode(): float(value) for key, value in r.hgetall(self.limiter.key).items()}
+
+    def test_settle_leaves_an_expired_bucket_alone(self):
+        self.limiter.settle(reserved=1000, actual=500)
+        self.assertFalse(r.exists(self.limiter.key))
+
+    def test_settle_refunds_from_now_and_keeps_the_bucket_expiring(self):
+        self.limiter.acquire(1000)
+        r.hset(self.limiter.key, "ts", self.bucket()["ts"] - 1000)
+
+        self.limiter.settle(reserved=1000, actual=400)
+
+        bucket = self.bucket()
+        # 100 tokens refilled for the second that passed, then 600 refunded
+        self.assertAlmostEqual(bucket["tok"], self.limiter.tpm - 1000 + 100 + 600, delta=5)
+        self.assertGreater(r.pttl(self.limiter.key), 0)
+
+    def test_settle_never_fills_past_the_limit(self):
+        self.limiter.acquire(100)
+        self.limiter.settle(reserved=100, actual=0)
+        self.assertLessEqual(self.bucket()["tok"], self.limiter.tpm)
+
+    def test_provider_snapshot_restarts_the_refill(self):
+        self.limiter.acquire(100)
+        r.hset(self.limiter.key, "ts", self.bucket()["ts"] - 30000)
+
+        self.limiter.observe_headers({"x-ratelimit-remaining-tokens": "50"})
+
+        bucket = self.bucket()
+        self.assertEqual(bucket["tok"], 50)
+        self.assertEqual(self.limiter.acquire(50), 0.0)
+        self.assertGreater(r.pttl(self.limiter.key), 0)
+
+
+class CheckGraphTest(SimpleTestCase):
+    def node(self, name, *depends_on):
+        return TaskNode(name, task=None, depends_on=depends_on)
+
+    def test_accepts_a_dag(self):
+        check_graph([self.node("a"), self.node("b", "a"), self.node("c", "a"), self.node("d", "b", "c")])
+
+    def test_rejects_duplicate_names(self):
+        with self.assertRaisesMessage(ValueError, "Duplicate"):
+            check_graph([self.node("a"), self.node("a")])
+
+    def test_rejects_unknown_dependencies(self):
+        with self.assertRaisesMessage(ValueError, "unknown task(s): x"):
+            check_graph([self.node("a", "x")])
+
+    def test_rejects_cycles(self):
+        with self.assertRaisesMessage(ValueError, "cycle among: b, c"):
+            check_graph([self.node("a"), self.node("b", "a", "c"), self.node("c", "b")])
+
+
+@override_settings(
+    MISSION_MAX_RUNNING=2, MISSION_TYPE_LIMITS={"conference": 1}, MISSION_QUEUE_MAX=3,
+    MISSION_QUEUE_TIMEOUT=60, MISSION_DEFAULT_PRIORITY=5,
+)
+class AdmissionTest(TestCase):
+    def setUp(self):
+        r.flushall()
+
+    def enqueue(self, run_id, mission_type="research", **kwargs):
+        return mission_queue.enqueue_mission(run_id, mission_type, f"Mission {run_id}", **kwargs)
+
+    def test_admits_up_to_the_global_limit_in_priority_order(self):
+        self.enqueue("low", priority=1)
+        self.enqueue("default")
+        self.enqueue("high", priority=9)
+
+        admitted, expired = mission_queue.admit_jobs()
+
+        self.assertEqual(admitted, ["high", "default"])
+        self.assertEqual(expired, [])
+        self.assertEqual(mission_queue.pending_run_ids(), ["low"])
+        self.assertEqual(mission_queue.running_count(), 2)
+
+    def test_type_limit_skips_without_blocking_later_jobs(self):
+        self.enqueue("c1", "conference")
+        self.enqueue("c2", "conference")
+        self.enqueue("r1")
+
+        admitted, _ = mission_queue.admit_jobs()
+
+        self.assertEqual(admitted, ["c1", "r1"])
+        self.assertEqual(mission_queue.pending_run_ids(), ["c2"])
+
+    def test_full_queue_rejects_new_jobs_but_not_retries(self):
+        for run_id in ("a", "b", "c"):
+            self.enqueue(run_id)
+        with self.assertRaises(mission_queue.QueueFull):
+            self.enqueue("d")
+        self.enqueue("retried", attempts=1)
+        self.assertEqual(len(mission_queue.pending_run_ids()), 4)
+
+    def test_jobs_past_their_deadline_expire(self):
+        with mock.patch("core.mission_queue.time.time", return_value=1000.0):
+            self.enqueue("stale")
+
+        admitted, expired = mission_queue.admit_jobs()
+
+        self.assertEqual(admitted, [])
+        self.assertEqual([job["run_id"] for job in expired], ["stale"])
+        self.assertEqual(mission_queue.pending_run_ids(), [])
+
+    def test_start_mission_only_starts_new_runs(self):
+        new = AgentRun.objects.create(status=admission.NEW_STATUS)
+        completed = AgentRun.objects.create(status="completed", mission_type="research")
+        self.assertTrue(admission.is_new(new))
+        self.assertFalse(admission.is_new(completed))
+
+        body = {"run_id": str(completed.run_id), "type": "research"}
+        response = self.client.post(reverse("start_mission"), json.dumps(body), content_type="application/json")
+        self.assertEqual(response.status_code, 409)
+
+        body["run_id"] = str(new.run_id)
+        response = self.client.post(reverse("start_mission"), json.dumps(body), content_type="application/json")
+        self.assertEqual(response.status_code, 202)
+        new.refresh_from_db()
+        self.assertEqual(new.status, admission.QUEUED_STATUS)
+
+
+class KeysetPaginationTest(TestCase):
+    def test_message_pages_cover_tied_timestamps_once(self):
+        run = AgentRun.objects.create(status="completed")
+        same_time = timezone.now()
+        for seq in range(1, 8):
+            AgentMessage.objects.create(
+                run=run, seq=seq, agent_name="Agent", message_type="thought",
+                content=f"message {seq}", timestamp=same_time + timedelta(seconds=seq // 3),
+            )
+
+        contents, cursor = [], None
+        while True:
+            page, cursor = get_messages(run.run_id, cursor=cursor, limit=2)
+            contents += [message["content"] for message in page]
+            if cursor is None:
+                break
+
+        self.assertEqual(contents, [f"message {seq}" for seq in range(1, 8)])
+
+    def test_history_pages_are_newest_first_without_gaps(self):
+        started = timezone.now()
+        runs = [AgentRun.objects.create(name=f"Run {i}", status="completed") for i in range(5)]
+        for i, run in enumerate(runs):
+            # Two runs share each start time
+            AgentRun.objects.filter(run_id=run.run_id).update(started_at=started + timedelta(seconds=i // 2))
+        AgentRun.objects.create(name="Unfinished", status="running")
+
+        seen, cursor = [], None
+        while True:
+            page, cursor = get_history(cursor=cursor, limit=2)
+            seen += [entry["run_id"] for entry in page]
+            if cursor is None:
+                break
+
+        expected = AgentRun.objects.filter(status="completed").order_by("-started_at", "-run_id")
+        self.assertEqual(seen, [str(run.run_id) for run in expected])
+
+
+class SearchSyntaxTest(SimpleTestCase):
+    def test_fts5_query(self):
+        self.assertEqual(search.fts5_query("venue budget"), '("venue" "budget")')
+        self.assertEqual(search.fts5_query('"keynote speaker" OR catering'), '("keynote speaker" OR "catering")')
+        self.assertEqual(search.fts5_query("venue -risk"), '("venue") NOT "risk"')
+        self.assertEqual(search.fts5_query('say "hi""'), '("say" "hi")')
+
+    def test_fts5_query_without_positive_terms(self):
+        self.assertEqual(search.fts5_query(""), "")
+        self.assertEqual(search.fts5_query("-risk"), "")
+        self.assertEqual(search.fts5_query("OR OR"), "")
+
+    def test_highlight_marks_inflections_and_escapes(self):
+        snippet = search.highlight("<b>Planning</b> the planned plans", "plan", width=200)
+        self.assertEqual(
+            snippet, "&lt;b&gt;<mark>Planning</mark>&lt;/b&gt; the <mark>planned</mark> <mark>plans</mark>",
+        )
+
+    def test_highlight_windows_long_text_around_the_first_match(self):
+        text = "x" * 300 + " zebra " + "y" * 300
+        snippet = search.highlight(text, "zebra", width=60)
+        self.assertTrue(snippet.startswith("…") and snippet.endswith("…"))
+        self.assertIn("<mark>zebra</mark>", snippet)
+
+    def test_highlight_ignores_negated_terms(self):
+        self.assertEqual(search.highlight("risk and venue", "-risk venue"), "risk and <mark>venue</mark>")
+
+
+class ParsingTest(SimpleTestCase):
+    def test_negotiate_encoding(self):
+        self.assertEqual(negotiate_encoding("gzip, deflate, br, zstd"), "zstd")
+        self.assertEqual(negotiate_encoding("gzip;q=1.0, zstd;q=0.5"), "gzip")
+        self.assertEqual(negotiate_encoding("zstd;q=0, gzip"), "gzip")
+        self.assertEqual(negotiate_encoding("*;q=0.5"), "zstd")
+        self.assertEqual(negotiate_encoding("gzip;q=bad"), None)
+        self.assertIsNone(negotiate_encoding("br, deflate"))
+        self.assertIsNone(negotiate_encoding(""))
+
+    def test_parse_reset(self):
+        self.assertEqual(parse_reset(None), 0.0)
+        self.assertEqual(parse_reset("120"), 120.0)
+        self.assertEqual(parse_reset("7.66s"), 7.66)
+        self.assertAlmostEqual(parse_reset("2m59.5s"), 179.5)
+        self.assertAlmostEqual(parse_reset("1h2m"), 3720.0)
+        self.assertAlmostEqual(parse_reset("250ms"), 0.25)
+
+    def test_parse_speed(self):
+        self.assertEqual(replay.parse_speed(None), 1.0)
+        self.assertEqual(replay.parse_speed("max"), 0.0)
+        self.assertEqual(replay.parse_speed(0), 0.0)
+        self.assertEqual(replay.parse_speed("2.5"), 2.5)
+        for value in ("-1", "fast"):
+            with self.assertRaises(ValueError):
+                replay.parse_speed(value)
@@ -0,0 +1,77 @@
+import logging
+import math
+from functools import lru_cache
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# tiktoken encodings per model prefix. Groq's Llama 3 models use a 128k
+# BPE vocabulary very close to cl100k_base, which is the default.
+MODEL_ENCODINGS = {
+    "gpt-4o": "o200k_base",
+    "o1": "o200k_base",
+    "gpt-4": "cl100k_base",
+    "gpt-3.5": "cl100k_base",
+}
+DEFAULT_ENCODING = "cl100k_base"
+
+
+def encoding_name_for(model: str) -> str:
+    name = model.rsplit("/", 1)[-1].lower()
+    for prefix, encoding in MODEL_ENCODINGS.items():
+        if name.startswith(prefix):
+            return encoding
+    return DEFAULT_ENCODING
+
+
+@lru_cache(maxsize=None)
+def get_encoding(encoding_name: str):
+    """
+    Loads a tiktoken encoding once per process. Returns None when tiktoken
+    or its BPE file is unavailable (e.g. offline without a cache).
+    """
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding(encoding_name)
+    except Exception as e:
+        logger.warning("tiktoken encoding %s unavailable (%s), estimating tokens", encoding_name, e)
+        return None
+
+
+def count_tokens(text: str, model: str = "") -> int:
+    if not text:
+        return 0
+    encoding = get_encoding(encoding_name_for(model or settings.MISSION_LLM_MODEL))
+    if encoding is None:
+        return math.ceil(len(text) / 4)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def model_pricing(model: str = "") -> dict:
+    """USD per token for prompt and completion tokens."""
+    model = model or settings.MISSION_LLM_MODEL
+    per_million = settings.MODEL_PRICING.get(model, settings.MODEL_PRICING["default"])
+    return {kind: rate / 1_000_000 for kind, rate in per_million.items()}
+
+
+def estimate_cost(prompt_tokens: int, completion_tokens: int, model: str = "") -> float:
+    pricing = model_pricing(model)
+    return prompt_tokens * pricing["prompt"] + completion_tokens * pricing["completion"]
+
+
+def usage_tokens(usage) -> tuple:
+    """
+    Extracts (prompt, completion) tokens from CrewAI UsageMetrics, a LiteLLM
+    usage object or a plain dict. Returns (None, None) when unavailable.
+    """
+    if usage is None:
+        return None, None
+    if not isinstance(usage, dict):
+        usage = usage.model_dump() if hasattr(usage, "model_dump") else vars(usage)
+    prompt = usage.get("prompt_tokens")
+    completion = usage.get("completion_tokens")
+    if prompt is None and completion is None:
+        return None, None
+    return int(prompt or 0), int(completion or 0)
@@ -7,4 +7,16 @@ urlpatterns = [
     path("run/<uuid:run_id>/", views.run_detail, name="run_detail"),
     path("create_agent/", views.create_agent, name="create_agent"),
     path("api/start/", views.start_mission, name="start_mission"),
+    path("api/history/", views.history_api, name="history_api"),
+    path("api/search/", views.search_api, name="search_api"),
+    path("api/runs/<uuid:run_id>/messages/", views.run_messages, name="run_messages"),
+    path("api/runs/<uuid:run_id>/export/", views.export_api, name="export_run"),
+    path("api/export/", views.export_api, name="export_runs"),
+    path("api/runs/<uuid:run_id>/graph/", views.run_graph, name="run_graph"),
+    path("api/runs/<uuid:run_id>/profile/", views.run_profile, name="run_profile"),
+    path("api/runs/<uuid:run_id>/replay/", views.replay_api, name="replay_run"),
+    path("api/runs/<uuid:run_id>/resume/", views.resume_api, name="resume_run"),
+    path("api/runs/<uuid:run_id>/cost/", views.run_cost, name="run_cost"),
+    path("api/cost/", views.cost_summary, name="cost_summary"),
+    path("metrics", views.metrics, name="metrics"),
 ]
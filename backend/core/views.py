@@ -1,55 +1,162 @@
+import datetime
+import logging
 import math
+import time
 import uuid
-from collections import defaultdict
 import json
 
-from django.db.models import F
-from django.shortcuts import render, get_object_or_404
-from django.http import JsonResponse
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Case, Count, F, FloatField, Q, Sum, When
+from django.shortcuts import aget_object_or_404, render, get_object_or_404
+from django.utils import timezone
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 
-from .models import AgentRun, AgentMessage
-from agents.crew_mission import run_feasibility_mission, run_research_mission, run_conference_planing
+from .admission import NEW_STATUS, RESUMABLE_STATUSES, estimate_wait, is_new, resume_mission, submit_mission
+from .compression import compress_response
+from .export import COMPRESSIONS, FORMATS, achunks, export_chunks, export_content_type, export_filename, select_runs
+from .graph import graph_snapshot
+from .models import AgentRun, AgentMessage, TaskCheckpoint
+from .llm_cache import CACHE_MODES
+from .mission_queue import QueueFull, queue_depth, running_count
+from .missions import MISSION_TYPES
+from .replay import parse_speed, queue_replay
+from .retention import archived_messages
+from .search import search, supported as search_supported
+from .telemetry import metrics_response
+from .tokens import model_pricing
 
+logger = logging.getLogger(__name__)
 
-def dashboard(request):
-    context = {
-        "history": get_history()
+compressed = compress_response(settings.RESPONSE_COMPRESS_MIN_BYTES)
+
+
+@compressed
+async def dashboard(request):
+    # An empty timeline, rather than the messages context processor's session storage
+    return render(request, "dashboard.html", await page_context(messages=[]))
+
+
+async def page_context(**extra):
+    history, next_cursor = await aget_history()
+    return {
+        "history": history,
+        "history_cursor": next_cursor,
+        "token_price": model_pricing()["completion"],
+        **extra,
     }
 
+
+@compressed
+async def run_detail(request, run_id):
+    agent = await aget_object_or_404(AgentRun, run_id=run_id)
+    messages, next_cursor = [], None
+
+    if agent and agent.status == "completed":
+        # Only the first screen is inlined; the page fetches the rest from run_messages
+        messages, next_cursor = await aget_messages(run_id, archive_path=agent.archive_path)
+    context = await page_context(
+        messages=messages,
+        messages_cursor=next_cursor,
+        messages_run_id=str(run_id),
+        profile=agent.profile,
+        # Unfinished runs are replayed from the run's event log over SSE.
+        live_run_id=str(run_id) if agent.status != "completed" else "",
+    )
     return render(request, "dashboard.html", context)
 
 
-def run_detail(request, run_id):
-    agent = get_object_or_404(AgentRun, run_id=run_id)
+@compressed
+def run_messages(request, run_id):
+    run = get_object_or_404(AgentRun.objects.only("run_id", "archive_path"), run_id=run_id)
+    try:
+        limit = min(int(request.GET.get("limit", settings.MESSAGE_PAGE_SIZE)), settings.MESSAGE_PAGE_MAX)
+        messages, next_cursor = get_messages(
+            run_id, request.GET.get("cursor"), limit=max(limit, 1), archive_path=run.archive_path,
+        )
+    except ValueError:
+        return JsonResponse({"error": "Invalid cursor or limit"}, status=400)
+    return JsonResponse({"results": messages, "next_cursor": next_cursor})
+
+
+MESSAGE_FIELDS = ("id", "agent_name", "content", "message_type", "timestamp", "token_count")
+
+
+def get_messages(run_id, cursor=None, limit=None, archive_path=""):
+    """
+    One page of a run's messages in publish order, paginated by a
+    (timestamp, id) keyset that is served by agent_msg_run_ts_id_idx.
+    Archived runs (`archive_path` set) are paged the same way from their
+    Parquet file. Returns the page and the cursor for the next one (None
+    on the last page).
+    """
+    limit = limit or settings.MESSAGE_PAGE_SIZE
+    position = decode_message_cursor(cursor) if cursor else None
+    if archive_path:
+        rows = (
+            {field: message[field] for field in MESSAGE_FIELDS}
+            for message in archived_messages(archive_path, run_id, after=position)
+        )
+    else:
+        # Stream rows instead of materialising the page through the queryset cache
+        rows = message_rows(run_id, position, limit).iterator(chunk_size=min(limit + 1, 2000))
+    return message_page(rows, limit)
+
+
+async def aget_messages(run_id, cursor=None, limit=None, archive_path=""):
+    """get_messages for async views. Parquet archives are read on a worker thread."""
+    if archive_path:
+        return await sync_to_async(get_messages)(run_id, cursor, limit, archive_path)
+    limit = limit or settings.MESSAGE_PAGE_SIZE
+    position = decode_message_cursor(cursor) if cursor else None
+    rows = message_rows(run_id, position, limit)
+    return message_page([row async for row in rows.aiterator(chunk_size=min(limit + 1, 2000))], limit)
+
+
+def message_rows(run_id, position, limit):
+    """The page after `position` plus one row, which tells whether there is a next page."""
+    rows = AgentMessage.objects.filter(run_id=run_id).values(*MESSAGE_FIELDS).order_by("timestamp", "id")
+    if position:
+        timestamp, pk = position
+        # Written as a range plus an exclusion so the index can seek to the cursor
+        rows = rows.filter(timestamp__gte=timestamp).exclude(timestamp=timestamp, id__lte=pk)
+    return rows[:limit + 1]
+
+
+def message_page(rows, limit):
     messages = []
+    last = None
+    has_more = False
+    for row in rows:
+        if len(messages) == limit:
+            has_more = True
+            break
+        last = (row["timestamp"], row.pop("id"))
+        messages.append({
+            **row,
+            "timestamp": row["timestamp"].strftime("%H:%M:%S") if row["timestamp"] else "—",
+        })
+
+    next_cursor = encode_message_cursor(*last) if has_more else None
+    return messages, next_cursor
 
-    if agent and agent.status == "completed":
-        messages = (
-                    AgentMessage.objects.filter(run_id=run_id)
-                        .values("agent_name","content","message_type","timestamp")
-                        .order_by("timestamp")
-                )
-        messages = [
-            {
-                **msg,
-                "timestamp": msg["timestamp"].strftime("%H:%M:%S") if msg["timestamp"] else "—"
-            }
-            for msg in messages
-        ]
-    context = {
-        "messages_json": json.dumps(messages),
-        "history": get_history()
-    }
-    return render(request, "dashboard.html", context)
+
+def encode_message_cursor(timestamp, pk) -> str:
+    return f"{timestamp.isoformat()}|{pk}"
+
+
+def decode_message_cursor(cursor: str):
+    timestamp, _, pk = cursor.partition("|")
+    return datetime.datetime.fromisoformat(timestamp), int(pk)
 
 
 @csrf_exempt
-def create_agent(request):
+async def create_agent(request):
     run_id = uuid.uuid4()
-    print(f'run_id {run_id}')
-    run = AgentRun.objects.create(run_id=run_id)
-    run.save()
+    logger.debug("Creating run", extra={"run_id": str(run_id)})
+    await AgentRun.objects.acreate(run_id=run_id, status=NEW_STATUS)
 
     return JsonResponse({"run_id": str(run_id)})
 
@@ -61,57 +168,332 @@ def start_mission(request):
         name = data.get("name", "New Mission")
         run_id = data.get("run_id", 0)
         mission_type = data.get("type", "feasibility")
+        # None leaves it to the LLM: deterministic calls are cached by default
+        cache = data.get("cache")
+        # Token-level deltas; None falls back to MISSION_STREAM_TOKENS
+        stream = data.get("stream")
+        # Higher runs first when missions have to wait for a slot
+        priority = data.get("priority")
 
-        if mission_type == "research":
-            run_research_mission(name, run_id)
-        elif mission_type == "feasibility":
-            run_feasibility_mission(idea=name, run_id=run_id)
-        elif mission_type == "conference":
-            run_conference_planing(mission_name=name, run_id=run_id)
-        else:
+        if mission_type not in MISSION_TYPES:
             return JsonResponse({"error": "Invalid mission type"}, status=400)
+        if cache is not None and cache not in CACHE_MODES:
+            return JsonResponse({"error": f"cache must be one of {', '.join(CACHE_MODES)}"}, status=400)
+        if stream is not None and not isinstance(stream, bool):
+            return JsonResponse({"error": "stream must be true or false"}, status=400)
+        if priority is not None and (not isinstance(priority, int) or isinstance(priority, bool)):
+            return JsonResponse({"error": "priority must be an integer"}, status=400)
+
+        run = get_object_or_404(AgentRun, run_id=run_id)
+        # Failed runs restart from their checkpoints with the mission they were started with
+        resume = run.status in RESUMABLE_STATUSES and bool(run.mission_type)
+        if not resume and not is_new(run):
+            return JsonResponse({"error": f"Run is {run.status} and cannot be started again"}, status=409)
+        try:
+            if resume:
+                position = resume_mission(run, priority=priority)
+            else:
+                position = submit_mission(run, mission_type, name, priority=priority, cache=cache, stream=stream)
+        except QueueFull:
+            return queue_full_response(run_id)
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
 
-        return JsonResponse({"run_id": str(run_id)})
+        return JsonResponse({"run_id": str(run_id), "status": "queued", **position}, status=202)
     return JsonResponse({"error": "POST only"}, status=400)
 
-def get_history():
-    history = list(
-        AgentMessage.objects
-        .filter(
-            run__status="completed"
-        )
-        .select_related('run')
-        .values(
-            'content',
-            run_uuid=F('run__run_id'),
-            run_name=F('run__name'),
-            run_started_at=F('run__started_at'),
+
+def queue_full_response(run_id):
+    retry_after = estimate_wait(settings.MISSION_QUEUE_MAX, running_count())
+    response = JsonResponse({
+        "error": "Mission queue is full, try again later",
+        "run_id": str(run_id),
+        "status": "rejected",
+        "retry_after": retry_after,
+    }, status=429)
+    response["Retry-After"] = str(math.ceil(retry_after) or 1)
+    return response
+
+
+@compressed
+def run_graph(request, run_id):
+    """The run's agent graph; viewers then apply `graph_delta` events with higher versions."""
+    run = get_object_or_404(AgentRun.objects.only("run_id", "graph", "archive_path"), run_id=run_id)
+    return JsonResponse(graph_snapshot(run))
+
+
+@compressed
+def run_profile(request, run_id):
+    """Per-task timings and tokens of the run (core.profiler); saved as each task finishes."""
+    run = get_object_or_404(AgentRun.objects.only("run_id", "profile"), run_id=run_id)
+    return JsonResponse(run.profile or {"run_id": str(run_id), "tasks": [], "agents": {}, "totals": {}})
+
+
+@csrf_exempt
+def resume_api(request, run_id):
+    """Restarts a failed run from its first unfinished task; finished tasks come from checkpoints."""
+    if request.method != "POST":
+        return JsonResponse({"error": "POST only"}, status=400)
+    run = get_object_or_404(AgentRun, run_id=run_id)
+    data = json.loads(request.body or "{}")
+    priority = data.get("priority")
+    if priority is not None and (not isinstance(priority, int) or isinstance(priority, bool)):
+        return JsonResponse({"error": "priority must be an integer"}, status=400)
+    if run.status not in RESUMABLE_STATUSES or not run.mission_type:
+        return JsonResponse({"error": f"Run is {run.status} and cannot be resumed"}, status=409)
+
+    try:
+        position = resume_mission(run, priority=priority)
+    except QueueFull:
+        return queue_full_response(run_id)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    checkpoints = TaskCheckpoint.objects.filter(run=run).count()
+    return JsonResponse({"run_id": str(run_id), "status": "queued", "checkpoints": checkpoints, **position}, status=202)
+
+@csrf_exempt
+def replay_api(request, run_id):
+    """Re-streams a completed run to a new run channel; watch it at /run/<new id>/."""
+    if request.method != "POST":
+        return JsonResponse({"error": "POST only"}, status=400)
+    source = get_object_or_404(AgentRun, run_id=run_id)
+    if source.status != "completed":
+        return JsonResponse({"error": f"Run is {source.status}; only completed runs can be replayed"}, status=409)
+    try:
+        data = json.loads(request.body or "{}")
+    except ValueError:
+        return JsonResponse({"error": "Invalid JSON body"}, status=400)
+    if not isinstance(data, dict):
+        return JsonResponse({"error": "Body must be a JSON object"}, status=400)
+    try:
+        speed = parse_speed(data.get("speed"))
+        max_gap = float(data["max_gap"]) if data.get("max_gap") is not None else None
+    except (TypeError, ValueError):
+        return JsonResponse({"error": "speed must be a positive number or 'max'"}, status=400)
+
+    # On the mission workers, not a thread of this web process
+    target = queue_replay(source, speed=speed, max_gap=max_gap)
+    return JsonResponse({
+        "run_id": str(target.run_id), "source_run_id": str(source.run_id), "speed": speed or "max", "status": "queued",
+    }, status=202)
+
+
+def cost_expression():
+    """
+    Run cost from stored counts: provider-reported usage when present,
+    otherwise the counted message tokens priced as completion tokens.
+    """
+    pricing = model_pricing()
+    has_usage = Q(prompt_tokens__gt=0) | Q(completion_tokens__gt=0)
+    return Case(
+        When(has_usage, then=F("prompt_tokens") * pricing["prompt"] + F("completion_tokens") * pricing["completion"]),
+        default=F("token_count") * pricing["completion"],
+        output_field=FloatField(),
+    )
+
+
+def run_cost(request, run_id):
+    run = get_object_or_404(AgentRun.objects.annotate(cost=cost_expression()), run_id=run_id)
+    return JsonResponse({
+        "run_id": str(run.run_id),
+        "message_tokens": run.token_count,
+        "prompt_tokens": run.prompt_tokens,
+        "completion_tokens": run.completion_tokens,
+        "cost_usd": round(run.cost, 6),
+        "throttled_seconds": round(run.throttled_seconds, 1),
+        "cache_hits": run.cache_hits,
+        "cache_misses": run.cache_misses,
+    })
+
+
+def cost_summary(request):
+    """Totals over runs, optionally limited with ?since= / ?until= (ISO dates)."""
+    runs = AgentRun.objects.all()
+    try:
+        if request.GET.get("since"):
+            runs = runs.filter(started_at__gte=parse_query_datetime(request.GET["since"]))
+        if request.GET.get("until"):
+            runs = runs.filter(started_at__lt=parse_query_datetime(request.GET["until"]))
+    except ValueError:
+        return JsonResponse({"error": "Invalid date"}, status=400)
+
+    totals = runs.aggregate(
+        total_runs=Count("run_id"),
+        total_message_tokens=Sum("token_count"),
+        total_prompt_tokens=Sum("prompt_tokens"),
+        total_completion_tokens=Sum("completion_tokens"),
+        total_cost=Sum(cost_expression()),
+    )
+    return JsonResponse({
+        "runs": totals["total_runs"],
+        "message_tokens": totals["total_message_tokens"] or 0,
+        "prompt_tokens": totals["total_prompt_tokens"] or 0,
+        "completion_tokens": totals["total_completion_tokens"] or 0,
+        "cost_usd": round(totals["total_cost"] or 0, 6),
+    })
+
+
+def parse_query_datetime(value: str) -> datetime.datetime:
+    parsed = datetime.datetime.fromisoformat(value)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+@compressed
+def search_api(request):
+    """
+    Runs matching ?q= in their messages or name, ranked, with highlighted
+    snippets. Filters: type (mission type), agent, message_type, since,
+    until (ISO dates, on run start). Paginated with ?page= and ?page_size=.
+    """
+    query = request.GET.get("q", "").strip()
+    if not query:
+        return JsonResponse({"error": "q is required"}, status=400)
+    if not search_supported():
+        return JsonResponse({"error": "Search is not available on this database"}, status=501)
+    mission_type = request.GET.get("type") or None
+    if mission_type is not None and mission_type not in MISSION_TYPES:
+        return JsonResponse({"error": "Invalid mission type"}, status=400)
+    try:
+        since = parse_query_datetime(request.GET["since"]) if request.GET.get("since") else None
+        until = parse_query_datetime(request.GET["until"]) if request.GET.get("until") else None
+    except ValueError:
+        return JsonResponse({"error": "Invalid date"}, status=400)
+    try:
+        page = int(request.GET.get("page", 1))
+        page_size = int(request.GET.get("page_size", settings.SEARCH_PAGE_SIZE))
+    except ValueError:
+        return JsonResponse({"error": "Invalid page or page_size"}, status=400)
+
+    started = time.perf_counter()
+    found = search(
+        query, mission_type=mission_type, agent=request.GET.get("agent") or None,
+        message_type=request.GET.get("message_type") or None, since=since, until=until,
+        page=page, page_size=page_size,
+    )
+    return JsonResponse({"query": query, **found, "took_ms": round((time.perf_counter() - started) * 1000, 2)})
+
+
+def export_api(request, run_id=None):
+    """
+    Streams the messages of one run (api/runs/<id>/export/) or of the runs
+    matching ?run_id= (repeatable), type, status, since and until (ISO
+    dates, on run start) as ?format=ndjson|parquet, with
+    ?compression=none|zstd. Not wrapped in `compressed`: the body is
+    already a file in the requested compression.
+    """
+    export_format = request.GET.get("format", "ndjson")
+    compression = request.GET.get("compression") or None
+    if export_format not in FORMATS:
+        return JsonResponse({"error": f"format must be one of {', '.join(FORMATS)}"}, status=400)
+    if compression is not None and compression not in COMPRESSIONS:
+        return JsonResponse({"error": f"compression must be one of {', '.join(COMPRESSIONS)}"}, status=400)
+
+    if run_id is not None:
+        get_object_or_404(AgentRun.objects.only("run_id"), run_id=run_id)
+        runs = select_runs(run_ids=[run_id])
+        name = f"run-{run_id}"
+    else:
+        mission_type = request.GET.get("type") or None
+        if mission_type is not None and mission_type not in MISSION_TYPES:
+            return JsonResponse({"error": "Invalid mission type"}, status=400)
+        try:
+            run_ids = [uuid.UUID(value) for value in request.GET.getlist("run_id")]
+            since = parse_query_datetime(request.GET["since"]) if request.GET.get("since") else None
+            until = parse_query_datetime(request.GET["until"]) if request.GET.get("until") else None
+        except ValueError:
+            return JsonResponse({"error": "Invalid run_id or date"}, status=400)
+        runs = select_runs(
+            run_ids=run_ids, since=since, until=until, mission_type=mission_type,
+            status=request.GET.get("status") or None,
         )
-        .order_by('-timestamp')
+        name = f"runs-{timezone.now():%Y%m%d-%H%M%S}"
+
+    chunks = export_chunks(runs, export_format, compression)
+    response = StreamingHttpResponse(
+        # Under ASGI a sync iterator would be read whole before the first byte goes out
+        achunks(chunks) if isinstance(request, ASGIRequest) else chunks,
+        content_type=export_content_type(export_format, compression),
+    )
+    response["Content-Disposition"] = f'attachment; filename="{export_filename(name, export_format, compression)}"'
+    return response
+
+
+@compressed
+async def history_api(request):
+    try:
+        history, next_cursor = await aget_history(request.GET.get("cursor"))
+    except ValueError:
+        return JsonResponse({"error": "Invalid cursor"}, status=400)
+    return JsonResponse({"results": history, "next_cursor": next_cursor})
+
+
+def get_history(cursor=None, limit=None):
+    """
+    One page of completed runs, newest first, read from the aggregates on
+    AgentRun. Paginated by (started_at, run_id) keyset; returns the page and
+    the cursor for the next one (None on the last page).
+    """
+    limit = limit or settings.HISTORY_PAGE_SIZE
+    return history_page(list(history_runs(cursor, limit)), limit)
+
+
+async def aget_history(cursor=None, limit=None):
+    """get_history on the async ORM, for async views."""
+    limit = limit or settings.HISTORY_PAGE_SIZE
+    return history_page([run async for run in history_runs(cursor, limit)], limit)
+
+
+def history_runs(cursor, limit):
+    runs = (
+        AgentRun.objects
+        .filter(status="completed")
+        .only("run_id", "name", "started_at", "token_count")
+        .order_by("-started_at", "-run_id")
     )
-    run_ids = set([str(h['run_uuid']) for h in history])
-    new_history = defaultdict(lambda: {"tokens": 0})
+    if cursor:
+        started_at, run_id = decode_history_cursor(cursor)
+        runs = runs.filter(Q(started_at__lt=started_at) | Q(started_at=started_at, run_id__lt=run_id))
+    return runs[:limit + 1]
+
+
+def history_page(page, limit):
+    has_more = len(page) > limit
+    page = page[:limit]
+
+    history = [
+        {
+            "run_id": str(run.run_id),
+            "name": run.name,
+            "started_at": run.started_at.strftime("%H:%M:%S") if run.started_at else "—",
+            "tokens": run.token_count,
+        }
+        for run in page
+    ]
+    next_cursor = encode_history_cursor(page[-1]) if has_more else None
+    return history, next_cursor
 
-    for msg in history:
-        rid = str(msg["run_uuid"])
-        if rid not in run_ids:
-            continue
 
-        if "run_id" not in new_history[rid]:
-            new_history[rid].update({
-                "run_id": rid,
-                "name": msg.get("run_name", "Untitled Mission"),
-                "started_at": (
-                    msg["run_started_at"].strftime("%H:%M:%S")
-                    if msg["run_started_at"] else "—"
-                ),
-            })
+def encode_history_cursor(run) -> str:
+    return f"{run.started_at.isoformat()}|{run.run_id}"
 
-        new_history[rid]["tokens"] += count_tokens(msg["content"])
 
-    new_history = dict(new_history)
-    return new_history.values()
+def decode_history_cursor(cursor: str):
+    started_at, _, run_id = cursor.partition("|")
+    parsed = datetime.datetime.fromisoformat(started_at)
+    return parsed, uuid.UUID(run_id)
 
 
-def count_tokens(text):
-    return math.ceil(len(text) / 4)
\ No newline at end of file
+def metrics(request):
+    """Prometheus metrics of this process, or of all app and worker processes in multiprocess mode."""
+    body, content_type = metrics_response({
+        "mission_queue_depth": ("Missions waiting for a worker.", queue_depth),
+        "missions_admitted": ("Missions holding an admission slot.", running_count),
+        "missions_running": ("Missions a worker is running.", lambda: (
+            # Rows created before unsubmitted runs were "new" still carry the model default
+            AgentRun.objects.filter(status="running").exclude(mission_type="").count()
+        )),
+    })
+    return HttpResponse(body, content_type=content_type)
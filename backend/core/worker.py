@@ -0,0 +1,173 @@
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from core import mission_queue
+from core.admission import QUEUED_STATUS, update_queue
+from core.llm_cache import get_llm_cache
+from core.missions import MISSION_TYPES, get_mission
+from core.models import AgentRun
+from core.persistence import close_buffer, metrics as flush_metrics, record_message
+from core.replay import fail_replay
+from core.telemetry import tracer
+
+logger = logging.getLogger(__name__)
+
+
+def mark_run_failed(run_id, reason: str) -> None:
+    record_message(run_id, "System", f"Error: {reason}", "error")
+    close_buffer(run_id)
+    run = AgentRun.objects.filter(run_id=run_id).exclude(status="completed").first()
+    if run is not None:
+        run.mark_finished("failed")
+
+
+def fail_orphaned_job(job: dict) -> None:
+    if job["type"] == "replay":
+        fail_replay(job["run_id"], "Mission worker was lost while running this replay")
+        return
+    mark_run_failed(job["run_id"], "Mission worker was lost while running this mission")
+
+
+def requeue_orphaned_job(job: dict) -> None:
+    AgentRun.objects.filter(run_id=job["run_id"], status="running").update(status=QUEUED_STATUS)
+
+
+def recover_orphaned_jobs() -> int:
+    """
+    Requeues or fails the jobs of lost workers, then admits what fits and
+    sends the requeued runs their place in line.
+    """
+    recovered = mission_queue.recover_orphaned_jobs(fail_orphaned_job, requeue_orphaned_job)
+    if recovered:
+        update_queue()
+    return recovered
+
+
+class MissionWorker:
+    """
+    Pulls mission jobs from Redis and runs up to `concurrency` of them at once.
+
+    Each mission runs on its own thread because the crews spend almost all
+    of their time waiting on the LLM provider.
+    """
+
+    def __init__(self, concurrency: int = 1, worker_id: str = ""):
+        self.concurrency = concurrency
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.stopping = threading.Event()
+        self.slots = threading.BoundedSemaphore(concurrency)
+        self.executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="mission")
+        # Jobs running here, whose admission slots this worker keeps leased
+        self.in_flight = {}
+        self.in_flight_lock = threading.Lock()
+
+    def install_signal_handlers(self):
+        signal.signal(signal.SIGTERM, self.request_stop)
+        signal.signal(signal.SIGINT, self.request_stop)
+
+    def request_stop(self, *args):
+        logger.info("Shutdown requested, finishing running missions", extra={"worker_id": self.worker_id})
+        self.stopping.set()
+
+    def beat(self):
+        mission_queue.heartbeat(self.worker_id)
+        with self.in_flight_lock:
+            jobs = list(self.in_flight.values())
+        mission_queue.renew_slots(jobs)
+        # Expires stale waiting runs and refreshes their ETAs even when
+        # nothing finishes for a while
+        try:
+            update_queue()
+        except Exception:
+            logger.exception("Queue update failed", extra={"worker_id": self.worker_id})
+
+    def run(self):
+        self.beat()
+        last_beat = time.monotonic()
+
+        while not self.stopping.is_set():
+            if time.monotonic() - last_beat >= settings.MISSION_WORKER_HEARTBEAT_TTL / 3:
+                self.beat()
+                last_beat = time.monotonic()
+
+            # Only claim a job when a slot is free so queued work stays
+            # available to other workers instead of piling up here.
+            if not self.slots.acquire(timeout=1.0):
+                continue
+
+            raw, job = mission_queue.claim_job(self.worker_id, timeout=1.0)
+            if job is None:
+                self.slots.release()
+                continue
+
+            self.executor.submit(self._execute, raw, job)
+
+        # Keep heartbeating while in-flight missions drain so they are not
+        # mistaken for orphans by another worker's recovery pass.
+        drain = threading.Thread(target=self.executor.shutdown, kwargs={"wait": True})
+        drain.start()
+        while drain.is_alive():
+            mission_queue.heartbeat(self.worker_id)
+            with self.in_flight_lock:
+                mission_queue.renew_slots(list(self.in_flight.values()))
+            drain.join(timeout=settings.MISSION_WORKER_HEARTBEAT_TTL / 3)
+
+        mission_queue.clear_heartbeat(self.worker_id)
+        logger.info("Worker stopped", extra={"worker_id": self.worker_id})
+
+    def _execute(self, raw, job: dict):
+        run_id = job["run_id"]
+        with self.in_flight_lock:
+            self.in_flight[run_id] = job
+        try:
+            close_old_connections()
+            if job["type"] in MISSION_TYPES:
+                AgentRun.objects.filter(run_id=run_id).update(status="running")
+            handler = get_mission(job["type"])
+            with tracer.start_as_current_span("mission", attributes={
+                "run.id": run_id, "mission.type": job["type"], "worker.id": self.worker_id,
+            }):
+                handler(
+                    job["name"], run_id=run_id, cache=job.get("cache"), stream=job.get("stream"),
+                    **job.get("params", {}),
+                )
+        except Exception as e:
+            logger.exception("Mission crashed", extra={"worker_id": self.worker_id, "run_id": run_id})
+            mark_run_failed(run_id, str(e))
+        finally:
+            # Missions flush on their own; this covers crashes mid-crew.
+            close_buffer(run_id)
+            throttled = AgentRun.objects.filter(run_id=run_id).values_list("throttled_seconds", flat=True).first()
+            logger.info("Mission done", extra={
+                "worker_id": self.worker_id,
+                "run_id": run_id,
+                "throttled_seconds": round(throttled or 0, 1),
+                "message_flushes": flush_metrics.snapshot(),
+                "llm_cache": get_llm_cache().stats.snapshot(),
+            })
+            mission_queue.ack_job(self.worker_id, raw)
+            with self.in_flight_lock:
+                self.in_flight.pop(run_id, None)
+            mission_queue.release_slot(job)
+            try:
+                update_queue()
+            except Exception:
+                logger.exception("Queue update failed", extra={"worker_id": self.worker_id})
+            close_old_connections()
+            self.slots.release()
+
+
+def run_worker_process(concurrency: int):
+    """Entry point for each child process started by `run_mission_workers`."""
+    worker = MissionWorker(concurrency=concurrency)
+    worker.install_signal_handlers()
+    worker.run()
@@ -0,0 +1,107 @@
+import asyncio
+import logging
+
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+logger = logging.getLogger(__name__)
+
+
+class StreamBroker:
+    """
+    Fans Redis pub/sub messages out to SSE clients.
+
+    One pattern subscription (`run:*`) per process is shared by every
+    connected viewer. Messages are pushed into a bounded asyncio queue per
+    client as `(event_id, payload)` pairs, so a slow browser never blocks
+    the reader or other clients.
+    """
+
+    def __init__(self, redis_client, pattern: str = "run:*", queue_size: int = 1000):
+        self.redis = redis_client
+        self.pattern = pattern
+        self.queue_size = queue_size
+        self.clients: dict[str, set[asyncio.Queue]] = {}
+        self._task = None
+
+    async def start(self):
+        self._task = asyncio.create_task(self._reader())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        for queues in self.clients.values():
+            for queue in queues:
+                self._close(queue)
+        self.clients.clear()
+
+    def subscribe(self, channel: str) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self.clients.setdefault(channel, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, channel: str, queue: asyncio.Queue):
+        queues = self.clients.get(channel)
+        if queues is None:
+            return
+        queues.discard(queue)
+        if not queues:
+            del self.clients[channel]
+
+    @property
+    def connection_count(self) -> int:
+        return sum(len(queues) for queues in self.clients.values())
+
+    @property
+    def backlog(self) -> int:
+        """Events dispatched but not yet read by their SSE connection."""
+        return sum(queue.qsize() for queues in self.clients.values() for queue in queues)
+
+    def dispatch(self, channel: str, event):
+        for queue in list(self.clients.get(channel, ())):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # The client cannot keep up; end its stream so the browser
+                # reconnects instead of holding an ever-growing backlog.
+                self.unsubscribe(channel, queue)
+                self._close(queue)
+
+    @staticmethod
+    def _close(queue: asyncio.Queue):
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(None)
+
+    async def _reader(self):
+        delay = 0.5
+        while True:
+            pubsub = self.redis.pubsub()
+            try:
+                await pubsub.psubscribe(self.pattern)
+                delay = 0.5
+                async for message in pubsub.listen():
+                    if message["type"] != "pmessage":
+                        continue
+                    channel = message["channel"]
+                    if isinstance(channel, bytes):
+                        channel = channel.decode()
+                    data = message["data"]
+                    if isinstance(data, bytes):
+                        data = data.decode()
+                    event_id, sep, payload = data.partition("\n")
+                    if not sep:
+                        event_id, payload = None, data
+                    self.dispatch(channel, (event_id, payload))
+            except (RedisConnectionError, OSError) as e:
+                logger.warning("Redis subscription lost (%s), retrying in %ss", e, delay)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 10)
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
@@ -1,15 +1,40 @@
 # backend/fastapi_app/main.py
 import asyncio
-import datetime
-import json
 import os
+from contextlib import asynccontextmanager
 
-import redis
-from fastapi import FastAPI, Request
-from fastapi.responses import StreamingResponse
+import redis.asyncio as aioredis
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 
-app = FastAPI(title="Swarm Stream")
+from core.compression import StreamCompressor, negotiate_encoding
+from core.log import configure_logging
+from core.redis_client import channel_name, event_log_key, parse_event_id
+from core.telemetry import SSE_EVENTS_SENT, extract_trace_context, metrics_response, setup_tracing, tracer
+from fastapi_app.broker import StreamBroker
+
+configure_logging()
+
+KEEPALIVE_SECONDS = 15
+REPLAY_BATCH_SIZE = 500
+# zstd/gzip Content-Encoding on /stream when the client accepts it
+SSE_COMPRESSION = os.getenv("SSE_COMPRESSION", "true").lower() == "true"
+
+r = aioredis.from_url(os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+broker = StreamBroker(r)
+setup_tracing("agent-swarm-stream")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await broker.start()
+    yield
+    await broker.stop()
+    await r.aclose()
+
+
+app = FastAPI(title="Swarm Stream", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -19,37 +44,132 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-r = redis.from_url(os.getenv("REDIS_URL", "redis://localhost:6379/0"))
-
 
 @app.get("/health")
 async def health():
-    return {"status": "OK", "redis_connected": r.ping()}
+    return {
+        "status": "OK",
+        "redis_connected": await r.ping(),
+        "sse_connections": broker.connection_count,
+    }
+
+
+@app.get("/metrics")
+async def metrics():
+    body, content_type = metrics_response({
+        "sse_connections": ("Open SSE connections.", lambda: broker.connection_count),
+        "sse_queued_events": ("Events waiting in SSE client queues.", lambda: broker.backlog),
+        "sse_subscribed_runs": ("Runs with at least one viewer.", lambda: len(broker.clients)),
+    })
+    return Response(body, media_type=content_type)
+
+
+def delivery_span(run_id: str, event_id, payload: str, source: str):
+    """
+    Starts an `sse.deliver` span in the producer's trace when the payload
+    carries one. The caller ends it once the frame has been handed on.
+    """
+    SSE_EVENTS_SENT.labels(source=source).inc()
+    parent = extract_trace_context(payload)
+    if parent is None:
+        return None
+    return tracer.start_span("sse.deliver", context=parent, attributes={
+        "run.id": run_id, "event.id": event_id or "", "sse.source": source,
+    })
 
 
-async def event_stream(run_id: str):
-    now = datetime.datetime.now()
-    formatted_string = now.strftime("%H:%M:%S.%f")
-    channel = f"run:{str(run_id)}"
+def sse_frame(event_id, payload: str) -> str:
+    if event_id:
+        return f"id: {event_id}\ndata: {payload}\n\n"
+    return f"data: {payload}\n\n"
 
-    pubsub = r.pubsub()
-    pubsub.subscribe(channel)
 
-    print(f"[FASTAPI DEBUG] Subscribed to live channel 'run:{run_id}' time:{formatted_string}")
+async def replay_events(run_id: str, after: str):
+    """Yields `(event_id, payload)` pairs logged after `after` ("0" = start of run)."""
+    key = event_log_key(run_id)
+    start = "-" if after == "0" else f"({after}"
+    while True:
+        entries = await r.xrange(key, min=start, max="+", count=REPLAY_BATCH_SIZE)
+        for entry_id, fields in entries:
+            entry_id = entry_id.decode() if isinstance(entry_id, bytes) else entry_id
+            payload = fields.get(b"data", fields.get("data"))
+            yield entry_id, payload.decode() if isinstance(payload, bytes) else payload
+        if len(entries) < REPLAY_BATCH_SIZE:
+            return
+        start = f"({entry_id}"
+
+
+async def event_stream(run_id: str, request: Request, last_event_id: str):
+    channel = channel_name(run_id)
+    # Subscribe before reading the log so nothing published in between is lost;
+    # duplicates are dropped by comparing IDs below.
+    queue = broker.subscribe(channel)
 
     try:
+        last_seen = parse_event_id(last_event_id)
+        async for event_id, payload in replay_events(run_id, last_event_id):
+            last_seen = parse_event_id(event_id)
+            span = delivery_span(run_id, event_id, payload, "replay")
+            try:
+                yield sse_frame(event_id, payload)
+            finally:
+                if span is not None:
+                    span.end()
+
         while True:
-            message = pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
-            if message and message.get("type") == "message":
-                data = json.loads(message["data"])
-                yield f"data: {json.dumps(data)}\n\n"
-            await asyncio.sleep(1)
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                yield ": keepalive\n\n"
+                continue
+
+            if event is None:
+                break
+            event_id, payload = event
+            if event_id:
+                if parse_event_id(event_id) <= last_seen:
+                    continue
+                last_seen = parse_event_id(event_id)
+            span = delivery_span(run_id, event_id, payload, "live")
+            try:
+                yield sse_frame(event_id, payload)
+            finally:
+                if span is not None:
+                    span.end()
     finally:
-        pubsub.unsubscribe()
-        pubsub.close()
-        print(f"[FASTAPI DEBUG] Stream ended for {run_id}")
+        broker.unsubscribe(channel, queue)
+
+
+async def encode_stream(frames, encoding: str):
+    """Compresses SSE frames, flushing after each one so events are not held back."""
+    compressor = StreamCompressor(encoding)
+    try:
+        async for frame in frames:
+            yield compressor.compress(frame.encode())
+        yield compressor.close()
+    finally:
+        await frames.aclose()
+
 
 @app.get("/stream/{run_id}")
-async def stream(run_id: str, request: Request):
-    print(f"[FASTAPI DEBUG] Route hit: /stream/{run_id} from {request.client.host}")
-    return StreamingResponse(event_stream(run_id), media_type="text/event-stream")
\ No newline at end of file
+async def stream(run_id: str, request: Request, last_event_id: str = ""):
+    """
+    Streams a run's events. Resumes after the `Last-Event-ID` header (or the
+    `last_event_id` query parameter for clients that open a fresh
+    EventSource), otherwise replays from the start of the run.
+    """
+    resume_from = request.headers.get("last-event-id") or last_event_id or "0"
+    try:
+        parse_event_id(resume_from)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid Last-Event-ID")
+
+    body = event_stream(run_id, request, resume_from)
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "Vary": "Accept-Encoding"}
+    encoding = negotiate_encoding(request.headers.get("accept-encoding", "")) if SSE_COMPRESSION else None
+    if encoding:
+        body = encode_stream(body, encoding)
+        headers["Content-Encoding"] = encoding
+    return StreamingResponse(body, media_type="text/event-stream", headers=headers)